@@ -1,12 +1,109 @@
 '''SYSTEM PACKAGES'''
 import os
-import numpy as np
-from pandas import DataFrame as DF
-from pandas import read_csv as READCSV
-from pandas import to_numeric as TO_NUMERIC
+import sys
+import json
+import atexit
+import time
+import shutil
+import hashlib
+import weakref
+import tempfile
+import threading
+import shlex
+import argparse
+import warnings
+import importlib
+import contextlib
+import io
 from pprint import pprint as pp
 
 
+#########################################################################
+def import_shared(name) :
+    '''
+    Common function to import the module of helpers shared by the Task1
+    and Task2 programs - from the import path (e.g. a copy next to this
+    script), else from its file in the repository root, which is loaded
+    without adding the root to sys.path
+    '''
+    
+    try :
+        return importlib.import_module(name)
+    except ModuleNotFoundError as err :
+        if err.name != name :
+            raise
+    from importlib.util import spec_from_file_location, module_from_spec
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), f"{name}.py")
+    if not os.path.exists(path) :
+        raise ImportError(f"{name}.py not found - copy it next to {os.path.basename(__file__)}")
+    spec = spec_from_file_location(name, path)
+    module = module_from_spec(spec)
+    ## Registered by name, so that pool workers can unpickle its functions
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+## Lazy imports and the profiler, shared by the Task1 and Task2 programs
+SHARED = import_shared("gn111571_common")
+LazyImport = SHARED.LazyImport
+load_pyplot = SHARED.load_pyplot
+PROFILER = SHARED.PROFILER
+profiled = SHARED.profiled
+#########################################################################
+
+#########################################################################
+## Heavy packages, imported on first use
+np = LazyImport("numpy")
+DF = LazyImport("pandas", "DataFrame")
+SERIES = LazyImport("pandas", "Series")
+READCSV = LazyImport("pandas", "read_csv")
+TO_NUMERIC = LazyImport("pandas", "to_numeric")
+CONCAT = LazyImport("pandas", "concat")
+RANGEINDEX = LazyImport("pandas", "RangeIndex")
+HASH_ARRAY = LazyImport("pandas.util", "hash_array")
+PARSERERROR = LazyImport("pandas.errors", "ParserError")
+#########################################################################
+
+
+#########################################################################
+## Independent key for the second hash of the values hashed to 64 bits
+LO_HASH_KEY = "fp-lo-hash-key-2"
+#########################################################################
+
+#########################################################################
+## File creation mask of the process, for files written under a temporary name
+UMASK = os.umask(0)
+os.umask(UMASK)
+#########################################################################
+
+#########################################################################
+## Run time settings, updated from the command line arguments in main()
+SETTINGS = {
+    "chunksize" : 100000,       # rows per chunk for the streaming load mode
+    "engine" : "c",             # CSV parser engine - "c" or "pyarrow"
+    "memory_budget" : 1024,     # MB of working memory for out-of-core steps
+    "approx_quantiles" : False, # median and percentiles from KLL sketches
+    "quantile_error" : 0.01,    # rank error bound of the sketches
+    "percentiles" : [],         # extra percentiles to report (0-100)
+    "cache_dir" : ".dfstat_cache", # binary column cache of loaded files, None to disable
+    "workers" : min(os.cpu_count() or 1, 8), # threads / processes for parallel work
+    "compact" : False,          # downcast the loaded columns to the smallest exact dtypes
+    "fingerprint_bits" : 128,   # row fingerprint width for finding duplicates (64 or 128)
+    "spill_dir" : None,         # directory for spilled fingerprints, None - system temp
+    "view_rows" : 20,           # rows per page of the data viewer
+    "view_cols" : 8,            # columns per page of the data viewer
+    "plot_points" : 2000,       # rows above which plots are downsampled (0 - never)
+    "plot_bins" : 50,           # bars of a downsampled bar chart
+    "parallel" : False,         # per-column statistics on a pool of processes
+    "parallel_speedup" : False, # also time the statistics on one core, for the speedup
+    "corr_top" : 0,             # report only the top k correlated pairs (0 - full matrix)
+    "corr_threshold" : None,    # report only the pairs with |r| at least this
+    "corr_dtype" : "float64",   # float32 halves the memory of the correlation tiles
+    "corr_block" : 512,         # columns per correlation tile
+}
+#########################################################################
+
+
 #########################################################################
 def call_input_str(menu_str):
     '''
@@ -42,268 +139,2573 @@ def iterative_input_on_error(menu_str, min_op, max_op):
 #########################################################################
 
 #########################################################################
-def iterative_col_input_check(data_df, msg):
+def iterative_col_input_check(data_df, msg):
+    '''
+    Common function to iteratively display column names
+    and ask user input and validate until correct
+    '''
+    
+    print(msg)
+    col_input = None
+    ## Confirm user input for column name until correct option provided
+    ## Will break the loop if no input provided
+    while (col_input not in data_df.columns) :
+        ## Display names of the columns
+        for each_c in data_df.columns :
+            print(f"\t{each_c}")
+        col_input = input(">>> ")
+        col_input = col_input.strip()
+        
+        if col_input == "" :
+            break
+        if col_input not in data_df.columns :
+            print("Invalid Selection!")
+    
+    return col_input
+#########################################################################
+
+
+#########################################################################
+def select_csv_engine(engine) :
+    '''
+    Common function to validate the requested CSV parser engine
+    and fall back to the default C parser if pyarrow is unavailable
+    '''
+    
+    if engine != "pyarrow" :
+        return "c"
+    try :
+        import pyarrow.csv
+    except ImportError :
+        print("pyarrow is not installed, using the default C parser")
+        return "c"
+    return "pyarrow"
+#########################################################################
+
+#########################################################################
+def iter_csv_chunks(fname, dtypes, chunksize, engine="c", usecols=None, progress=None) :
+    '''
+    Generator to parse a CSV file chunk by chunk with pinned dtypes,
+    yielding one DataFrame per chunk of (roughly) chunksize rows
+    
+    progress, if given, is called as progress(rows_so_far, fraction_read)
+    after every chunk
+    '''
+    
+    fsize = max(os.path.getsize(fname), 1)
+    if usecols is not None :
+        dtypes = {c : dtypes[c] for c in usecols}
+    
+    with open(fname, "rb") as fh :
+        ## pyarrow's streaming reader works in blocks of bytes, so
+        ## estimate the bytes per row from the head of the file
+        if engine == "pyarrow" :
+            import pyarrow as pa
+            from pyarrow import csv as pa_csv
+            sample = fh.read(1 << 16)
+            fh.seek(0)
+            row_bytes = len(sample) / max(sample.count(b"\n"), 1)
+            reader = pa_csv.open_csv(
+                        fh,
+                        read_options = pa_csv.ReadOptions(
+                            block_size = max(int(chunksize*row_bytes), 1 << 20)),
+                        convert_options = pa_csv.ConvertOptions(
+                            column_types = {c : pa.from_numpy_dtype(t) for c, t in dtypes.items()},
+                            include_columns = list(dtypes))
+                    )
+            chunks = (batch.to_pandas() for batch in reader)
+        else :
+            chunks = READCSV(fh, dtype=dtypes, usecols=usecols, chunksize=chunksize)
+        
+        rows = 0
+        for chunk in chunks :
+            rows += chunk.shape[0]
+            if progress is not None :
+                progress(rows, min(fh.tell()/fsize, 1.0))
+            yield chunk
+#########################################################################
+
+#########################################################################
+class ChunkedFrame :
+    '''
+    Lazy handle on a numeric CSV file which is parsed chunk by chunk
+    on demand, so the data never has to fit in memory as one block
+    '''
+    
+    def __init__(self, fname, dtypes, n_rows, chunksize, engine="c", index_col=None, 
+                 cache_dir=None, plan=None) :
+        self.fname = fname
+        ## Column name -> numpy dtype, pinned when the file was loaded
+        self.dtypes = dtypes
+        self.n_rows = n_rows
+        self.chunksize = chunksize
+        self.engine = engine
+        self.index_col = index_col
+        ## Cache entry holding the parsed columns, read instead of the CSV
+        self.cache_dir = cache_dir
+        ## CleaningPlan applied to every chunk on the way out
+        self.plan = plan
+    
+    @property
+    def base_columns(self) :
+        return [c for c in self.dtypes if c != self.index_col]
+    
+    @property
+    def columns(self) :
+        if self.plan is not None :
+            return self.plan.columns
+        return self.base_columns
+    
+    @property
+    def empty(self) :
+        return self.n_rows == 0 or not self.columns
+    
+    @property
+    def shape(self) :
+        return (self.n_rows, len(self.columns))
+    
+    def set_index(self, col) :
+        '''
+        Return a new handle using col as the index of every chunk
+        '''
+        return ChunkedFrame(self.fname, self.dtypes, self.n_rows, self.chunksize,
+                            self.engine, index_col=col, cache_dir=self.cache_dir)
+    
+    def with_plan(self, plan) :
+        '''
+        Return a new handle applying the cleaning plan to every chunk
+        '''
+        return ChunkedFrame(self.fname, self.dtypes, self.n_rows, self.chunksize, self.engine,
+                            index_col=self.index_col, cache_dir=self.cache_dir, plan=plan)
+    
+    def iter_chunks(self, columns=None, progress=None, state=None) :
+        '''
+        Generator yielding the data one DataFrame chunk at a time,
+        optionally restricted to a subset of the columns
+        
+        state collects what the cleaning plan did during the pass
+        '''
+        
+        if self.plan is not None :
+            ## The plan needs every column, the subset is taken afterwards
+            if state is None :
+                state = {}
+            for chunk in self.with_plan(None).iter_chunks(progress=progress) :
+                chunk = self.plan.execute(chunk, state)[0]
+                yield chunk if columns is None else chunk[list(columns)]
+            return
+        
+        usecols = None
+        if columns is not None :
+            usecols = [c for c in self.dtypes if c in columns or c == self.index_col]
+        if self.cache_dir is not None :
+            chunks = iter_cached_chunks(self.cache_dir, self.chunksize, usecols, progress)
+        else :
+            chunks = iter_csv_chunks(self.fname, self.dtypes, self.chunksize,
+                                     self.engine, usecols, progress)
+        for chunk in chunks :
+            if self.index_col is not None :
+                chunk = chunk.set_index(self.index_col)
+            yield chunk
+    
+    def head(self, n=5) :
+        '''
+        Return the first n rows, parsing only as many chunks as needed
+        '''
+        
+        parts = []
+        rows = 0
+        for chunk in self.iter_chunks() :
+            parts.append(chunk.iloc[:n-rows])
+            rows += parts[-1].shape[0]
+            if rows >= n :
+                break
+        if not parts :
+            return DF(columns=self.columns)
+        return CONCAT(parts)
+    
+    def to_csv(self, fname) :
+        '''
+        Write the data to a CSV file one chunk at a time
+        '''
+        
+        with open(fname, "w", newline="") as fw :
+            for cid, chunk in enumerate(self.iter_chunks()) :
+                chunk.to_csv(fw, header=(cid == 0))
+    
+    def __str__(self) :
+        return (f"{self.head()}\n...\n"
+                f"[{self.n_rows} rows x {len(self.columns)} columns, "
+                f"streamed in chunks of {self.chunksize} rows from {self.fname}]")
+    
+    __repr__ = __str__
+#########################################################################
+
+#########################################################################
+def cache_entry_path(fname, kind) :
+    '''
+    Common function to find the cache entry of a file, keyed by its
+    absolute path, size and modification time
+    kind is "frame" for whole-file loads and "chunked" for chunked loads,
+    which pin every column to float64
+    '''
+    
+    fpath = os.path.abspath(fname)
+    fstat = os.stat(fpath)
+    path_key = hashlib.sha1(fpath.encode()).hexdigest()[:16]
+    stat_key = hashlib.sha1(f"{fstat.st_size}:{fstat.st_mtime_ns}".encode()).hexdigest()[:16]
+    return os.path.join(SETTINGS["cache_dir"], f"{path_key}-{kind}-{stat_key}")
+#########################################################################
+
+#########################################################################
+def read_cached_columns(entry, usecols=None) :
+    '''
+    Function to memory-map the columns of a cache entry
+    Returns (meta dict, {column name : read-only memmap}) 
+    '''
+    
+    with open(os.path.join(entry, "meta.json")) as fr :
+        meta = json.load(fr)
+    columns = {}
+    for cid, (col, dtype) in enumerate(zip(meta["columns"], meta["dtypes"])) :
+        if usecols is not None and col not in usecols :
+            continue
+        col_path = os.path.join(entry, f"col_{cid}.bin")
+        if meta["n_rows"] == 0 :
+            columns[col] = np.empty(0, dtype=dtype)
+        else :
+            columns[col] = np.asarray(np.memmap(col_path, dtype=dtype, mode="r", 
+                                                shape=(meta["n_rows"],)))
+    return meta, columns
+#########################################################################
+
+#########################################################################
+def iter_cached_chunks(entry, chunksize, usecols=None, progress=None) :
+    '''
+    Generator yielding DataFrame chunks which are views on the 
+    memory-mapped columns of a cache entry (no parsing, no copies)
+    '''
+    
+    meta, columns = read_cached_columns(entry, usecols)
+    n_rows = meta["n_rows"]
+    for start in range(0, n_rows, chunksize) :
+        stop = min(start+chunksize, n_rows)
+        chunk = DF({c : arr[start:stop] for c, arr in columns.items()}, copy=False)
+        chunk.index = RANGEINDEX(start, stop)
+        if progress is not None :
+            progress(stop, stop/n_rows)
+        yield chunk
+#########################################################################
+
+#########################################################################
+class ColumnCacheWriter :
+    '''
+    Writer of a cache entry, one raw binary file per column
+    
+    Chunks are appended as they are parsed and the entry only becomes
+    visible to readers once commit() renames it into place
+    '''
+    
+    def __init__(self, fname, kind, dtypes) :
+        self.entry = cache_entry_path(fname, kind)
+        self.tmp_entry = f"{self.entry}.tmp{os.getpid()}"
+        self.fname = os.path.abspath(fname)
+        self.dtypes = dtypes
+        self.n_rows = 0
+        os.makedirs(self.tmp_entry, exist_ok=True)
+    
+    def append(self, chunk) :
+        for cid, (col, dtype) in enumerate(self.dtypes.items()) :
+            with open(os.path.join(self.tmp_entry, f"col_{cid}.bin"), "ab") as fw :
+                chunk[col].to_numpy(dtype=dtype).tofile(fw)
+        self.n_rows += chunk.shape[0]
+    
+    def commit(self) :
+        meta = {
+            "source" : self.fname,
+            "n_rows" : self.n_rows,
+            "columns" : [str(c) for c in self.dtypes],
+            "dtypes" : [np.dtype(t).str for t in self.dtypes.values()],
+        }
+        with open(os.path.join(self.tmp_entry, "meta.json"), "w") as fw :
+            json.dump(meta, fw)
+        
+        ## Drop the entries of older versions of the file before publishing
+        cache_dir, name = os.path.split(self.entry)
+        path_key, stat_key = name.split("-")[0], name.split("-")[-1]
+        for old in os.listdir(cache_dir) :
+            if (old.startswith(path_key + "-") and not old.endswith("-" + stat_key)
+                    and ".tmp" not in old) :
+                shutil.rmtree(os.path.join(cache_dir, old), ignore_errors=True)
+        if os.path.exists(self.entry) :
+            shutil.rmtree(self.entry)
+        os.replace(self.tmp_entry, self.entry)
+        return self.entry
+    
+    def abort(self) :
+        shutil.rmtree(self.tmp_entry, ignore_errors=True)
+#########################################################################
+
+#########################################################################
+def open_cache_writer(fname, kind, dtypes) :
+    '''
+    Common function to start a cache entry, returns None when
+    the cache is disabled or cannot be written
+    '''
+    
+    if SETTINGS["cache_dir"] is None :
+        return None
+    try :
+        return ColumnCacheWriter(fname, kind, dtypes)
+    except OSError as err :
+        print(f"Warning - Unable to write the cache ({err})")
+        return None
+#########################################################################
+
+#########################################################################
+def find_cache_entry(fname, kind) :
+    '''
+    Common function to return the cache entry of an unchanged file, 
+    or None on a cache miss
+    '''
+    
+    if SETTINGS["cache_dir"] is None :
+        return None
+    entry = cache_entry_path(fname, kind)
+    if os.path.exists(os.path.join(entry, "meta.json")) :
+        return entry
+    return None
+#########################################################################
+
+#########################################################################
+def print_load_progress(rows, fraction) :
+    '''
+    Common function to display the progress of a chunked load
+    '''
+    
+    print(f"\r\tParsed {rows} rows ({fraction*100:.0f}% of file)", end="", flush=True)
+#########################################################################
+
+#########################################################################
+@profiled
+def load_data_file(fname) :
+    '''
+    Function to read a CSV file in one go, or to memory-map its
+    columns from the cache if the file has not changed since
+    Returns None if the values in the file are not all numeric
+    '''
+    
+    start = time.perf_counter()
+    entry = find_cache_entry(fname, "frame")
+    if entry is not None :
+        meta, columns = read_cached_columns(entry)
+        data_df = DF(columns, copy=False)
+        print(f"Cache hit - {fname} memory-mapped in {time.perf_counter()-start:.3f} s")
+        return data_df
+    
+    with PROFILER.section("parse csv") as frame :
+        data_df = READCSV(fname, engine=select_csv_engine(SETTINGS["engine"]))
+        frame["rows"] = data_df.shape[0]
+    if data_df.empty :
+        return None
+    
+    if not data_df.shape[1] == data_df.select_dtypes(include=np.number).shape[1] :
+        return None
+    parse_time = time.perf_counter() - start
+    
+    writer = open_cache_writer(fname, "frame", dict(data_df.dtypes))
+    if writer is not None :
+        start = time.perf_counter()
+        try :
+            with PROFILER.section("write cache") :
+                writer.append(data_df)
+                writer.commit()
+        except OSError as err :
+            writer.abort()
+            print(f"Warning - Unable to write the cache ({err})")
+        print(f"Cache miss - {fname} parsed in {parse_time:.3f} s, "
+              f"cached in {time.perf_counter()-start:.3f} s")
+    
+    return data_df
+#########################################################################
+
+#########################################################################
+@profiled
+def load_data_chunked(fname) :
+    '''
+    Function to validate a CSV file in a single streaming pass
+    with every column pinned to float64, stopping at the first chunk
+    holding a non-numeric value
+    
+    The parsed chunks are written to the cache as they go, so that
+    reloading the unchanged file skips the pass entirely
+    Returns a ChunkedFrame handle, or None if the values are not all numeric
+    '''
+    
+    engine = select_csv_engine(SETTINGS["engine"])
+    chunksize = SETTINGS["chunksize"]
+    
+    start = time.perf_counter()
+    entry = find_cache_entry(fname, "chunked")
+    if entry is not None :
+        meta, columns = read_cached_columns(entry)
+        dtypes = {c : arr.dtype for c, arr in columns.items()}
+        print(f"Cache hit - {fname} memory-mapped in {time.perf_counter()-start:.3f} s")
+        return ChunkedFrame(fname, dtypes, meta["n_rows"], chunksize, engine, cache_dir=entry)
+    
+    ## Only the header is parsed up front, the dtypes are pinned 
+    ## so that no chunk needs type inference
+    header = READCSV(fname, nrows=0)
+    if header.shape[1] == 0 :
+        return None
+    dtypes = {c : np.dtype(np.float64) for c in header.columns}
+    
+    print(f"Loading {fname} in chunks of {chunksize} rows ({engine} parser)")
+    writer = open_cache_writer(fname, "chunked", dtypes)
+    n_rows = 0
+    try :
+        for chunk in iter_csv_chunks(fname, dtypes, chunksize, engine,
+                                     progress=print_load_progress) :
+            n_rows += chunk.shape[0]
+            if writer is not None :
+                writer.append(chunk)
+    except ValueError as err :
+        print()
+        if writer is not None :
+            writer.abort()
+        ## Conversion of a non-numeric value to float64 failed, a 
+        ## ParserError or anything else from pyarrow is a malformed file
+        if isinstance(err, PARSERERROR) :
+            raise
+        if engine == "pyarrow" and "conversion error" not in str(err) :
+            raise
+        print(f"\tNon-numeric value found after row {n_rows}")
+        return None
+    except BaseException :
+        print()
+        if writer is not None :
+            writer.abort()
+        raise
+    print(f"\n\t{n_rows} rows validated in {time.perf_counter()-start:.2f} s")
+    
+    if n_rows == 0 :
+        if writer is not None :
+            writer.abort()
+        return None
+    
+    entry = None
+    if writer is not None :
+        entry = writer.commit()
+        print(f"Cache miss - {fname} parsed and cached in {time.perf_counter()-start:.3f} s")
+    return ChunkedFrame(fname, dtypes, n_rows, chunksize, engine, cache_dir=entry)
+#########################################################################
+
+#########################################################################
+def compact_dtype(values) :
+    '''
+    Common function to find the smallest dtype holding every value of a
+    numeric column exactly - the narrowest integer type covering the
+    range of an integer column, float32 for a float column only if each
+    value (NaN aside) survives the round trip
+    Returns the dtype, or None to keep the column as it is
+    '''
+    
+    if values.dtype.kind in "iu" and values.dtype.itemsize > 1 :
+        if not values.size :
+            return None
+        low, high = values.min(), values.max()
+        kinds = ("uint8", "uint16", "uint32") if low >= 0 else ("int8", "int16", "int32")
+        for name in kinds :
+            info = np.iinfo(name)
+            if np.dtype(name).itemsize < values.dtype.itemsize and info.min <= low and high <= info.max :
+                return np.dtype(name)
+        return None
+    
+    if values.dtype == np.float64 :
+        with np.errstate(over="ignore", invalid="ignore") :
+            narrow = values.astype(np.float32)
+        same = (narrow.astype(np.float64) == values) | np.isnan(values)
+        if same.all() :
+            return np.dtype(np.float32)
+    return None
+#########################################################################
+
+#########################################################################
+@profiled
+def compact_frame(data_df) :
+    '''
+    Function to downcast the numeric columns of the data to the 
+    smallest dtypes holding their values exactly, printing what was
+    downcast and the memory used before and after
+    '''
+    
+    before = data_df.memory_usage(index=True, deep=True).sum()
+    changes = {}
+    for cid in range(data_df.shape[1]) :
+        values = data_df.iloc[:, cid].to_numpy()
+        dtype = compact_dtype(values)
+        if dtype is not None :
+            changes[cid] = (values.dtype, dtype)
+    
+    if changes :
+        data_df = data_df.copy(deep=False)
+        for cid, (old, new) in changes.items() :
+            data_df.isetitem(cid, data_df.iloc[:, cid].astype(new))
+    after = data_df.memory_usage(index=True, deep=True).sum()
+    
+    print("Compact mode :")
+    for cid, (old, new) in changes.items() :
+        print(f"\t{data_df.columns[cid]} : {old} -> {new}")
+    if not changes :
+        print("\tno column could be downcast")
+    print(f"\tmemory {before / 2**20:.2f} MB -> {after / 2**20:.2f} MB")
+    return data_df
+#########################################################################
+
+#########################################################################
+def load_data(fname, chunked=False) :
+    '''
+    Function to load a numeric CSV file, in one go or in chunks,
+    printing the appropriate errors
+    Returns the data, or None if it could not be loaded
+    '''
+    
+    if not os.path.exists(fname) :
+        print("Error - File not found")
+        return None
+    
+    ## Read the input file and check if all the values are numeric
+    ## Else, return appropriate errors as specified
+    try :
+        if chunked :
+            data_df = load_data_chunked(fname)
+        else :
+            data_df = load_data_file(fname)
+    except Exception :
+        print("Error - Unable to load data")
+        return None
+    
+    if data_df is None :
+        print("Error - All values in the file are not numeric")
+        return None
+    
+    ## Data loaded in chunks is only ever in memory one chunk at a time
+    if SETTINGS["compact"] and not chunked :
+        data_df = compact_frame(data_df)
+    
+    print("Data has been loaded successfully.")
+    return data_df
+#########################################################################
+
+#########################################################################
+@profiled
+def op1_menu_items() :
+    '''
+    Function to drive the Option - 1 submenu items
+    '''
+    
+    ## Display subitems of Option 1 menu
+    op1 = "1 – Load data from a file"
+    op2 = "2 – Go back to the main menu"
+    op3 = "3 – Load data from a file in chunks (large files)"
+    
+    op1_menu_str = f"Please choose from the following options:\n\t{op1}\n\t{op2}\n\t{op3}\n>>> "
+    op_ans = iterative_input_on_error(op1_menu_str, 1, 3)
+    
+    ## An empty dataframe to be returned 
+    ## when the user input is incorrect
+    ret_df = DF()
+    
+    ## Ask user for filename and return empty if errors
+    if op_ans == 2 :
+        return ret_df
+    elif op_ans in (1, 3) :
+        op1_1_str = "Enter file name : "
+        fname = input(op1_1_str)
+        while (not fname) :
+            fname = input(op1_1_str)
+    else :
+        print("Invalid selection!")
+        return ret_df
+       
+    data_df = load_data(fname, chunked=(op_ans == 3))
+    if data_df is None :
+        print("Returning to main menu")
+        return ret_df
+    
+    ##################################################
+    ########## Setting column name as index as per user input
+    msg = "Which column do you want to set as index? (leave blank for none)"
+    col_input = iterative_col_input_check(data_df, msg)
+    if col_input in data_df.columns :
+        data_df = data_df.set_index(col_input)
+        print(f"{col_input} set as index.")
+    else :
+        print(f"No column is set as index.")
+    ##################################################   
+
+    return data_df
+#########################################################################
+
+#########################################################################
+class DataViewer :
+    '''
+    Window of rows and columns over the data for paging through it
+    
+    Only the cells inside the window are formatted, so a display of
+    in-memory data costs the same whatever the size of the data. Data
+    loaded in chunks is read up to the end of the window
+    '''
+    
+    def __init__(self, data_df, page_rows=20, page_cols=8) :
+        self.data_df = data_df
+        self.page_rows = page_rows
+        self.page_cols = page_cols
+        self.row = 0
+        self.col = 0
+        ## Positions of the columns shown, all of them by default
+        self.col_pos = list(range(data_df.shape[1]))
+    
+    @property
+    def n_rows(self) :
+        return self.data_df.shape[0]
+    
+    def memory_str(self) :
+        if isinstance(self.data_df, ChunkedFrame) :
+            return f"streamed from {self.data_df.fname}"
+        mem = self.data_df.memory_usage(index=True).sum()
+        return f"memory {mem / 2**20:.1f} MB"
+    
+    def window(self) :
+        '''
+        Return the rows and columns of the current window as a DataFrame
+        '''
+        
+        cols = self.col_pos[self.col:self.col+self.page_cols]
+        stop = self.row + self.page_rows
+        if not isinstance(self.data_df, ChunkedFrame) :
+            return self.data_df.iloc[self.row:stop, cols]
+        
+        parts = []
+        offset = 0
+        for chunk in self.data_df.iter_chunks() :
+            if offset + chunk.shape[0] > self.row :
+                parts.append(chunk.iloc[max(self.row-offset, 0):stop-offset, cols])
+            offset += chunk.shape[0]
+            if offset >= stop :
+                break
+        if not parts :
+            return self.data_df.head(0).iloc[:, cols]
+        return CONCAT(parts)
+    
+    @profiled
+    def render(self) :
+        '''
+        Return the current window, headed by its place in the data
+        '''
+        
+        n_cols = len(self.col_pos)
+        last_row = min(self.row + self.page_rows, self.n_rows)
+        last_col = min(self.col + self.page_cols, n_cols)
+        shown = f"{n_cols}"
+        if n_cols < self.data_df.shape[1] :
+            shown = f"{n_cols} selected ({self.data_df.shape[1]} in total)"
+        header = (f"Rows {self.row+1 if self.n_rows else 0}-{last_row} of {self.n_rows} | "
+                  f"Columns {self.col+1 if n_cols else 0}-{last_col} of {shown} | "
+                  f"{self.memory_str()}")
+        return f"{header}\n{self.window().to_string()}"
+    
+    def command(self, cmd) :
+        '''
+        Move the window as per a viewer command, raising
+        ValueError for an unknown or invalid one
+        '''
+        
+        parts = cmd.split(maxsplit=1)
+        name = parts[0].lower() if parts else "n"
+        arg = parts[1] if len(parts) > 1 else ""
+        last_page = max((self.n_rows - 1) // self.page_rows * self.page_rows, 0)
+        
+        if name == "n" :
+            self.row = min(self.row + self.page_rows, last_page)
+        elif name == "p" :
+            self.row = max(self.row - self.page_rows, 0)
+        elif name == "h" :
+            self.row = 0
+        elif name == "t" :
+            self.row = max(self.n_rows - self.page_rows, 0)
+        elif name == "g" :
+            if not arg.strip().isdigit() or not 1 <= int(arg) <= max(self.n_rows, 1) :
+                raise ValueError(f"row number must be between 1 and {self.n_rows}")
+            self.row = int(arg) - 1
+        elif name == ">" :
+            if self.col + self.page_cols < len(self.col_pos) :
+                self.col += self.page_cols
+        elif name == "<" :
+            self.col = max(self.col - self.page_cols, 0)
+        elif name == "c" :
+            columns = [str(c) for c in self.data_df.columns]
+            if not arg.strip() :
+                self.col_pos = list(range(len(columns)))
+            else :
+                names = [c.strip() for c in arg.split(",")]
+                unknown = [c for c in names if c not in columns]
+                if unknown :
+                    raise ValueError(f"no column named {', '.join(unknown)}")
+                self.col_pos = [columns.index(c) for c in names]
+            self.col = 0
+        else :
+            raise ValueError(f"unknown command '{cmd}'")
+#########################################################################
+
+#########################################################################
+@profiled
+def op2_menu_items(data_df) :
+    '''
+    Function to drive the Option - 2 submenu items
+    '''
+    
+    ## Printing one window of the dataframe at a time,
+    ## moving it as per the user commands until quit
+    viewer = DataViewer(data_df, SETTINGS["view_rows"], SETTINGS["view_cols"])
+    print(viewer.render())
+    
+    msg = ("\nn/p - next/previous page, h/t - head/tail, g N - go to row N,\n"
+           "c a,b - only columns a and b (c - all), >/< - more columns, q - quit : ")
+    cmd = input(msg).strip()
+    while cmd.lower() != "q" :
+        try :
+            viewer.command(cmd)
+            print(viewer.render())
+        except ValueError as err :
+            print(f"Invalid command - {err}")
+        cmd = input(msg).strip()
+    
+    return data_df
+#########################################################################
+
+#########################################################################
+def op3_x_iterative_loop(msg):
+    '''
+    Common function to iteratively accept user input 
+    for option 3 sub menu until correct
+    '''
+    
+    ## Iteratively ask user input until a valid integer is not provided
+    ## Else, return the valid integer
+    while True :
+        val = input(msg)
+        while(not val) :
+            print("Invalid Selection!")
+            val = input(msg)
+        
+        try :
+            return int(val)
+        except ValueError :
+            print("Please enter a valid number.")
+#########################################################################
+
+
+#########################################################################
+def row_fingerprints(data_df) :
+    '''
+    Function to compute a fingerprint of every row from the hashes of
+    its columns - two uint64 arrays (hi, lo), mixing the columns' hashes
+    in two different ways for 128 bits, or lo all zeros when 
+    SETTINGS["fingerprint_bits"] is 64
+    
+    The hashes of numbers (and dates, booleans) are one-to-one, but
+    other values (strings, ...) are hashed to 64 bits, so two of them may
+    share a hash - for those columns lo mixes a second hash under an
+    independent key, so both halves only collide by chance together
+    
+    Values equal as pandas compares them (0.0 and -0.0, every NaN)
+    get the same fingerprint
+    '''
+    
+    n_rows = data_df.shape[0]
+    hi = np.full(n_rows, 0x345678, dtype=np.uint64)
+    lo = np.full(n_rows, 0x9E3779B97F4A7C15, dtype=np.uint64)
+    wide = SETTINGS["fingerprint_bits"] == 128
+    for cid in range(data_df.shape[1]) :
+        values = data_df.iloc[:, cid].to_numpy()
+        if values.dtype.kind == "f" :
+            values = values + 0.0
+        col_hash = HASH_ARRAY(values)
+        hi = (hi ^ col_hash) * np.uint64(0x100000001B3)
+        hi ^= hi >> np.uint64(29)
+        if wide :
+            if values.dtype.kind == "O" :
+                col_hash = HASH_ARRAY(values, hash_key=LO_HASH_KEY)
+            lo = (lo + col_hash) * np.uint64(0xBF58476D1CE4E5B9)
+            lo ^= lo >> np.uint64(31)
+    if not wide :
+        lo[:] = 0
+    return hi, lo
+#########################################################################
+
+#########################################################################
+class FingerprintSet :
+    '''
+    Set of row fingerprints (hi, lo uint64 pairs) for finding repeats
+    across the chunks of a pass, within a memory budget
+    
+    Fingerprints are kept in sorted runs searched with searchsorted. 
+    Runs in memory are merged pairwise as they grow (so there are only
+    a few) and, once they take more than budget bytes, merged into one 
+    run which is spilled to a memory-mapped file in a temporary directory.
+    Runs on disk are merged pairwise the same way, block by block within
+    the budget, so a lookup probes about log2(spills) runs, not one per
+    spill
+    '''
+    
+    def __init__(self, budget, spill_dir=None) :
+        self.budget = budget
+        self.spill_dir = spill_dir
+        self.tmp_dir = None
+        self.mem_runs = []
+        self.disk_runs = []
+        self.mem_bytes = 0
+        self.size = 0
+        self.n_files = 0
+    
+    def __len__(self) :
+        return self.size
+    
+    @staticmethod
+    def _merge(runs) :
+        hi = np.concatenate([run[0] for run in runs])
+        lo = np.concatenate([run[1] for run in runs])
+        order = np.lexsort((lo, hi))
+        return hi[order], lo[order]
+    
+    @staticmethod
+    def _run_contains(run, hi, lo) :
+        run_hi, run_lo = run
+        left = np.searchsorted(run_hi, hi, "left")
+        right = np.searchsorted(run_hi, hi, "right")
+        found = np.zeros(hi.size, dtype=bool)
+        one = (right - left) == 1
+        found[one] = run_lo[left[one]] == lo[one]
+        ## Distinct rows sharing the high half, very rare
+        for qid in np.flatnonzero((right - left) > 1) :
+            found[qid] = bool((run_lo[left[qid]:right[qid]] == lo[qid]).any())
+        return found
+    
+    def contains(self, hi, lo) :
+        '''
+        Return a boolean array flagging the fingerprints in the set
+        '''
+        
+        found = np.zeros(hi.size, dtype=bool)
+        for run in self.mem_runs + self.disk_runs :
+            todo = np.flatnonzero(~found)
+            if not todo.size :
+                break
+            found[todo] = self._run_contains(run, hi[todo], lo[todo])
+        return found
+    
+    def add(self, hi, lo) :
+        '''
+        Add fingerprints which are neither in the set nor repeated
+        '''
+        
+        if not hi.size :
+            return
+        self.mem_runs.append(self._merge([(hi, lo)]))
+        self.mem_bytes += 16 * hi.size
+        self.size += hi.size
+        while len(self.mem_runs) > 1 and self.mem_runs[-2][0].size <= 2 * self.mem_runs[-1][0].size :
+            self.mem_runs[-2:] = [self._merge(self.mem_runs[-2:])]
+        if self.mem_bytes > self.budget :
+            self._spill()
+    
+    def _new_disk_run(self, size) :
+        if self.tmp_dir is None :
+            self.tmp_dir = tempfile.mkdtemp(prefix="dfstat_fp_", dir=self.spill_dir)
+            weakref.finalize(self, shutil.rmtree, self.tmp_dir, True)
+        self.n_files += 1
+        paths = [os.path.join(self.tmp_dir, f"run{self.n_files}_{name}.npy") for name in ("hi", "lo")]
+        return paths, [np.lib.format.open_memmap(path, mode="w+", dtype=np.uint64, shape=(size,))
+                       for path in paths]
+    
+    def _spill(self) :
+        hi, lo = self._merge(self.mem_runs)
+        paths, disk = self._new_disk_run(hi.size)
+        disk[0][:], disk[1][:] = hi, lo
+        for each in disk :
+            each.flush()
+        del disk, hi, lo
+        self.disk_runs.append(tuple(np.load(path, mmap_mode="r") for path in paths))
+        self.mem_runs = []
+        self.mem_bytes = 0
+        while len(self.disk_runs) > 1 and self.disk_runs[-2][0].size <= 2 * self.disk_runs[-1][0].size :
+            merged = self._merge_disk(self.disk_runs[-2:])
+            ## The merged runs' maps are released before removing their files
+            old = [each.filename for run in self.disk_runs[-2:] for each in run]
+            self.disk_runs[-2:] = [merged]
+            del merged
+            for path in old :
+                os.remove(path)
+    
+    def _merge_disk(self, runs) :
+        '''
+        Merge sorted runs on disk into one, reading a block of each run at
+        a time: everything up to the smallest last key of the blocks is in
+        the blocks, so it is merged and written out before reading on
+        '''
+        
+        block = max(1024, self.budget // (32 * len(runs)))
+        total = sum(run[0].size for run in runs)
+        paths, (out_hi, out_lo) = self._new_disk_run(total)
+        pos = [0] * len(runs)
+        written = 0
+        while written < total :
+            active = [rid for rid, run in enumerate(runs) if pos[rid] < run[0].size]
+            ends = {rid : min(pos[rid] + block, runs[rid][0].size) for rid in active}
+            cut_hi, cut_lo = min((runs[rid][0][ends[rid]-1], runs[rid][1][ends[rid]-1]) for rid in active)
+            parts = []
+            for rid in active :
+                run_hi = np.asarray(runs[rid][0][pos[rid]:ends[rid]])
+                run_lo = np.asarray(runs[rid][1][pos[rid]:ends[rid]])
+                left = np.searchsorted(run_hi, cut_hi, "left")
+                right = np.searchsorted(run_hi, cut_hi, "right")
+                take = left + np.searchsorted(run_lo[left:right], cut_lo, "right")
+                parts.append((run_hi[:take], run_lo[:take]))
+                pos[rid] += take
+            hi, lo = self._merge(parts)
+            out_hi[written:written+hi.size] = hi
+            out_lo[written:written+lo.size] = lo
+            written += hi.size
+        out_hi.flush()
+        out_lo.flush()
+        del out_hi, out_lo
+        return tuple(np.load(path, mmap_mode="r") for path in paths)
+#########################################################################
+
+#########################################################################
+class CleaningPlan :
+    '''
+    Lazy record of the steps chosen in the Clean data menu
+    
+    Steps are only recorded while the menu is open and run together by
+    execute() on "Finish cleaning", in as few vectorised passes as 
+    possible: columns are tracked by position so renames become a single
+    relabel at the end, dropped columns are never filled or copied, one 
+    null mask serves every threshold and fill step, and all the row drops
+    are collected in one mask which is applied with a single copy.
+    
+    For data loaded in chunks the same steps run on every chunk, with 
+    duplicate rows tracked across chunks through a state dict
+    '''
+    
+    def __init__(self, columns) :
+        self.base_columns = list(columns)
+        ## Current name and liveness of each column, by original position
+        self.names = list(columns)
+        self.live = [True]*len(self.names)
+        self.steps = []
+    
+    def copy(self) :
+        plan = CleaningPlan(self.base_columns)
+        plan.names = list(self.names)
+        plan.live = list(self.live)
+        plan.steps = list(self.steps)
+        return plan
+    
+    @property
+    def columns(self) :
+        return [n for n, is_live in zip(self.names, self.live) if is_live]
+    
+    def _positions(self, col) :
+        return [i for i, (n, is_live) in enumerate(zip(self.names, self.live)) 
+                if is_live and n == col]
+    
+    def drop_rows(self, threshold) :
+        self.steps.append(("drop_rows", threshold))
+    
+    def fill(self, value) :
+        self.steps.append(("fill", value))
+    
+    def drop_duplicates(self) :
+        self.steps.append(("drop_duplicates", None))
+    
+    def drop_column(self, col) :
+        positions = self._positions(col)
+        for i in positions :
+            self.live[i] = False
+        self.steps.append(("drop_column", (col, positions)))
+    
+    def rename_column(self, col, new_name) :
+        positions = self._positions(col)
+        for i in positions :
+            self.names[i] = new_name
+        self.steps.append(("rename_column", (col, new_name, positions)))
+    
+    def describe(self) :
+        '''
+        Return one line of text per recorded step
+        '''
+        
+        lines = []
+        for op, arg in self.steps :
+            if op == "drop_rows" :
+                lines.append(f"Drop rows with more than {arg} missing values")
+            elif op == "fill" :
+                lines.append(f"Fill missing values with {arg}")
+            elif op == "drop_duplicates" :
+                lines.append("Drop duplicate rows")
+            elif op == "drop_column" :
+                lines.append(f"Drop column {arg[0]}")
+            elif op == "rename_column" :
+                lines.append(f"Rename column {arg[0]} to {arg[1]}")
+        return lines
+    
+    def report(self, counts, start=0) :
+        '''
+        Return the report lines of the row and value steps from
+        step number start on, given the counts returned by execute()
+        '''
+        
+        lines = []
+        for (op, arg), cnt in list(zip(self.steps, counts))[start:] :
+            if op == "drop_rows" :
+                lines.append(f"**{cnt} rows with more than {arg} missing values dropped")
+            elif op == "fill" :
+                lines.append(f"**{cnt} missing values filled with {arg}")
+            elif op == "drop_duplicates" :
+                lines.append(f"**{cnt} rows dropped")
+        return lines
+    
+    def unchanged_columns(self, counts, filled, start=0) :
+        '''
+        Return {name before step start : name after all steps} for the 
+        columns whose values the steps from start on left untouched,
+        which is none of them if any row was dropped
+        '''
+        
+        for sid, (op, arg) in enumerate(self.steps[start:], start) :
+            if op in ("drop_rows", "drop_duplicates") and counts[sid] :
+                return {}
+        
+        ## Names and liveness of the columns before step start
+        names = list(self.base_columns)
+        live = [True]*len(names)
+        for op, arg in self.steps[:start] :
+            if op == "drop_column" :
+                for i in arg[1] :
+                    live[i] = False
+            elif op == "rename_column" :
+                for i in arg[2] :
+                    names[i] = arg[1]
+        
+        changed = set()
+        for sid, positions in filled.items() :
+            if sid >= start :
+                changed.update(positions)
+        kept = [i for i in range(len(names)) 
+                if live[i] and self.live[i] and i not in changed]
+        
+        ## Only an unambiguous relabelling can be carried over
+        old_names = [names[i] for i in kept]
+        new_names = [self.names[i] for i in kept]
+        if len(set(old_names)) < len(old_names) or len(set(self.columns)) < len(self.columns) :
+            return {}
+        return dict(zip(old_names, new_names))
+    
+    @profiled
+    def find_duplicates(self, data_df, state, sid) :
+        '''
+        Return a boolean array flagging the rows which repeat an earlier 
+        row, including rows of earlier chunks when a state dict is given
+        (sid keeps the rows seen by each duplicate step apart)
+        
+        Rows are compared through their fingerprints, from one hashing
+        pass over the columns
+        '''
+        
+        hi, lo = row_fingerprints(data_df)
+        
+        ## Repeats within the block - a hash table finds the rows sharing 
+        ## the high half, which are then sorted stably so that each one 
+        ## equal to its predecessor is a later occurrence
+        shared = np.flatnonzero(SERIES(hi).duplicated(keep=False).to_numpy())
+        order = shared[np.lexsort((lo[shared], hi[shared]))]
+        same = (hi[order][1:] == hi[order][:-1]) & (lo[order][1:] == lo[order][:-1])
+        dup = np.zeros(data_df.shape[0], dtype=bool)
+        dup[order[1:][same]] = True
+        if state is None :
+            return dup
+        
+        ## Repeats of rows from earlier chunks
+        seen = state.get(("seen", sid))
+        if seen is None :
+            seen = state[("seen", sid)] = FingerprintSet(SETTINGS["memory_budget"] * 2**20,
+                                                         SETTINGS["spill_dir"])
+        first = np.flatnonzero(~dup)
+        dup[first[seen.contains(hi[first], lo[first])]] = True
+        new = np.flatnonzero(~dup)
+        seen.add(hi[new], lo[new])
+        return dup
+    
+    @profiled
+    def execute(self, data_df, state=None, filled=None) :
+        '''
+        Run the recorded steps on a DataFrame (or on one chunk, passing
+        the same state dict for every chunk of a pass)
+        
+        filled, if given, collects {step number : positions of the columns
+        whose values the fill step changed} (kept in state for chunks)
+        Returns (cleaned DataFrame, count per step)
+        '''
+        
+        if filled is None and state is not None :
+            filled = state.setdefault("filled", {})
+        
+        n_cols = len(self.base_columns)
+        ## Relabelled on a shallow copy, set_axis would copy the values
+        work = data_df.copy(deep=False)
+        work.columns = range(n_cols)
+        keep = np.ones(work.shape[0], dtype=bool)
+        live = [True]*n_cols
+        fills = [None]*n_cols
+        counts = [0]*len(self.steps)
+        
+        ## A single null-count pass serves every threshold and fill step
+        null_mask = None
+        if any(op in ("drop_rows", "fill") for op, arg in self.steps) :
+            null_mask = work.isna().to_numpy()
+        
+        for sid, (op, arg) in enumerate(self.steps) :
+            if op == "drop_rows" :
+                cols = [i for i in range(n_cols) if live[i] and fills[i] is None]
+                too_many = null_mask[:, cols].sum(axis=1) > arg
+                counts[sid] = int((keep & too_many).sum())
+                keep &= ~too_many
+            
+            elif op == "fill" :
+                cols = [i for i in range(n_cols) if live[i] and fills[i] is None]
+                col_nulls = null_mask[:, cols][keep].sum(axis=0)
+                counts[sid] = int(col_nulls.sum())
+                for i in cols :
+                    fills[i] = arg
+                if filled is not None :
+                    filled.setdefault(sid, set()).update(i for i, cnt in zip(cols, col_nulls) if cnt)
+            
+            elif op == "drop_duplicates" :
+                cols = [i for i in range(n_cols) if live[i]]
+                rows = np.flatnonzero(keep)
+                subset = work.iloc[rows, cols]
+                subset = subset.fillna({i : fills[i] for i in cols if fills[i] is not None})
+                dup = self.find_duplicates(subset, state, sid)
+                keep[rows[dup]] = False
+                counts[sid] = int(dup.sum())
+            
+            elif op == "drop_column" :
+                for i in arg[1] :
+                    live[i] = False
+        
+        ## One copy of the surviving rows and columns, then the fills
+        ## of columns which still have missing values and the renames
+        cols = [i for i in range(n_cols) if live[i]]
+        owned = False
+        if not keep.all() :
+            work = work.iloc[np.flatnonzero(keep), cols]
+            owned = True
+        elif len(cols) < n_cols :
+            work = work.iloc[:, cols]
+            owned = True
+        fill_vals = {i : fills[i] for i in cols if fills[i] is not None}
+        if fill_vals and null_mask[:, list(fill_vals)].any() :
+            ## Compact float32 columns widen for a value they cannot hold
+            wide = {i : "float64" for i, val in fill_vals.items() 
+                    if work[i].dtype == np.float32 and float(np.float32(val)) != val}
+            if wide :
+                work = work.astype(wide)
+                owned = True
+            ## The copy made above is filled in place, the caller's data never
+            if owned :
+                work.fillna(fill_vals, inplace=True)
+            else :
+                work = work.fillna(fill_vals)
+        
+        if state is not None :
+            totals = state.setdefault("counts", [0]*len(self.steps))
+            for sid, cnt in enumerate(counts) :
+                totals[sid] += cnt
+        work.columns = [self.names[i] for i in cols]
+        return work, counts
+#########################################################################
+
+#########################################################################
+def new_cleaning_plan(data_df) :
+    '''
+    Common function to start a cleaning plan for the data, carrying on
+    from the plan already attached to data loaded in chunks
+    '''
+    
+    if isinstance(data_df, ChunkedFrame) and data_df.plan is not None :
+        return data_df.plan.copy()
+    return CleaningPlan(data_df.columns)
+#########################################################################
+
+#########################################################################
+@profiled
+def finish_cleaning(data_df, plan) :
+    '''
+    Function to run the recorded cleaning steps, 
+    printing what each step changed
+    '''
+    
+    ## Steps of earlier cleaning sessions of chunked data are already
+    ## part of its plan, only the new ones are reported
+    done = 0
+    if isinstance(data_df, ChunkedFrame) and data_df.plan is not None :
+        done = len(data_df.plan.steps)
+    if len(plan.steps) == done :
+        return data_df
+    
+    old_df = data_df
+    if isinstance(data_df, ChunkedFrame) :
+        ## The steps are attached to the handle and re-applied on every
+        ## pass, this first pass only counts the rows which survive
+        data_df = data_df.with_plan(plan)
+        state = {}
+        n_rows = 0
+        for chunk in data_df.iter_chunks(progress=print_load_progress, state=state) :
+            n_rows += chunk.shape[0]
+        print()
+        data_df.n_rows = n_rows
+        counts = state.get("counts", [0]*len(plan.steps))
+        filled = state.get("filled", {})
+    else :
+        filled = {}
+        data_df, counts = plan.execute(data_df, filled=filled)
+    
+    ## Statistics of the columns left untouched stay valid
+    STATS_CACHE.carry_over(old_df, data_df, plan.unchanged_columns(counts, filled, done))
+    
+    for line in plan.report(counts, done) :
+        print(line)
+    print(DataViewer(data_df, SETTINGS["view_rows"], SETTINGS["view_cols"]).render())
+    return data_df
+#########################################################################
+
+#########################################################################
+def print_cleaning_plan(plan) :
+    '''
+    Common function to display the pending cleaning steps
+    '''
+    
+    print("Pending cleaning steps (run on finish):")
+    for sid, line in enumerate(plan.describe(), 1) :
+        print(f"\t{sid}. {line}")
+#########################################################################
+
+#########################################################################
+@profiled
+def op3_menu_items(data_df) :
+    '''
+    Function to drive the Option - 3 submenu items
+    
+    The chosen steps are recorded in a CleaningPlan and
+    only run, all together, on "Finish cleaning"
+    '''
+    
+    ## Displaying the suboptiopns of Option 3 for cleaning data
+    print("\nCleaning ..")
+    print(DataViewer(data_df, SETTINGS["view_rows"], SETTINGS["view_cols"]).render())
+    plan = new_cleaning_plan(data_df)
+    
+    op1 = "1 – Drop rows with missing values"
+    op2 = "2 – Fill missing values"
+    op3 = "3 – Drop duplicate rows"
+    op4 = "4 – Drop column"
+    op5 = "5 – Rename column"
+    op6 = "6 – Finish cleaning"
+    
+    op3_menu_str = f"\nCleaning data:\n\t{op1}\n\t{op2}\n\t{op3}\n\t{op4}\n\t{op5}\n\t{op6}\n>>> "
+    
+    ## For each suboption provided by user,
+    ## Record the specified step to clean the data accordingly
+    ## until the user finishes cleaning
+    op_ans = 0
+    while op_ans != 6 :
+        op_ans = iterative_input_on_error(op3_menu_str, 1, 6)
+        
+        ## Suboption1 - Drop rows as per the threshold for non null values
+        ## Rows with more null values than the threshold are dropped
+        if op_ans == 1 :
+            msg = "Enter the threshold for dropping rows: "
+            thrshold = op3_x_iterative_loop(msg)
+            plan.drop_rows(thrshold)
+            print_cleaning_plan(plan)
+        
+        ## Ask user input for replacing null values with 
+        elif op_ans == 2 :
+            msg = "Enter the replacement value: "
+            fillna_val = op3_x_iterative_loop(msg)
+            plan.fill(fillna_val)
+            print_cleaning_plan(plan)
+        
+        ## Drop all the duplicate rows if any  
+        elif op_ans == 3 :
+            plan.drop_duplicates()
+            print_cleaning_plan(plan)
+            
+        ## Drop a specific columns
+        elif op_ans == 4 :
+            msg = "Which column do you want to drop? (leave blank for none)"
+            col_input = iterative_col_input_check(plan, msg)
+            if col_input in plan.columns :
+                plan.drop_column(col_input)
+                print(f"{col_input} is dropped.")
+            else :
+                print(f"No column dropped.")
+
+        # Rename a specific columns by asking as user input (both col and new name)
+        elif op_ans == 5 :
+            msg = "Which column do you want to rename? (leave blank for none)"
+            col_input = iterative_col_input_check(plan, msg)
+            if not col_input :
+                print(f"No column selected to rename.")
+            
+            elif col_input in plan.columns :
+                msg = "Enter the new column name to rename? (Don't leave as blank) : "
+                new_name = input(msg)
+                while (not new_name) :
+                    new_name = input(msg)
+                plan.rename_column(col_input, new_name)
+    
+    ## Finish clearing, running the recorded steps 
+    ## and exiting the process back to main menu
+    data_df = finish_cleaning(data_df, plan)
+    print("Finished cleaning")
+    
+    return data_df
+#########################################################################
+   
+#########################################################################
+class ColumnMoments :
+    '''
+    Mergeable per-column accumulators (count, mean, M2, min, max)
+    
+    Each update() computes the moments of a block of rows for all the 
+    columns at once and merges them with the parallel form of Welford's
+    algorithm, so statistics can be built from chunks or partitions
+    of the data and combined with merge()
+    '''
+    
+    def __init__(self, n_cols) :
+        self.n_rows = 0
+        self.count = np.zeros(n_cols)
+        self.mean = np.zeros(n_cols)
+        self.m2 = np.zeros(n_cols)
+        self.min = np.full(n_cols, np.inf)
+        self.max = np.full(n_cols, -np.inf)
+    
+    def update(self, values) :
+        '''
+        Add a 2-D float64 block of rows (NaN for missing values)
+        '''
+        
+        other = ColumnMoments(values.shape[1])
+        other.n_rows = values.shape[0]
+        with np.errstate(invalid="ignore", divide="ignore") :
+            other.count = (~np.isnan(values)).sum(axis=0).astype(np.float64)
+            other.mean = np.nansum(values, axis=0) / other.count
+            other.m2 = np.nansum((values - other.mean)**2, axis=0)
+        if values.shape[0] :
+            other.min = np.fmin.reduce(values, axis=0)
+            other.max = np.fmax.reduce(values, axis=0)
+        self.merge(other)
+    
+    def merge(self, other) :
+        '''
+        Combine the moments of another partition into this one
+        '''
+        
+        count = self.count + other.count
+        with np.errstate(invalid="ignore", divide="ignore") :
+            delta = other.mean - self.mean
+            mean = self.mean + delta * (other.count / count)
+            m2 = self.m2 + other.m2 + delta**2 * (self.count * other.count / count)
+        ## Partitions without any value for a column keep the other side
+        self.mean = np.where(self.count == 0, other.mean, np.where(other.count == 0, self.mean, mean))
+        self.m2 = np.where(self.count == 0, other.m2, np.where(other.count == 0, self.m2, m2))
+        self.count = count
+        self.n_rows += other.n_rows
+        self.min = np.fmin(self.min, other.min)
+        self.max = np.fmax(self.max, other.max)
+    
+    def stats(self) :
+        '''
+        Return {stat name : array} for min, max, mean, std and sem,
+        using NaN wherever pandas would (no values, or n < 2 for std)
+        '''
+        
+        empty = self.count == 0
+        with np.errstate(invalid="ignore", divide="ignore") :
+            var = np.where(self.count > 1, self.m2 / (self.count - 1), np.nan)
+            std = np.sqrt(var)
+            return {
+                "min" : np.where(empty, np.nan, self.min),
+                "max" : np.where(empty, np.nan, self.max),
+                "mean" : np.where(empty, np.nan, self.mean),
+                "std" : std,
+                "sem" : std / np.sqrt(self.count),
+            }
+#########################################################################
+
+#########################################################################
+class KLLSketch :
+    '''
+    Mergeable KLL quantile sketch of one column
+    
+    Values are kept in a stack of compactors, an item at level h standing
+    for 2**h original values. A full compactor is sorted and every other
+    item (random offset) is promoted to the next level, so memory stays 
+    around O(k log(n/k)) items whatever the number of values. The typical
+    rank error of a quantile is about 1.7/k of n, but the worst of many
+    quantiles and runs reaches twice that, so the bound eps takes k = 4/eps
+    (k = 400 for 1%)
+    '''
+    
+    def __init__(self, k=400, seed=None) :
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0)]
+        self.rng = np.random.default_rng(seed)
+    
+    @classmethod
+    def for_error(cls, eps, seed=None) :
+        '''
+        Return a sketch sized so that the rank error of every quantile
+        stays within eps of n (measured at up to 0.8 eps, percentiles 
+        1 to 99 over 20 to 60 seeded runs of 300k values in 3000 updates)
+        '''
+        return cls(k=max(16, int(np.ceil(4/eps))), seed=seed)
+    
+    def _capacity(self, level) :
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2/3)**depth)))
+    
+    def _compress(self) :
+        level = 0
+        while level < len(self.levels) :
+            items = self.levels[level]
+            if items.size > self._capacity(level) :
+                if level + 1 == len(self.levels) :
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                ## An odd item out stays behind at this level
+                keep = items[:items.size % 2]
+                offset = self.rng.integers(2)
+                promoted = items[keep.size+offset::2]
+                self.levels[level] = keep
+                self.levels[level+1] = np.concatenate([self.levels[level+1], promoted])
+                ## Capacities shift when a level is added, so start over
+                level = 0
+                continue
+            level += 1
+    
+    def update(self, values) :
+        '''
+        Add a 1-D array of values, missing values (NaN) are skipped
+        '''
+        
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        self.n += values.size
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+    
+    def merge(self, other) :
+        '''
+        Fold another sketch of the same column into this one
+        '''
+        
+        while len(self.levels) < len(other.levels) :
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels) :
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self._compress()
+    
+    def quantiles(self, qs) :
+        '''
+        Return the approximate values at the quantiles qs (0 to 1),
+        interpolated like numpy's default linear method
+        '''
+        
+        qs = np.asarray(qs, dtype=np.float64)
+        if self.n == 0 :
+            return np.full(qs.shape, np.nan)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(lv.size, 2.0**h) for h, lv in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        items = items[order]
+        ## Rank of the middle of each item's weight, scaled to 0..n-1
+        ranks = np.cumsum(weights[order]) - weights[order]/2 - 0.5
+        if items.size > 1 :
+            ranks *= (self.n - 1) / ranks[-1]
+        return np.interp(qs*(self.n - 1), ranks, items)
+#########################################################################
+
+#########################################################################
+def new_column_sketches(n_cols) :
+    '''
+    Common function to create one quantile sketch per column,
+    sized for SETTINGS["quantile_error"]
+    '''
+    
+    return [KLLSketch.for_error(SETTINGS["quantile_error"]) for _ in range(n_cols)]
+#########################################################################
+
+#########################################################################
+def add_exact_quantiles(stats, values) :
+    '''
+    Common function to add the exact median and percentiles of a
+    2-D float64 block of values to stats (appending per column)
+    '''
+    
+    ## nanmedian warns about all-NaN columns, pandas quietly gives NaN
+    with warnings.catch_warnings() :
+        warnings.simplefilter("ignore", RuntimeWarning)
+        stats.setdefault("median", []).extend(np.nanmedian(values, axis=0))
+        pcts = stats.setdefault("percentiles", {})
+        for q in SETTINGS["percentiles"] :
+            pcts.setdefault(q, []).extend(np.nanpercentile(values, q, axis=0))
+#########################################################################
+
+#########################################################################
+def add_sketch_quantiles(stats, sketches) :
+    '''
+    Common function to add the approximate median and percentiles 
+    of every column's sketch to stats
+    '''
+    
+    qs = [0.5] + [q/100 for q in SETTINGS["percentiles"]]
+    values = np.array([sketch.quantiles(qs) for sketch in sketches]).reshape(len(sketches), len(qs))
+    stats["median"] = list(values[:, 0])
+    stats["percentiles"] = {q : list(values[:, qid+1]) 
+                            for qid, q in enumerate(SETTINGS["percentiles"])}
+#########################################################################
+
+#########################################################################
+def column_block_stats(values) :
+    '''
+    Common function to compute the statistics of every column of a
+    2-D float64 block of values (NaN for missing values)
+    '''
+    
+    moments = ColumnMoments(values.shape[1])
+    moments.update(values)
+    stats = {k : list(v) for k, v in moments.stats().items()}
+    
+    if SETTINGS["approx_quantiles"] :
+        sketches = new_column_sketches(values.shape[1])
+        for cid, sketch in enumerate(sketches) :
+            sketch.update(values[:, cid])
+        add_sketch_quantiles(stats, sketches)
+    else :
+        add_exact_quantiles(stats, values)
+    
+    return stats
+#########################################################################
+
+#########################################################################
+def mapped_column_stats(path, shape, cols, settings) :
+    '''
+    Worker function computing the statistics of the columns cols of the
+    column-major float64 array held in the memory-mapped file path
+    Returns (stats, CPU seconds spent)
+    '''
+    
+    cpu_start = time.process_time()
+    SETTINGS.update(settings)
+    values = np.memmap(path, dtype=np.float64, mode="r", shape=shape, order="F")
+    stats = column_block_stats(values[:, cols[0]:cols[1]])
+    del values
+    return stats, time.process_time() - cpu_start
+#########################################################################
+
+#########################################################################
+@profiled
+def parallel_column_stats(data_df) :
+    '''
+    Function to compute the statistics of every column on a pool of
+    SETTINGS["workers"] processes, each taking a group of columns
+    
+    The values are copied once into a memory-mapped temporary file that
+    the workers map instead of receiving pickled copies (a file rather
+    than shared memory, which the resource tracker of Python before 3.13
+    would report as leaked or unlink twice), and the groups' results are
+    joined back in column order. Prints the effective parallelism - the
+    CPU time the workers spent over the wall time of the call - and with
+    SETTINGS["parallel_speedup"] the speedup over the same statistics
+    timed on one core
+    '''
+    
+    from concurrent.futures import ProcessPoolExecutor
+    
+    n_rows, n_cols = data_df.shape
+    start = time.perf_counter()
+    fd, path = tempfile.mkstemp(suffix=".f64", prefix="dfstat_", dir=SETTINGS["spill_dir"])
+    os.close(fd)
+    try :
+        values = np.memmap(path, dtype=np.float64, mode="w+", shape=(n_rows, n_cols), order="F")
+        for cid in range(n_cols) :
+            values[:, cid] = data_df.iloc[:, cid].to_numpy(dtype=np.float64, na_value=np.nan)
+        values.flush()
+        del values
+        
+        bounds = np.linspace(0, n_cols, min(SETTINGS["workers"], n_cols) + 1).astype(int)
+        groups = [(lo, hi) for lo, hi in zip(bounds[:-1], bounds[1:])]
+        settings = {k : SETTINGS[k] for k in ("approx_quantiles", "quantile_error", "percentiles")}
+        with ProcessPoolExecutor(max_workers=len(groups)) as pool :
+            results = list(pool.map(mapped_column_stats, [path]*len(groups), 
+                                     [(n_rows, n_cols)]*len(groups), groups, 
+                                     [settings]*len(groups)))
+    finally :
+        os.remove(path)
+    
+    stats = {}
+    for group_stats, _ in results :
+        for name, vals in group_stats.items() :
+            if name == "percentiles" :
+                for q, v in vals.items() :
+                    stats.setdefault(name, {}).setdefault(q, []).extend(v)
+            else :
+                stats.setdefault(name, []).extend(vals)
+    
+    elapsed = time.perf_counter() - start
+    busy = sum(cpu for _, cpu in results)
+    report = (f"statistics of {n_cols} column(s) computed on {len(groups)} processes in "
+              f"{elapsed:.2f} s, {busy:.2f} CPU s in the workers, "
+              f"effective parallelism {busy/max(elapsed, 1e-9):.1f}x")
+    if SETTINGS["parallel_speedup"] :
+        ## Serial reference - the same statistics of the same values on one core
+        serial_start = time.perf_counter()
+        column_block_stats(data_df.to_numpy(dtype=np.float64, na_value=np.nan))
+        serial = time.perf_counter() - serial_start
+        report += f", {serial:.2f} s on one core - speedup {serial/max(elapsed, 1e-9):.2f}x"
+    print(f"({report})\n")
+    return stats
+#########################################################################
+
+#########################################################################
+@profiled
+def compute_column_stats(data_df) :
+    '''
+    Function to compute min, max, mean, median, standard deviation and 
+    standard error of the mean of every column in one vectorised pass,
+    or spread over a process pool when SETTINGS["parallel"] is on
+    Returns {stat name : list with one value per column}, plus
+    "percentiles" : {percentile : list} for SETTINGS["percentiles"]
+    '''
+    
+    ## An empty file cannot be mapped, nor is it worth a pool
+    if SETTINGS["parallel"] and SETTINGS["workers"] > 1 and data_df.shape[1] > 1 and data_df.shape[0] :
+        stats = parallel_column_stats(data_df)
+    else :
+        stats = column_block_stats(data_df.to_numpy(dtype=np.float64, na_value=np.nan))
+    
+    ## Integer columns report min and max in their own type, as pandas does
+    for cid, dtype in enumerate(data_df.dtypes) :
+        if np.issubdtype(dtype, np.integer) and data_df.shape[0] :
+            stats["min"][cid] = data_df.iloc[:, cid].min()
+            stats["max"][cid] = data_df.iloc[:, cid].max()
+    
+    return stats
+#########################################################################
+
+#########################################################################
+class CorrelationCollector :
+    '''
+    Collector of correlation tiles, either into the full matrix or,
+    when top_k or threshold is set, into a bounded list of the most
+    correlated column pairs so the full matrix is never materialised
+    
+    Tiles can be added from several threads at once
+    '''
+    
+    def __init__(self, n_rows, n_cols, top_k=0, threshold=None, dtype="float64") :
+        self.top_k = top_k
+        self.threshold = threshold
+        self.full = not top_k and threshold is None
+        self.lock = threading.Lock()
+        if self.full :
+            self.matrix = np.full((n_rows, n_cols), np.nan, dtype=dtype)
+        ## Candidate pairs (i, j, r) with i < j
+        self.pairs = (np.empty(0, np.intp), np.empty(0, np.intp), np.empty(0))
+    
+    def add(self, row_idx, col_idx, tile, row_pos=None) :
+        '''
+        Add the tile of correlations between the columns row_idx and 
+        col_idx, row_pos giving its rows' place in the full matrix
+        '''
+        
+        if self.full :
+            rows = row_idx if row_pos is None else row_pos
+            self.matrix[np.ix_(rows, col_idx)] = tile
+            return
+        
+        ## Each pair once, strongest first
+        ii, jj = np.nonzero(row_idx[:, None] < col_idx[None, :])
+        vals = tile[ii, jj].astype(np.float64)
+        keep = ~np.isnan(vals)
+        if self.threshold is not None :
+            keep &= np.abs(vals) >= self.threshold
+        ii, jj, vals = ii[keep], jj[keep], vals[keep]
+        if self.top_k and vals.size > self.top_k :
+            best = np.argpartition(-np.abs(vals), self.top_k - 1)[:self.top_k]
+            ii, jj, vals = ii[best], jj[best], vals[best]
+        
+        with self.lock :
+            pi, pj, pv = self.pairs
+            pi = np.concatenate([pi, row_idx[ii]])
+            pj = np.concatenate([pj, col_idx[jj]])
+            pv = np.concatenate([pv, vals])
+            if self.top_k and pv.size > self.top_k :
+                best = np.argpartition(-np.abs(pv), self.top_k - 1)[:self.top_k]
+                pi, pj, pv = pi[best], pj[best], pv[best]
+            self.pairs = (pi, pj, pv)
+    
+    def result(self, columns, row_columns=None) :
+        '''
+        Return the correlation matrix as a DataFrame, or the pairs 
+        as a DataFrame sorted from the strongest correlation down
+        '''
+        
+        if self.full :
+            index = columns if row_columns is None else row_columns
+            return DF(self.matrix, index=index, columns=columns)
+        pi, pj, pv = self.pairs
+        order = np.lexsort((pj, pi, -np.abs(pv)))
+        columns = np.asarray(columns, dtype=object)
+        return DF({
+            "column 1" : columns[pi[order]],
+            "column 2" : columns[pj[order]],
+            "correlation" : pv[order],
+        })
+#########################################################################
+
+#########################################################################
+def blocked_correlation(values, collector, rows=None, dtype="float64", block=512, workers=1) :
+    '''
+    Function to compute the Pearson correlations of the columns of a
+    2-D float64 array tile by tile, feeding them to a CorrelationCollector
+    
+    The columns are centred on their means and compared block against
+    block (block columns at a time) so only two blocks of the data and
+    one tile are transformed at any time, the blocks being spread over
+    a pool of threads (the matrix products release the GIL). Missing
+    values give the pairwise-complete correlation, as pandas' corr(),
+    through masked products. rows restricts the output to those columns'
+    rows of the matrix
+    '''
+    
+    n_rows, n_cols = values.shape
+    has_nan = bool(np.isnan(values).any())
+    with warnings.catch_warnings() :
+        warnings.simplefilter("ignore", RuntimeWarning)
+        means = np.nanmean(values, axis=0) if n_rows else np.zeros(n_cols)
+    means = np.nan_to_num(means)
+    
+    def prepare(cols) :
+        data = values[:, cols] - means[cols]
+        if not has_nan :
+            data = data.astype(dtype, copy=False)
+            with np.errstate(invalid="ignore", divide="ignore") :
+                norms = np.sqrt((data.astype(np.float64)**2).sum(axis=0))
+            return data, None, norms
+        mask = ~np.isnan(data)
+        data = np.where(mask, data, 0).astype(dtype, copy=False)
+        return data, mask.astype(dtype), None
+    
+    def tile(left, right) :
+        x, mx, x_norms = left
+        y, my, y_norms = right
+        with np.errstate(invalid="ignore", divide="ignore") :
+            if mx is None :
+                return (x.T @ y) / np.outer(x_norms, y_norms)
+            cnt = mx.T @ my
+            sx = x.T @ my
+            sy = mx.T @ y
+            cov = x.T @ y - sx*sy/cnt
+            var_x = (x*x).T @ my - sx*sx/cnt
+            var_y = mx.T @ (y*y) - sy*sy/cnt
+            return cov / np.sqrt(var_x*var_y)
+    
+    all_blocks = [np.arange(start, min(start+block, n_cols)) for start in range(0, n_cols, block)]
+    if rows is None :
+        row_blocks = all_blocks
+    else :
+        rows = np.asarray(rows, dtype=np.intp)
+        row_blocks = [np.arange(start, min(start+block, rows.size)) for start in range(0, rows.size, block)]
+    
+    def process(row_block) :
+        row_idx = row_block if rows is None else rows[row_block]
+        left = prepare(row_idx)
+        for col_idx in all_blocks :
+            ## The lower triangle of the full matrix mirrors the upper one
+            if rows is None and col_idx[-1] < row_idx[0] :
+                continue
+            right = left if col_idx is row_block else prepare(col_idx)
+            corr = np.clip(tile(left, right), -1.0, 1.0)
+            ## A column always correlates perfectly with itself
+            same = np.nonzero(row_idx[:, None] == col_idx[None, :])
+            corr[same] = np.where(np.isnan(corr[same]), np.nan, 1.0)
+            if rows is None :
+                collector.add(row_idx, col_idx, corr)
+                if collector.full and col_idx[0] > row_idx[-1] :
+                    collector.add(col_idx, row_idx, corr.T)
+            else :
+                collector.add(row_idx, col_idx, corr, row_pos=row_block)
+    
+    if workers > 1 and len(row_blocks) > 1 :
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=workers) as pool :
+            list(pool.map(process, row_blocks))
+    else :
+        for row_block in row_blocks :
+            process(row_block)
+    return collector
+#########################################################################
+
+#########################################################################
+def new_correlation_collector(n_rows, n_cols, full=False) :
+    '''
+    Common function to create a collector for the correlation
+    output mode chosen in SETTINGS
+    '''
+    
+    if full :
+        return CorrelationCollector(n_rows, n_cols, dtype=SETTINGS["corr_dtype"])
+    return CorrelationCollector(n_rows, n_cols, SETTINGS["corr_top"], 
+                                SETTINGS["corr_threshold"], SETTINGS["corr_dtype"])
+#########################################################################
+
+#########################################################################
+def top_pairs_mode() :
+    '''
+    Common function telling whether the correlations are reported
+    as the strongest column pairs rather than the full matrix
+    '''
+    
+    return bool(SETTINGS["corr_top"]) or SETTINGS["corr_threshold"] is not None
+#########################################################################
+
+#########################################################################
+@profiled
+def compute_correlation(data_df, values=None, rows=None, full=False) :
+    '''
+    Function to compute the Pearson correlation matrix, or only its
+    rows for the given columns (all the columns if rows is None),
+    with the blocked correlation engine
+    In top pairs mode the strongest pairs are returned instead of the
+    matrix, unless rows are given or full is set
+    '''
+    
+    if values is None :
+        values = data_df.to_numpy(dtype=np.float64, na_value=np.nan)
+    n_cols = values.shape[1]
+    row_pos = None
+    if rows is not None :
+        row_pos = [data_df.columns.get_loc(c) for c in rows]
+    collector = new_correlation_collector(n_cols if rows is None else len(rows), n_cols, 
+                                          full=full or rows is not None)
+    blocked_correlation(values, collector, row_pos, dtype=SETTINGS["corr_dtype"],
+                        block=SETTINGS["corr_block"], workers=SETTINGS["workers"])
+    return collector.result(data_df.columns, None if rows is None else data_df.columns[row_pos])
+#########################################################################
+
+#########################################################################
+class CoMoments :
+    '''
+    Mergeable co-moment accumulators of all the column pairs, from which
+    the correlation matrix of chunked data is built
+    
+    While no value is missing a single mean per column and the m x m 
+    co-moment matrix are enough. The first missing value switches to the
+    pairwise-complete form, as pandas' corr(), which keeps the count,
+    mean of x and M2 of x of every pair (those of y being the transposes)
+    '''
+    
+    def __init__(self, n_cols) :
+        self.n_cols = n_cols
+        self.pairwise = False
+        self.n = 0
+        self.mean = np.zeros(n_cols)
+        self.c = np.zeros((n_cols, n_cols))
+    
+    def _to_pairwise(self) :
+        m = self.n_cols
+        self.n = np.full((m, m), float(self.n))
+        self.mean = np.broadcast_to(self.mean[:, None], (m, m)).copy()
+        self.m2 = np.broadcast_to(np.diag(self.c)[:, None], (m, m)).copy()
+        self.pairwise = True
+    
+    def update(self, values) :
+        '''
+        Add a 2-D float64 block of rows (NaN for missing values)
+        '''
+        
+        if not values.shape[0] :
+            return
+        if not self.pairwise and not np.isnan(values).any() :
+            n_b = values.shape[0]
+            mean_b = values.mean(axis=0)
+            centred = values - mean_b
+            c_b = centred.T @ centred
+            n = self.n + n_b
+            delta = mean_b - self.mean
+            self.c += c_b + np.outer(delta, delta) * (self.n * n_b / n)
+            self.mean += delta * (n_b / n)
+            self.n = n
+            return
+        
+        if not self.pairwise :
+            self._to_pairwise()
+        ## Shift by the chunk means to keep the raw sums small
+        mask = ~np.isnan(values)
+        with warnings.catch_warnings() :
+            warnings.simplefilter("ignore", RuntimeWarning)
+            shift = np.nan_to_num(np.nanmean(values, axis=0))
+        x = np.where(mask, values - shift, 0)
+        mk = mask.astype(np.float64)
+        n_b = mk.T @ mk
+        with np.errstate(invalid="ignore", divide="ignore") :
+            mean_s = (x.T @ mk) / n_b
+            mean_s = np.where(n_b > 0, mean_s, 0)
+            m2_b = (x*x).T @ mk - n_b * mean_s**2
+            c_b = x.T @ x - n_b * mean_s * mean_s.T
+            mean_b = mean_s + shift[:, None]
+            
+            n = self.n + n_b
+            delta = mean_b - self.mean
+            frac = np.where(n > 0, n_b / n, 0)
+            weight = np.where(n > 0, self.n * n_b / n, 0)
+        self.c = self.c + c_b + delta * delta.T * weight
+        self.m2 = self.m2 + m2_b + delta**2 * weight
+        self.mean = self.mean + delta * frac
+        self.n = n
+    
+    def corr_rows(self, start, stop) :
+        '''
+        Return rows start:stop of the correlation matrix
+        '''
+        
+        with np.errstate(invalid="ignore", divide="ignore") :
+            if not self.pairwise :
+                var = np.diag(self.c)
+                corr = self.c[start:stop] / np.sqrt(np.outer(var[start:stop], var))
+            else :
+                corr = self.c[start:stop] / np.sqrt(self.m2[start:stop] * self.m2.T[start:stop])
+        corr = np.clip(corr, -1.0, 1.0)
+        idx = np.arange(start, stop)
+        diag = corr[idx-start, idx]
+        corr[idx-start, idx] = np.where(np.isnan(diag), np.nan, 1.0)
+        return corr
+    
+    def collect(self, collector, block=512) :
+        '''
+        Feed the correlation matrix to a collector a block of rows
+        at a time
+        '''
+        
+        all_idx = np.arange(self.n_cols)
+        for start in range(0, self.n_cols, block) :
+            stop = min(start+block, self.n_cols)
+            collector.add(np.arange(start, stop), all_idx, self.corr_rows(start, stop))
+        return collector
+#########################################################################
+
+#########################################################################
+@profiled
+def compute_chunked_correlation(data_df, comoments=None) :
+    '''
+    Function to compute the correlation matrix (or the top pairs) of a
+    ChunkedFrame from the co-moments of its chunks, reading the chunks
+    unless the co-moments were already gathered, e.g. by the statistics pass
+    '''
+    
+    if comoments is None :
+        comoments = CoMoments(len(data_df.columns))
+        for chunk in data_df.iter_chunks(progress=print_load_progress) :
+            comoments.update(chunk.to_numpy(dtype=np.float64, na_value=np.nan))
+        print()
+    n_cols = comoments.n_cols
+    collector = new_correlation_collector(n_cols, n_cols)
+    comoments.collect(collector, SETTINGS["corr_block"])
+    return collector.result(data_df.columns)
+#########################################################################
+
+#########################################################################
+def select_column_ranks(data_df, column, ranks, count, vmin, vmax, budget_rows, n_buckets=1024) :
+    '''
+    Function to find the values at the given ranks (0 based, among the
+    count non-missing values between vmin and vmax) of one column of a
+    ChunkedFrame longer than budget_rows
+    
+    Each pass over the column counts the values of the range still
+    holding the rank in n_buckets buckets, and narrows the range to
+    the bucket of the rank, until the values left in it fit in
+    budget_rows and are sorted in memory
+    Returns {rank : value}
+    '''
+    
+    def range_values(lo, hi, hi_open) :
+        for chunk in data_df.iter_chunks(columns=[column]) :
+            values = chunk.to_numpy(dtype=np.float64, na_value=np.nan).ravel()
+            yield values[(values >= lo) & ((values < hi) if hi_open else (values <= hi))]
+    
+    found = {}
+    for rank in sorted(set(ranks)) :
+        lo, hi, hi_open, below = vmin, vmax, False, 0
+        size, low, high = count, vmin, vmax
+        while low < high and size > budget_rows :
+            edges = np.linspace(low, high, n_buckets + 1)
+            counts = np.zeros(n_buckets, dtype=np.int64)
+            bucket_min = np.full(n_buckets, np.inf)
+            bucket_max = np.full(n_buckets, -np.inf)
+            for values in range_values(lo, hi, hi_open) :
+                bid = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, n_buckets - 1)
+                counts += np.bincount(bid, minlength=n_buckets)
+                np.minimum.at(bucket_min, bid, values)
+                np.maximum.at(bucket_max, bid, values)
+            cum = np.cumsum(counts)
+            bid = int(np.searchsorted(cum, rank - below, side="right"))
+            below += int(cum[bid-1]) if bid else 0
+            lo, hi, hi_open = edges[bid], edges[bid+1], bid < n_buckets - 1
+            size, low, high = int(counts[bid]), bucket_min[bid], bucket_max[bid]
+        if low == high :
+            found[rank] = low
+        else :
+            values = np.sort(np.concatenate(list(range_values(lo, hi, hi_open))))
+            found[rank] = values[rank - below]
+    return found
+#########################################################################
+
+#########################################################################
+def add_selected_quantiles(stats, data_df, columns, moments, budget_rows) :
+    '''
+    Common function to add the exact median and percentiles of the
+    columns of a ChunkedFrame to stats, one column at a time by
+    select_column_ranks, interpolated like numpy's default method
+    '''
+    
+    qs = [0.5] + [q/100 for q in SETTINGS["percentiles"]]
+    per_q = [[] for _ in qs]
+    for cid, column in enumerate(columns) :
+        count = int(moments.count[cid])
+        if count == 0 :
+            for vals in per_q :
+                vals.append(np.nan)
+            continue
+        positions = [q * (count - 1) for q in qs]
+        ranks = [int(np.floor(pos)) for pos in positions] + [int(np.ceil(pos)) for pos in positions]
+        found = select_column_ranks(data_df, column, ranks, count, moments.min[cid],
+                                    moments.max[cid], budget_rows)
+        for vals, pos in zip(per_q, positions) :
+            below, above = found[int(np.floor(pos))], found[int(np.ceil(pos))]
+            vals.append(below + (pos - np.floor(pos)) * (above - below))
+    stats["median"] = per_q[0]
+    stats["percentiles"] = {q : vals for q, vals in zip(SETTINGS["percentiles"], per_q[1:])}
+#########################################################################
+
+#########################################################################
+@profiled
+def compute_chunked_stats(data_df, columns=None, comoments=None) :
+    '''
+    Function to compute the statistics of the columns (all of them 
+    if None) of a ChunkedFrame, merging the moments of one chunk at a time
+    A CoMoments of the same columns, if given, is fed in the same pass
+    
+    In approximate mode the median and percentiles come from sketches 
+    fed in the same pass. The exact ones need the values of a column in
+    memory, so the columns are read back in groups that fit in 
+    SETTINGS["memory_budget"], or, when a single column does not fit, 
+    selected on disk by add_selected_quantiles
+    Returns {stat name : list with one value per column}
+    '''
+    
+    if columns is None :
+        columns = data_df.columns
+    moments = ColumnMoments(len(columns))
+    sketches = new_column_sketches(len(columns)) if SETTINGS["approx_quantiles"] else None
+    for chunk in data_df.iter_chunks(columns=columns, progress=print_load_progress) :
+        values = chunk.to_numpy(dtype=np.float64, na_value=np.nan)
+        moments.update(values)
+        if comoments is not None :
+            comoments.update(values)
+        if sketches is not None :
+            for cid, sketch in enumerate(sketches) :
+                sketch.update(values[:, cid])
+    print()
+    stats = {k : list(v) for k, v in moments.stats().items()}
+    if sketches is not None :
+        add_sketch_quantiles(stats, sketches)
+        return stats
+    
+    budget_rows = SETTINGS["memory_budget"] * 2**20 // 8
+    if data_df.n_rows > budget_rows :
+        ## Not even one column fits, select the ranks on disk instead
+        add_selected_quantiles(stats, data_df, columns, moments, budget_rows)
+        return stats
+    group_size = max(1, budget_rows // max(data_df.n_rows, 1))
+    for gid in range(0, len(columns), group_size) :
+        group = columns[gid:gid+group_size]
+        values = np.concatenate([chunk[group].to_numpy(dtype=np.float64) 
+                                 for chunk in data_df.iter_chunks(columns=group)])
+        add_exact_quantiles(stats, values)
+        del values
+    
+    return stats
+#########################################################################
+
+#########################################################################
+def print_column_stats(columns, n_rows, stats) :
+    '''
+    Common function to print the statistics of each column
+    in the given format
+    '''
+    
+    for cid, each_c in enumerate(columns) :
+        each_c = str(each_c)
+        print(f"{each_c}");print("-"*len(each_c))
+        
+        min_val = round(stats["min"][cid],2)
+        max_val = round(stats["max"][cid],2)
+        mean_val = round(stats["mean"][cid],2)
+        median_val = round(stats["median"][cid],2)
+        std_dev = round(stats["std"][cid],2)
+        sem = round(stats["sem"][cid],2)
+        
+        print(f"{'number of values (n)' : >20} : {n_rows}")
+        print(f"{'minimum' : >20} : {min_val}")
+        print(f"{'maximun' : >20} : {max_val}")
+        print(f"{'mean' : >20} : {mean_val}")
+        if SETTINGS["approx_quantiles"] :
+            print(f"{'median (approx.)' : >20} : {median_val}")
+        else :
+            print(f"{'median' : >20} : {median_val}")
+        for q, pct_vals in stats.get("percentiles", {}).items() :
+            label = f"{q:g}th percentile"
+            if SETTINGS["approx_quantiles"] :
+                label = f"{q:g}th pct. (approx.)"
+            print(f"{label : >20} : {round(pct_vals[cid],2)}")
+        print(f"{'standard deviation' : >20} : {std_dev}")
+        print(f"{'std. err. of mean' : >20} : {sem}")
+        
+        print("\n")
+#########################################################################
+
+#########################################################################
+class StatsCache :
+    '''
+    Statistics and correlation matrix of the data last analysed, kept
+    per column so that after a cleaning step only the columns whose 
+    values changed are recomputed
+    
+    carry_over() is told which columns of the old data reach the new
+    data unchanged (and under which name): renames relabel the cached
+    values, dropped or filled columns lose their entries (and their row
+    and column of the correlation matrix), dropped rows clear everything
+    '''
+    
+    def __init__(self) :
+        self.data_ref = None
+        self.stats = {}
+        self.corr = None
+    
+    def clear(self) :
+        self.data_ref = None
+        self.stats = {}
+        self.corr = None
+    
+    def bind(self, data_df) :
+        '''
+        Make the cache describe data_df, clearing it for new data
+        '''
+        
+        if self.data_ref is None or self.data_ref() is not data_df :
+            self.clear()
+            self.data_ref = weakref.ref(data_df)
+    
+    def carry_over(self, old_df, new_df, unchanged) :
+        '''
+        Move the entries of the unchanged columns of old_df to new_df,
+        unchanged mapping each one's old name to its new name
+        '''
+        
+        if self.data_ref is None or self.data_ref() is not old_df :
+            return
+        stats = {new : self.stats[old] for old, new in unchanged.items() if old in self.stats}
+        corr = self.corr
+        if corr is not None :
+            keep = [old for old in unchanged if old in corr.index]
+            corr = corr.loc[keep, keep].rename(index=unchanged, columns=unchanged)
+        self.bind(new_df)
+        self.stats = stats
+        self.corr = corr
+    
+    def correlation(self, data_df) :
+        '''
+        Return the correlation matrix of data_df, computing only 
+        the rows and columns missing from the cached matrix
+        '''
+        
+        columns = list(data_df.columns)
+        known = [c for c in columns if self.corr is not None and c in self.corr.index]
+        missing = [c for c in columns if c not in known]
+        if not missing :
+            return self.corr.loc[columns, columns]
+        if not known :
+            self.corr = compute_correlation(data_df, full=True)
+            return self.corr
+        
+        new_rows = compute_correlation(data_df, rows=missing)
+        corr = np.full((len(columns), len(columns)), np.nan)
+        known_idx = [columns.index(c) for c in known]
+        missing_idx = [columns.index(c) for c in missing]
+        if known :
+            corr[np.ix_(known_idx, known_idx)] = self.corr.loc[known, known].to_numpy()
+        corr[missing_idx, :] = new_rows.loc[missing, columns].to_numpy()
+        corr[:, missing_idx] = corr[missing_idx, :].T
+        self.corr = DF(corr, index=data_df.columns, columns=data_df.columns)
+        return self.corr
+#########################################################################
+
+#########################################################################
+## Cache of the statistics of the current data, shared by all the menus
+STATS_CACHE = StatsCache()
+#########################################################################
+
+#########################################################################
+@profiled
+def analyse_data(data_df) :
     '''
-    Common function to iteratively display column names
-    and ask user input and validate until correct
+    Function to compute the statistics of every column and the 
+    correlation matrix (or top pairs), reusing whatever the statistics
+    cache still holds for the data
+    Returns (stats as from compute_column_stats, correlation, columns reused)
     '''
     
-    print(msg)
-    col_input = None
-    ## Confirm user input for column name until correct option provided
-    ## Will break the loop if no input provided
-    while (col_input not in data_df.columns) :
-        ## Display names of the columns
-        for each_c in data_df.columns :
-            print(f"\t{each_c}")
-        col_input = input(">>> ")
-        col_input = col_input.strip()
-        
-        if col_input == "" :
-            break
-        if col_input not in data_df.columns :
-            print("Invalid Selection!")
+    columns = list(data_df.columns)
+    chunked = isinstance(data_df, ChunkedFrame)
+    top_mode = top_pairs_mode()
     
-    return col_input
+    ## Columns sharing a name cannot be cached apart
+    if len(set(columns)) < len(columns) :
+        STATS_CACHE.clear()
+        if chunked :
+            comoments = CoMoments(len(columns))
+            stats = compute_chunked_stats(data_df, comoments=comoments)
+            return stats, compute_chunked_correlation(data_df, comoments), 0
+        return compute_column_stats(data_df), compute_correlation(data_df), 0
+    
+    STATS_CACHE.bind(data_df)
+    missing = [c for c in columns if c not in STATS_CACHE.stats]
+    known_corr = STATS_CACHE.corr is not None and all(c in STATS_CACHE.corr.index for c in columns)
+    comoments = None
+    if missing :
+        if chunked :
+            ## A pass over every column gathers the co-moments as well
+            if len(missing) == len(columns) and (top_mode or not known_corr) :
+                comoments = CoMoments(len(columns))
+            new_stats = compute_chunked_stats(data_df, missing, comoments)
+        else :
+            new_stats = compute_column_stats(data_df[missing])
+        for cid, col in enumerate(missing) :
+            STATS_CACHE.stats[col] = {
+                name : ({q : v[cid] for q, v in vals.items()} if name == "percentiles" else vals[cid])
+                for name, vals in new_stats.items()
+            }
+    
+    stats = {}
+    for col in columns :
+        for name, val in STATS_CACHE.stats[col].items() :
+            if name == "percentiles" :
+                for q, v in val.items() :
+                    stats.setdefault(name, {}).setdefault(q, []).append(v)
+            else :
+                stats.setdefault(name, []).append(val)
+    
+    if top_mode :
+        corr = compute_chunked_correlation(data_df, comoments) if chunked else compute_correlation(data_df)
+    elif not chunked :
+        corr = STATS_CACHE.correlation(data_df)
+    elif known_corr :
+        corr = STATS_CACHE.corr.loc[columns, columns]
+    else :
+        corr = STATS_CACHE.corr = compute_chunked_correlation(data_df, comoments)
+    return stats, corr, len(columns) - len(missing)
 #########################################################################
 
-
 #########################################################################
-def op1_menu_items() :
+@profiled
+def op4_menu_items(data_df) :
     '''
-    Function to drive the Option - 1 submenu items
+    Function to drive the Option - 4 submenu items
     '''
     
-    ## Display subitems of Option 1 menu
-    op1 = "1 – Load data from a file"
-    op2 = "2 – Go back to the main menu"
-    
-    op1_menu_str = f"Please choose from the following options:\n\t{op1}\n\t{op2}\n>>> "
-    op_ans = iterative_input_on_error(op1_menu_str, 1, 2)
+    print("Analyzing data\n")
     
-    ## An empty dataframe to be returned 
-    ## when the user input is incorrect
-    ret_df = DF()
+    ## Calculate the required stats for all the columns at once,
+    ## chunk by chunk for data loaded in chunks, reusing the cached
+    ## ones, then print the same in the given format
+    stats, corr, n_reused = analyse_data(data_df)
+    if n_reused :
+        print(f"(statistics of {n_reused} unchanged column(s) reused)\n")
+    print_column_stats(data_df.columns, data_df.shape[0], stats)
     
-    ## Ask user for filename and return empty if errors
-    if op_ans == 2 :
-        return ret_df
-    elif op_ans == 1 :
-        op1_1_str = "Enter file name : "
-        fname = input(op1_1_str)
-        while (not fname) :
-            fname = input(op1_1_str)
+    ## Calculate correlation matrix (or its strongest pairs) for the data and print
+    if top_pairs_mode() :
+        print("Most Correlated Column Pairs");print("-"*len("Most Correlated Column Pairs"))
+        if corr.empty :
+            print("No column pairs selected")
+        else :
+            print(corr.to_string(index=False))
     else :
-        print("Invalid selection!")
-        return ret_df
-       
-    if not os.path.exists(op_ans) :
-        print("Error - File not found")
-        print("Returning to main menu")
-        return ret_df
+        print("Correlation Matrix");print("-"*len("Correlation Matrix"))
+        print(corr)
     
-    ## Read the input file and check if all the values are numeric
-    ## Else, return appropriate errors as specified
-    try :
-        data_df = READCSV(fname)
-        if data_df.empty :
-            print("Error - All values in the file are not numeric")
-            print("Returning to main menu")
-            return ret_df
-        
-        
-        if not data_df.shape[1] == data_df.select_dtypes(include=np.number).shape[1] :
-            print("Error - All values in the file are not numeric")
-            print("Returning to main menu")
-            return ret_df
-        
-        
-        print("Data has been loaded successfully.")
-        
-        ##################################################
-        ########## Setting column name as index as per user input
-        msg = "Which column do you want to set as index? (leave blank for none)"
-        col_input = iterative_col_input_check(data_df, msg)
-        if col_input in data_df.columns :
-            data_df = data_df.set_index(col_input)
-            print(f"{col_input} set as index.")
-        else :
-            print(f"No column is set as index.")
-        ##################################################   
-
-        return data_df
-
-    except :
-        print("Error - Unable to load data")
-        print("Returning to main menu")
-        return ret_df
+    return data_df   
 #########################################################################
+   
 
 #########################################################################
-def op2_menu_items(data_df) :
+def minmax_rows(values, offset, bucket) :
     '''
-    Function to drive the Option - 2 submenu items
+    Common function to pick, in a 2-D float64 block of rows starting at
+    row offset of the data, the rows holding the minimum and maximum of
+    every column within each bucket of rows, plus the block's first and
+    last rows, so that a line plot of them keeps the shape of the series
+    Returns the sorted positions of the rows within the block
     '''
     
-    ## Printing the dataframe
-    print(data_df)
-    return data_df
+    n_rows = values.shape[0]
+    bid = (offset + np.arange(n_rows)) // bucket
+    starts = np.flatnonzero(np.r_[True, bid[1:] != bid[:-1]])
+    sizes = np.diff(np.r_[starts, n_rows])
+    missing = np.isnan(values)
+    low = np.where(missing, np.inf, values)
+    high = np.where(missing, -np.inf, values)
+    
+    rows = np.arange(n_rows)[:, None]
+    picked = [np.array([0, n_rows-1])]
+    for vals, reduce in ((low, np.minimum), (high, np.maximum)) :
+        best = np.repeat(reduce.reduceat(vals, starts, axis=0), sizes, axis=0)
+        first = np.minimum.reduceat(np.where(vals == best, rows, n_rows), starts, axis=0)
+        picked.append(first[first < n_rows])
+    return np.unique(np.concatenate(picked))
 #########################################################################
 
 #########################################################################
-def op3_x_iterative_loop(msg):
+def downsample_for_line(data_df) :
     '''
-    Common function to iteratively accept user input 
-    for option 3 sub menu until correct
+    Function to reduce the rows of the data to at most about
+    SETTINGS["plot_points"] rows in all with min/max decimation, chunk
+    by chunk for data loaded in chunks. Each bucket of rows keeps the
+    rows of the minimum and maximum of every column - up to two rows
+    per column - so the buckets are sized for 2 x columns rows each
     '''
     
-    ## Iteratively ask user input until a valid integer is not provided
-    ## Else, return the valid integer
-    val = input(msg)
-    while(not val) :
-        print("Invalid Selection!")
-        val = input(msg)
+    n_rows, n_cols = data_df.shape
+    bucket = max(1, -(-2 * n_rows * max(n_cols, 1) // SETTINGS["plot_points"]))
+    if isinstance(data_df, ChunkedFrame) :
+        parts = []
+        offset = 0
+        for chunk in data_df.iter_chunks(progress=print_load_progress) :
+            if chunk.shape[0] :
+                pos = minmax_rows(chunk.to_numpy(dtype=np.float64, na_value=np.nan), offset, bucket)
+                parts.append(chunk.iloc[pos])
+            offset += chunk.shape[0]
+        print()
+        return CONCAT(parts) if parts else data_df.head(0)
     
-    try :
-        val = int(val)
-    except :
-        print("Please enter a valid number.")
-        val = op3_x_iterative_loop(msg)
-        
-    return val  
+    pos = minmax_rows(data_df.to_numpy(dtype=np.float64, na_value=np.nan), 0, bucket)
+    return data_df.iloc[pos]
 #########################################################################
 
-
 #########################################################################
-def op3_menu_items(data_df) :
+def bin_for_bar(data_df) :
     '''
-    Function to drive the Option - 3 submenu items
+    Function to aggregate the rows of the data into SETTINGS["plot_bins"]
+    bins of consecutive rows, one bar per bin holding the mean of the
+    bin's values and labelled with the bin's first and last index
     '''
     
-    ## Displaying the suboptiopns of Option 3 for cleaning data
-    print("\nCleaning ..")
-    print(data_df)
+    n_rows, n_cols = data_df.shape
+    size = -(-n_rows // SETTINGS["plot_bins"])
+    n_bins = -(-n_rows // size)
+    sums = np.zeros((n_bins, n_cols))
+    counts = np.zeros((n_bins, n_cols))
+    first = [None] * n_bins
+    last = [None] * n_bins
     
-    op1 = "1 – Drop rows with missing values"
-    op2 = "2 – Fill missing values"
-    op3 = "3 – Drop duplicate rows"
-    op4 = "4 – Drop column"
-    op5 = "5 – Rename column"
-    op6 = "6 – Finish cleaning"
+    if isinstance(data_df, ChunkedFrame) :
+        chunks = data_df.iter_chunks(progress=print_load_progress)
+    else :
+        chunks = [data_df]
+    offset = 0
+    for chunk in chunks :
+        if not chunk.shape[0] :
+            continue
+        values = chunk.to_numpy(dtype=np.float64, na_value=np.nan)
+        bid = (offset + np.arange(values.shape[0])) // size
+        starts = np.flatnonzero(np.r_[True, bid[1:] != bid[:-1]])
+        ends = np.r_[starts[1:], values.shape[0]] - 1
+        sums[bid[starts]] += np.add.reduceat(np.nan_to_num(values), starts, axis=0)
+        counts[bid[starts]] += np.add.reduceat(~np.isnan(values), starts, axis=0)
+        for b, lo, hi in zip(bid[starts], starts, ends) :
+            if first[b] is None :
+                first[b] = chunk.index[lo]
+            last[b] = chunk.index[hi]
+        offset += values.shape[0]
+    if isinstance(data_df, ChunkedFrame) :
+        print()
     
-    op3_menu_str = f"\nCleaning data:\n\t{op1}\n\t{op2}\n\t{op3}\n\t{op4}\n\t{op5}\n\t{op6}\n>>> "
-    op_ans = iterative_input_on_error(op3_menu_str, 1, 6)
+    with np.errstate(invalid="ignore", divide="ignore") :
+        means = sums / counts
+    labels = [f"{lo}-{hi}" if lo != hi else f"{lo}" for lo, hi in zip(first, last)]
+    return DF(means, index=labels, columns=data_df.columns)
+#########################################################################
+
+#########################################################################
+def box_plot_stats(data_df) :
+    '''
+    Function to compute what a box plot draws for every column - the
+    quartiles, the whiskers (the furthest values within 1.5 IQR of the
+    box) and, as fliers, the minimum and maximum when outside the whiskers
     
+    For data loaded in chunks the quartiles come from sketches and the
+    whiskers are the 1.5 IQR limits clipped to the minimum and maximum
+    Returns a list of dicts as taken by matplotlib's Axes.bxp()
+    '''
     
-    ## For each suboption provided by user,
-    ## Follow the specified steps to clean the data accordingly
-    
-    ## Suboption1 - Drop rows as per the threshold for non null values
-    ## Count null values and compare with threshold and drop
-    if op_ans == 1 :
-        msg = "Enter the threshold for dropping rows: "
-        thrshold = op3_x_iterative_loop(msg)
-        row_idx_to_drop = []
-        null_res = data_df.isnull().sum(axis=1).to_dict()
-        for k in null_res :
-            if null_res[k] > thrshold :
-                row_idx_to_drop.append(k)
-        data_df = data_df.drop(index=row_idx_to_drop)
-        print(data_df)
-        
-        data_df = op3_menu_items(data_df)
-    
-    ## Ask user input for replacing null values with 
-    elif op_ans == 2 :
-        msg = "Enter the replacement value: "
-        fillna_val = op3_x_iterative_loop(msg)
-        data_df = data_df.fillna(fillna_val)
-        data_df = op3_menu_items(data_df)
-    
-    ## Drop all the duplicate rows if any  
-    elif op_ans == 3 :
-        duplicate_cnt = data_df.duplicated().sum()
-        data_df = data_df.drop_duplicates()
-        print(f"**{duplicate_cnt} rows dropped")
-        
-        data_df = op3_menu_items(data_df)
-        
-    ## Drop a specific columns
-    elif op_ans == 4 :
-        msg = "Which column do you want to drop? (leave blank for none)"
-        col_input = iterative_col_input_check(data_df, msg)
-        if col_input in data_df.columns :
-            data_df = data_df.drop(col_input, axis=1)
-            print(f"{col_input} is dropped.")
-        else :
-            print(f"No column dropped.")
-        
-        data_df = op3_menu_items(data_df)
-
-    # Rename a specific columns by asking as user input (both col and new name)
-    elif op_ans == 5 :
-        msg = "Which column do you want to rename? (leave blank for none)"
-        col_input = iterative_col_input_check(data_df, msg)
-        if not col_input :
-            print(f"No column selected to rename.")
-            #data_df = op3_menu_items(data_df)
-        
-        elif col_input in data_df.columns :
-            msg = "Enter the new column name to rename? (Don't leave as blank) : "
-            new_name = input(msg)
-            while (not new_name) :
-                new_name = input(msg)
-            data_df = data_df.rename(columns={col_input:new_name})
-        
-        data_df = op3_menu_items(data_df)
+    columns = data_df.columns
+    if isinstance(data_df, ChunkedFrame) :
+        moments = ColumnMoments(len(columns))
+        sketches = new_column_sketches(len(columns))
+        for chunk in data_df.iter_chunks(progress=print_load_progress) :
+            values = chunk.to_numpy(dtype=np.float64, na_value=np.nan)
+            moments.update(values)
+            for cid, sketch in enumerate(sketches) :
+                sketch.update(values[:, cid])
+        print()
+        col_stats = moments.stats()
+        quarts = np.array([sketch.quantiles([0.25, 0.5, 0.75]) for sketch in sketches]).reshape(-1, 3)
+        low, high = col_stats["min"], col_stats["max"]
+        iqr = quarts[:, 2] - quarts[:, 0]
+        whislo = np.fmax(low, quarts[:, 0] - 1.5*iqr)
+        whishi = np.fmin(high, quarts[:, 2] + 1.5*iqr)
+    else :
+        values = data_df.to_numpy(dtype=np.float64, na_value=np.nan)
+        with warnings.catch_warnings() :
+            warnings.simplefilter("ignore", RuntimeWarning)
+            quarts = np.nanpercentile(values, [25, 50, 75], axis=0).T
+            low, high = np.nanmin(values, axis=0), np.nanmax(values, axis=0)
+            iqr = quarts[:, 2] - quarts[:, 0]
+            whislo = np.nanmin(np.where(values >= quarts[:, 0] - 1.5*iqr, values, np.nan), axis=0)
+            whishi = np.nanmax(np.where(values <= quarts[:, 2] + 1.5*iqr, values, np.nan), axis=0)
     
-    ## Finish clearing, exiting the process back to main menu
-    elif op_ans == 6 :
-        print("Finished cleaning")
+    boxes = []
+    for cid, col in enumerate(columns) :
+        fliers = [v for v in (low[cid], high[cid]) if v < whislo[cid] or v > whishi[cid]]
+        boxes.append({
+            "label" : str(col), "q1" : quarts[cid, 0], "med" : quarts[cid, 1], 
+            "q3" : quarts[cid, 2], "whislo" : whislo[cid], "whishi" : whishi[cid], 
+            "fliers" : fliers,
+        })
+    return boxes
+#########################################################################
+
+#########################################################################
+def plot_box_stats(boxes, p_subplot=False, p_title="", p_xaxis="", p_yaxis="") :
+    '''
+    Function to draw box plots from precomputed box statistics
+    Returns the figure
+    '''
     
-    return data_df
+    pyplot = load_pyplot()
+    if p_subplot :
+        fig, axes = pyplot.subplots(1, len(boxes), squeeze=False)
+        axes = list(axes[0])
+        for ax, box in zip(axes, boxes) :
+            ax.bxp([box])
+        if p_title :
+            fig.suptitle(p_title)
+    else :
+        fig, ax = pyplot.subplots()
+        ax.bxp(boxes)
+        axes = [ax]
+        ax.set_title(p_title)
+    for ax in axes :
+        ax.set_xlabel(p_xaxis)
+        ax.set_ylabel(p_yaxis)
+    return fig
 #########################################################################
-   
+
 #########################################################################
-def op4_menu_items(data_df) :
+@profiled
+def plot_data(data_df, plot_type, p_subplot=False, p_title="", p_xaxis="", p_yaxis="", 
+              plot_fname=None) :
     '''
-    Function to drive the Option - 4 submenu items
+    Function to plot the data and save the figure to a PNG file,
+    closing the figure afterwards so that repeated plots do not
+    keep their figures alive
+    
+    Data with more rows than SETTINGS["plot_points"] is reduced first -
+    min/max decimation for line plots, bins of rows for bar charts and
+    precomputed quartiles for box plots - so the plot time stays bounded
     '''
     
-    print("Analyzing data\n")
+    n_rows = data_df.shape[0]
+    reduce = SETTINGS["plot_points"] and n_rows > SETTINGS["plot_points"]
     
-    ## For each column in data, calculate the required stats 
-    ## then print the same in the given format
-    for each_c in data_df.columns :
-        print(f"{each_c}");print("-"*len(each_c))
-        
-        min_val = round(data_df[each_c].min(),2)
-        max_val = round(data_df[each_c].max(),2)
-        mean_val = round(data_df[each_c].mean(),2)
-        median_val = round(data_df[each_c].median(),2)
-        std_dev = round(data_df[each_c].std(),2)
-        sem = round(data_df[each_c].sem(),2)
-        
-        row_data = data_df[each_c].shape[0]
-        print(f"{'number of values (n)' : >20} : {row_data}")
-        print(f"{'minimum' : >20} : {min_val}")
-        print(f"{'maximun' : >20} : {max_val}")
-        print(f"{'mean' : >20} : {mean_val}")
-        print(f"{'median' : >20} : {median_val}")
-        print(f"{'standard deviation' : >20} : {std_dev}")
-        print(f"{'std. err. of mean' : >20} : {sem}")
+    pyplot = load_pyplot()
+    if plot_type == "box" and reduce :
+        fig = plot_box_stats(box_plot_stats(data_df), p_subplot, p_title, p_xaxis, p_yaxis)
+        print(f"(box plot of {n_rows} rows drawn from their quartiles)")
+    else :
+        plot_df = data_df
+        if reduce and plot_type == "line" :
+            plot_df = downsample_for_line(data_df)
+            print(f"({n_rows} rows reduced to {plot_df.shape[0]} for the line plot)")
+        elif reduce :
+            plot_df = bin_for_bar(data_df)
+            print(f"({n_rows} rows aggregated into {plot_df.shape[0]} bars of mean values)")
+        elif isinstance(data_df, ChunkedFrame) :
+            plot_df = CONCAT(list(data_df.iter_chunks()))
         
-        print("\n")
+        ## Plotting as per the inputs using dataframe + matplotlib
+        plt = plot_df.plot(
+                        kind=plot_type,
+                        subplots = p_subplot,
+                        title = p_title,
+                        xlabel = p_xaxis,
+                        ylabel = p_yaxis
+                    )
+        fig = plt[0].get_figure() if p_subplot else plt.get_figure()
+    
+    ## Saving the plot in a specific file
+    if plot_fname is None :
+        plot_fname = f"fig_{plot_type}.png"
     
-    ## Calculate correlation matrix for the data and print
-    print("Correlation Matrix");print("-"*len("Correlation Matrix"))
-    print(data_df.corr())
+    if p_subplot :
+        fig.tight_layout()
+    fig.savefig(plot_fname)
+    pyplot.close(fig)
     
-    return data_df   
+    print(f"Plot is generated and saved as file - {plot_fname}")
+    return plot_fname
 #########################################################################
-   
 
 #########################################################################
+@profiled
 def op5_menu_items(data_df):
     '''
     Function to drive the Option - 5 submenu items
@@ -339,32 +2741,242 @@ def op5_menu_items(data_df):
     msg = "Please enter the y-axis label (leave blank for no label) : "
     p_yaxis = input(msg)
     
-    ## Plotting as per the inputs using dataframe + matplotlib
-    plt = data_df.plot(
-                    kind=plot_type,
-                    subplots = p_subplot,
-                    title = p_title,
-                    xlabel = p_xaxis,
-                    ylabel = p_yaxis
-                )
+    plot_data(data_df, plot_type, p_subplot, p_title, p_xaxis, p_yaxis)
     
-    ## Saving the plot in a specific file
-    plot_fname = f"fig_{plot_type}.png"
+    return data_df   
+#########################################################################  
+
+#########################################################################
+def save_format(fname) :
+    '''
+    Common function to choose the output format from the file name -
+    parquet (.parquet, .pq), feather (.feather, .arrow) or else CSV,
+    compressed for .gz, .bz2, .xz and .zip
+    '''
     
-    if p_subplot :
-        fig = plt[0].get_figure()
-        fig.tight_layout()
-        fig.savefig(plot_fname)
+    ext = os.path.splitext(fname)[1].lower()
+    if ext in (".parquet", ".pq") :
+        return "parquet"
+    if ext in (".feather", ".arrow") :
+        return "feather"
+    return "csv"
+#########################################################################
+
+#########################################################################
+@contextlib.contextmanager
+def open_csv_output(path, fname) :
+    '''
+    Common function to open path for writing CSV text, compressed as 
+    per the extension of fname (the name the file will finally have)
+    '''
+    
+    import gzip, bz2, lzma, zipfile
+    
+    ext = os.path.splitext(fname)[1].lower()
+    if ext == ".gz" :
+        fw = gzip.open(path, "wt", newline="")
+    elif ext == ".bz2" :
+        fw = bz2.open(path, "wt", newline="")
+    elif ext == ".xz" :
+        fw = lzma.open(path, "wt", newline="")
+    elif ext == ".zip" :
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf :
+            member = os.path.basename(fname)[:-len(ext)]
+            with io.TextIOWrapper(zf.open(member, "w"), newline="") as fw :
+                yield fw
+        return
     else :
-        fig = plt.get_figure()
-        fig.savefig(plot_fname)
+        fw = open(path, "w", newline="")
+    with fw :
+        yield fw
+#########################################################################
+
+#########################################################################
+def iter_save_chunks(data_df) :
+    '''
+    Generator yielding the data in blocks of SETTINGS["chunksize"] rows
+    (at least one block, possibly empty, so the header gets written)
+    '''
     
-    print(f"Plot is generated and saved as file - {plot_fname}")
+    if isinstance(data_df, ChunkedFrame) :
+        chunks = data_df.iter_chunks()
+        first = next(chunks, None)
+        yield data_df.head(0) if first is None else first
+        yield from chunks
+        return
+    step = SETTINGS["chunksize"]
+    for start in range(0, max(data_df.shape[0], 1), step) :
+        yield data_df.iloc[start:start+step]
+#########################################################################
+
+#########################################################################
+@profiled
+def write_data(data_df, fname, progress=None) :
+    '''
+    Function to write the data to fname in the format chosen by
+    save_format(), one block of rows at a time, calling progress with
+    the fraction of rows written after each block
     
-    return data_df   
-#########################################################################  
+    The file is written under a unique temporary name next to it and
+    renamed when complete, so a failed or unfinished save never leaves a
+    partial file, and two saves to the same name never share one
+    Returns the size of the file in bytes
+    '''
+    
+    fmt = save_format(fname)
+    n_rows = max(data_df.shape[0], 1)
+    fd, tmp_path = tempfile.mkstemp(prefix=f"{os.path.basename(fname)}.", suffix=".part",
+                                    dir=os.path.dirname(os.path.abspath(fname)))
+    os.close(fd)
+    rows = 0
+    try :
+        ## mkstemp makes the file private, the saved file gets the usual mode
+        os.chmod(tmp_path, 0o666 & ~UMASK)
+        if fmt == "csv" :
+            with open_csv_output(tmp_path, fname) as fw :
+                for cid, chunk in enumerate(iter_save_chunks(data_df)) :
+                    chunk.to_csv(fw, header=(cid == 0))
+                    rows += chunk.shape[0]
+                    if progress is not None :
+                        progress(rows / n_rows)
+        else :
+            import pyarrow
+            import pyarrow.ipc
+            import pyarrow.parquet
+            writer = None
+            try :
+                for chunk in iter_save_chunks(data_df) :
+                    ## A default index is rebuilt on reading, any other one is stored
+                    keep_index = not isinstance(chunk.index, RANGEINDEX) or chunk.index.name is not None
+                    table = pyarrow.Table.from_pandas(chunk, preserve_index=keep_index)
+                    if writer is None :
+                        schema = table.schema
+                        if fmt == "parquet" :
+                            writer = pyarrow.parquet.ParquetWriter(tmp_path, schema)
+                        else :
+                            writer = pyarrow.ipc.new_file(tmp_path, schema)
+                    writer.write_table(table.cast(schema))
+                    rows += chunk.shape[0]
+                    if progress is not None :
+                        progress(rows / n_rows)
+            finally :
+                if writer is not None :
+                    writer.close()
+        os.replace(tmp_path, fname)
+    except BaseException :
+        if os.path.exists(tmp_path) :
+            os.remove(tmp_path)
+        raise
+    return os.path.getsize(fname)
+#########################################################################
+
+#########################################################################
+class SaveJob(threading.Thread) :
+    '''
+    Thread writing the data to a file, so the menus stay usable while a
+    large file is written. The progress, and the outcome once finished,
+    are kept for notice()
+    '''
+    
+    def __init__(self, data_df, fname) :
+        super().__init__(name=f"save {fname}")
+        self.data_df = data_df
+        self.fname = fname
+        self.fraction = 0.0
+        self.n_bytes = 0
+        self.elapsed = 0.0
+        self.error = None
+    
+    def set_progress(self, fraction) :
+        self.fraction = fraction
+    
+    def run(self) :
+        start = time.perf_counter()
+        try :
+            self.n_bytes = write_data(self.data_df, self.fname, self.set_progress)
+        except Exception as err :
+            self.error = err
+        finally :
+            self.elapsed = time.perf_counter() - start
+            ## The data is not needed anymore once written
+            self.data_df = None
+    
+    def notice(self) :
+        '''
+        Return a line on the state of the save
+        '''
+        
+        if self.is_alive() :
+            return f"Saving to {self.fname} - {self.fraction:.0%} done"
+        if self.error is not None :
+            return f"Error - Data could not be saved to {self.fname} : {self.error}"
+        size = self.n_bytes / 2**20
+        return (f"Data saved to {self.fname} - {size:.1f} MB in {self.elapsed:.2f} s "
+                f"({size / max(self.elapsed, 1e-9):.1f} MB/s)")
+#########################################################################
+
+#########################################################################
+## Saves running in the background, reported before the main menu
+SAVE_JOBS = []
+#########################################################################
+
+#########################################################################
+def save_data(data_df, fname, background=False) :
+    '''
+    Function to save the data to a file, in the format chosen by its
+    extension, either in a background thread or before returning
+    '''
+    
+    job = SaveJob(data_df, fname)
+    if background :
+        job.start()
+        SAVE_JOBS.append(job)
+        print(f"Saving to {fname} in the background")
+        return job
+    
+    def progress(fraction) :
+        print(f"\r\tWritten {fraction:.0%} of the data", end="", flush=True)
+    start = time.perf_counter()
+    try :
+        job.n_bytes = write_data(data_df, fname, progress)
+    finally :
+        job.elapsed = time.perf_counter() - start
+        print()
+    print(job.notice())
+    return job
+#########################################################################
+
+#########################################################################
+def print_save_notices() :
+    '''
+    Common function to print the progress of the background saves,
+    and their outcome once, when finished
+    '''
+    
+    for job in list(SAVE_JOBS) :
+        print(job.notice())
+        if not job.is_alive() :
+            SAVE_JOBS.remove(job)
+#########################################################################
+
+#########################################################################
+def wait_for_saves() :
+    '''
+    Common function to wait, showing the progress, until all the
+    background saves are finished
+    '''
+    
+    while any(job.is_alive() for job in SAVE_JOBS) :
+        running = [job for job in SAVE_JOBS if job.is_alive()]
+        status = ", ".join(f"{job.fname} {job.fraction:.0%}" for job in running)
+        print(f"\r\tWaiting for the saves to finish - {status}".ljust(80), end="", flush=True)
+        running[0].join(timeout=0.5)
+    print()
+    print_save_notices()
+#########################################################################
 
 #########################################################################
+@profiled
 def op6_menu_items(data_df) :
     '''
     Function to drive the Option - 6 submenu items
@@ -377,8 +2989,9 @@ def op6_menu_items(data_df) :
         print("Cancelling save operation.")
         return data_df
     
-    data_df.to_csv(fname)
-    print(f"Data saved to {fname}")
+    ## Writing in the background, the outcome is 
+    ## reported on the way back to the main menu
+    save_data(data_df, fname, background=True)
     
     return data_df
 #########################################################################
@@ -400,74 +3013,357 @@ def main_menu_options(data_df):
     op7 = "7 – Quit"
     main_menu_str = f"\n\nPlease choose from the following options:\n\t{op1}\n\t{op2}\n\t{op3}\n\t{op4}\n\t{op5}\n\t{op6}\n\t{op7}\n>>> "
 
-    # Iterating until correct input option is provided by user
-    value = iterative_input_on_error(main_menu_str, 1, 7)
-    
-    
-    # Performing specific option (subitems)
+    # Iterating until the user quits, performing specific option (subitems)
     # Corresponding to the user input provided (between 1-7)
-    if value == 1 :
-        data_df = op1_menu_items()
-        main_menu_options(data_df)
-    
-    elif value == 2 :
-        if data_df.empty :
-            print("No data to display.")
-            main_menu_options(data_df)
-        data_df = op2_menu_items(data_df)
-        main_menu_options(data_df)
+    value = 0
+    while value != 7 :
+        print_save_notices()
+        value = iterative_input_on_error(main_menu_str, 1, 7)
         
-    elif value == 3 :
-        if data_df.empty :
+        ## Every option other than loading needs some data
+        if value in (2, 3, 4, 5, 6) and (data_df is None or data_df.empty) :
             print("No data to display.")
-            main_menu_options(data_df)
-        data_df = op3_menu_items(data_df)
-        main_menu_options(data_df)
-    
-    elif value == 4 :
-        if data_df.empty :
-            print("No data to display.")
-            main_menu_options(data_df)
-        data_df = op4_menu_items(data_df)
-        main_menu_options(data_df)
+            continue
         
-    elif value == 5 :
-        if data_df.empty :
-            print("No data to display.")
-            main_menu_options(data_df)
-        data_df = op5_menu_items(data_df)
-        main_menu_options(data_df)
+        if value == 1 :
+            data_df = op1_menu_items()
         
-    elif value == 6 :
-        if data_df.empty :
-            print("No data to display.")
-            main_menu_options(data_df)
-        data_df = op6_menu_items(data_df)
-        main_menu_options(data_df)
-    elif value == 7 :
-        print("Goodbye!")
-    else :
-        print("Invalid selection!")
-        main_menu_options()
+        elif value == 2 :
+            data_df = op2_menu_items(data_df)
+            
+        elif value == 3 :
+            data_df = op3_menu_items(data_df)
+        
+        elif value == 4 :
+            data_df = op4_menu_items(data_df)
+            
+        elif value == 5 :
+            data_df = op5_menu_items(data_df)
+            
+        elif value == 6 :
+            data_df = op6_menu_items(data_df)
+        
+        elif value == 7 :
+            if SAVE_JOBS :
+                wait_for_saves()
+            print("Goodbye!")
     
     return 1
 #########################################################################
 
     
 
+#########################################################################
+def make_batch_step_parsers() :
+    '''
+    Function to build one argument parser per batch step
+    '''
+    
+    parsers = {}
+    def add_step(name, help_str) :
+        parsers[name] = argparse.ArgumentParser(prog=name, description=help_str, add_help=False)
+        return parsers[name]
+    
+    step = add_step("load", "load a CSV file (the current input file if none given)")
+    step.add_argument("file", nargs="?")
+    step.add_argument("--chunked", action="store_true")
+    step.add_argument("--index")
+    step = add_step("drop-rows", "drop rows with more missing values than a threshold")
+    step.add_argument("threshold", type=int)
+    step = add_step("fill", "fill missing values")
+    step.add_argument("value", type=int)
+    add_step("drop-duplicates", "drop duplicate rows")
+    step = add_step("drop-column", "drop a column")
+    step.add_argument("column")
+    step = add_step("rename-column", "rename a column")
+    step.add_argument("column")
+    step.add_argument("new_name")
+    add_step("view", "print the first page of the data")
+    add_step("analyse", "print the statistics and correlation matrix")
+    step = add_step("plot", "plot the data to a PNG file")
+    step.add_argument("kind", choices=["line", "bar", "box"])
+    step.add_argument("--subplots", action="store_true")
+    step.add_argument("--title", default="")
+    step.add_argument("--xlabel", default="")
+    step.add_argument("--ylabel", default="")
+    step.add_argument("--output")
+    step = add_step("save", "save the data to a file")
+    step.add_argument("file")
+    return parsers
+#########################################################################
+
+#########################################################################
+def parse_batch_steps(lines) :
+    '''
+    Function to parse the steps of a batch run, one step per line
+    ('#' starts a comment), e.g.
+        load --index id
+        drop-rows 2
+        analyse
+        save out/{stem}.csv
+    {stem} in a file name is replaced by the name of the input file
+    Returns a list of (step name, arguments)
+    Raises ValueError for an unknown or malformed step
+    '''
+    
+    parsers = make_batch_step_parsers()
+    steps = []
+    for line_no, line in enumerate(lines, 1) :
+        words = shlex.split(line, comments=True)
+        if not words :
+            continue
+        if words[0] not in parsers :
+            raise ValueError(f"step {line_no} - unknown step '{words[0]}', "
+                             f"expected one of {', '.join(parsers)}")
+        try :
+            args = parsers[words[0]].parse_args(words[1:])
+        except SystemExit :
+            raise ValueError(f"step {line_no} - invalid arguments for '{words[0]}': {line.strip()}")
+        steps.append((words[0], args))
+    return steps
+#########################################################################
+
+#########################################################################
+@profiled
+def run_batch(steps, files) :
+    '''
+    Function to run the batch steps over each input file in turn, 
+    without any prompt, with an iterative driver which releases the
+    data of each step and each file as soon as it is replaced
+    Returns the number of input files which failed
+    '''
+    
+    clean_steps = ("drop-rows", "fill", "drop-duplicates", "drop-column", "rename-column")
+    failed = 0
+    for fname in (files or [None]) :
+        stem = os.path.splitext(os.path.basename(fname))[0] if fname else "data"
+        print(f"\n==> {fname or 'batch run'}")
+        data_df = None
+        plan = None
+        try :
+            for name, args in steps :
+                ## Consecutive cleaning steps are recorded in one plan
+                ## which is run before the next step of another kind
+                if name in clean_steps :
+                    if data_df is None :
+                        raise ValueError(f"'{name}' needs data, load a file first")
+                    if plan is None :
+                        plan = new_cleaning_plan(data_df)
+                    if name == "drop-rows" :
+                        plan.drop_rows(args.threshold)
+                    elif name == "fill" :
+                        plan.fill(args.value)
+                    elif name == "drop-duplicates" :
+                        plan.drop_duplicates()
+                    elif args.column not in plan.columns :
+                        raise ValueError(f"no column named '{args.column}'")
+                    elif name == "drop-column" :
+                        plan.drop_column(args.column)
+                    else :
+                        plan.rename_column(args.column, args.new_name)
+                    continue
+                
+                if plan is not None :
+                    data_df = finish_cleaning(data_df, plan)
+                    plan = None
+                
+                if name == "load" :
+                    path = args.file or fname
+                    if path is None :
+                        raise ValueError("'load' needs a file name or input files")
+                    data_df = None
+                    data_df = load_data(path.replace("{stem}", stem), chunked=args.chunked)
+                    if data_df is None :
+                        raise ValueError(f"unable to load {path}")
+                    if args.index is not None :
+                        if args.index not in data_df.columns :
+                            raise ValueError(f"no column named '{args.index}' to set as index")
+                        data_df = data_df.set_index(args.index)
+                        print(f"{args.index} set as index.")
+                    continue
+                
+                if data_df is None :
+                    raise ValueError(f"'{name}' needs data, load a file first")
+                if name == "view" :
+                    print(DataViewer(data_df, SETTINGS["view_rows"], SETTINGS["view_cols"]).render())
+                elif name == "analyse" :
+                    op4_menu_items(data_df)
+                elif name == "plot" :
+                    plot_fname = args.output.replace("{stem}", stem) if args.output else None
+                    plot_data(data_df, args.kind, args.subplots, args.title, 
+                              args.xlabel, args.ylabel, plot_fname)
+                elif name == "save" :
+                    save_data(data_df, args.file.replace("{stem}", stem))
+            
+            if plan is not None :
+                data_df = finish_cleaning(data_df, plan)
+        
+        except Exception as err :
+            print(f"Error - {err}")
+            failed += 1
+        
+        ## Release this file's data before the next one is loaded
+        data_df = None
+        plan = None
+    
+    print(f"\nBatch finished - {len(files or [None]) - failed} succeeded, {failed} failed")
+    return failed
+#########################################################################
+
+#########################################################################
+def parse_cmd_args(argv) :
+    '''
+    Function to read the command line arguments into SETTINGS
+    '''
+    
+    parser = argparse.ArgumentParser(description="The DataFrame Statistician")
+    parser.add_argument("--chunksize", type=int, default=SETTINGS["chunksize"],
+                        help="rows per chunk when loading a file in chunks")
+    parser.add_argument("--engine", choices=["c", "pyarrow"], default=SETTINGS["engine"],
+                        help="CSV parser engine (pyarrow is faster if installed)")
+    parser.add_argument("--memory-budget", type=int, default=SETTINGS["memory_budget"],
+                        help="working memory in MB for operations on data loaded in chunks")
+    parser.add_argument("--approx-quantiles", action="store_true",
+                        help="approximate the median and percentiles in bounded memory")
+    parser.add_argument("--quantile-error", type=float, default=SETTINGS["quantile_error"],
+                        help="rank error bound of the approximate quantiles (e.g. 0.01)")
+    parser.add_argument("--percentiles", default="",
+                        help="comma separated percentiles to report, e.g. 5,25,75,95")
+    parser.add_argument("--cache-dir", default=SETTINGS["cache_dir"],
+                        help="directory of the binary cache of loaded CSV files")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always parse the CSV file, do not read or write the cache")
+    parser.add_argument("--workers", type=int, default=SETTINGS["workers"],
+                        help="number of threads / processes for parallel work")
+    parser.add_argument("--compact", action="store_true",
+                        help="downcast the loaded columns to the smallest dtypes holding them exactly")
+    parser.add_argument("--fingerprint-bits", type=int, choices=[64, 128], 
+                        default=SETTINGS["fingerprint_bits"],
+                        help="width of the row fingerprints used to find duplicate rows")
+    parser.add_argument("--spill-dir", 
+                        help="directory for the fingerprints spilled to disk (default - system temp)")
+    parser.add_argument("--view-rows", type=int, default=SETTINGS["view_rows"],
+                        help="rows per page when viewing the data")
+    parser.add_argument("--view-cols", type=int, default=SETTINGS["view_cols"],
+                        help="columns per page when viewing the data")
+    parser.add_argument("--plot-points", type=int, default=SETTINGS["plot_points"],
+                        help="downsample plots of more rows than this (0 - never)")
+    parser.add_argument("--plot-bins", type=int, default=SETTINGS["plot_bins"],
+                        help="bars of a downsampled bar chart")
+    parser.add_argument("--parallel", action="store_true",
+                        help="compute the column statistics on a pool of --workers processes")
+    parser.add_argument("--parallel-speedup", action="store_true",
+                        help="with --parallel, also time the statistics on one core and print the speedup")
+    parser.add_argument("--corr-top", type=int, default=SETTINGS["corr_top"], metavar="K",
+                        help="report the K most correlated column pairs instead of the matrix")
+    parser.add_argument("--corr-threshold", type=float, metavar="R",
+                        help="report the column pairs with |correlation| >= R instead of the matrix")
+    parser.add_argument("--corr-float32", action="store_true",
+                        help="compute the correlations in float32")
+    parser.add_argument("--corr-block", type=int, default=SETTINGS["corr_block"],
+                        help="columns per tile of the correlation engine")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="record the time, CPU, peak memory and rows of every operation into FILE")
+    parser.add_argument("--profile-format", choices=["json", "trace"],
+                        help="JSON records, or a trace event file for flame graph viewers "
+                             "(default - trace if FILE ends in .trace.json)")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="also trace the peak allocations of every operation (slows the run down)")
+    parser.add_argument("--batch", metavar="STEPS_FILE",
+                        help="run the steps listed in a file without any prompt")
+    parser.add_argument("--steps",
+                        help="';' separated batch steps, e.g. \"load; analyse; save {stem}_out.csv\"")
+    parser.add_argument("files", nargs="*",
+                        help="input CSV files of a batch run, loaded by a 'load' step without a file")
+    args = parser.parse_args(argv)
+    
+    if args.files and not (args.batch or args.steps) :
+        parser.error("input files are only used with --batch or --steps")
+    if args.chunksize <= 0 :
+        parser.error("--chunksize must be a positive number of rows")
+    SETTINGS["chunksize"] = args.chunksize
+    SETTINGS["engine"] = args.engine
+    SETTINGS["memory_budget"] = max(args.memory_budget, 1)
+    
+    if not 0 < args.quantile_error < 1 :
+        parser.error("--quantile-error must be between 0 and 1")
+    try :
+        percentiles = [float(x) for x in args.percentiles.split(",") if x.strip()]
+    except ValueError :
+        parser.error("--percentiles must be a comma separated list of numbers")
+    if any(not 0 <= q <= 100 for q in percentiles) :
+        parser.error("--percentiles must be between 0 and 100")
+    SETTINGS["approx_quantiles"] = args.approx_quantiles
+    SETTINGS["quantile_error"] = args.quantile_error
+    SETTINGS["percentiles"] = percentiles
+    SETTINGS["cache_dir"] = None if args.no_cache else args.cache_dir
+    
+    if args.workers <= 0 or args.corr_block <= 0 or args.corr_top < 0 :
+        parser.error("--workers, --corr-block and --corr-top must be positive")
+    if args.corr_threshold is not None and not 0 <= args.corr_threshold <= 1 :
+        parser.error("--corr-threshold must be between 0 and 1")
+    SETTINGS["workers"] = args.workers
+    if args.plot_points < 0 or args.plot_bins <= 0 :
+        parser.error("--plot-points must not be negative and --plot-bins must be positive")
+    SETTINGS["plot_points"] = args.plot_points
+    if args.view_rows <= 0 or args.view_cols <= 0 :
+        parser.error("--view-rows and --view-cols must be positive")
+    SETTINGS["view_rows"] = args.view_rows
+    SETTINGS["fingerprint_bits"] = args.fingerprint_bits
+    SETTINGS["compact"] = args.compact
+    SETTINGS["spill_dir"] = args.spill_dir
+    SETTINGS["view_cols"] = args.view_cols
+    SETTINGS["plot_bins"] = args.plot_bins
+    SETTINGS["parallel"] = args.parallel
+    if args.parallel_speedup and not args.parallel :
+        parser.error("--parallel-speedup needs --parallel")
+    SETTINGS["parallel_speedup"] = args.parallel_speedup
+    SETTINGS["corr_top"] = args.corr_top
+    SETTINGS["corr_threshold"] = args.corr_threshold
+    SETTINGS["corr_dtype"] = "float32" if args.corr_float32 else "float64"
+    SETTINGS["corr_block"] = args.corr_block
+    
+    if (args.profile_format or args.profile_memory) and not args.profile :
+        parser.error("--profile-format and --profile-memory need --profile")
+    if args.profile and not args.profile_format :
+        args.profile_format = "trace" if args.profile.endswith(".trace.json") else "json"
+    return args
+#########################################################################
+
 #########################################################################
 def main():
     '''
     main function which drive the complete engine
     '''
     
+    args = parse_cmd_args(sys.argv[1:])
+    
+    ## Profile written on the way out, whichever way the program ends
+    if args.profile :
+        PROFILER.enable(args.profile_memory)
+        atexit.register(PROFILER.dump, args.profile, args.profile_format)
+    
+    ## Headless batch run, exiting with the number of failed files
+    if args.batch or args.steps :
+        try :
+            if args.batch :
+                with open(args.batch) as fr :
+                    steps = parse_batch_steps(fr.readlines())
+            else :
+                steps = parse_batch_steps(args.steps.split(";"))
+        except (OSError, ValueError) as err :
+            print(f"Error - {err}")
+            sys.exit(2)
+        sys.exit(min(run_batch(steps, args.files), 1))
+    
     ## Printing introductory message
     name = "<>" #----> Enter your name here
     print(f"Welcome to The DataFrame Statistician!\nProgrammed by {name}\n")
     
 
     ## Function to handle the main menu options
-    data_df = DF()
+    ## No data yet, pandas is only imported once some is loaded
+    data_df = None
     main_menu_options(data_df)
     
 #########################################################################
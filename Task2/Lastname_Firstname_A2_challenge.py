@@ -1,12 +1,67 @@
 '''SYSTEM PACKAGES'''
 import os
-import numpy as np
-from pandas import DataFrame as DF
-from pandas import read_csv as READCSV
+import sys
+import csv
+import math
+import json
+import time
+import shutil
+import hashlib
+import pickle
+import tempfile
+import atexit
+import argparse
+import threading
+import functools
+import importlib
+import contextlib
 from glob import glob
 
 
 #########################################################################
+def import_shared(name) :
+    '''
+    Common function to import the module of helpers shared by the Task1
+    and Task2 programs - from the import path (e.g. a copy next to this
+    script), else from its file in the repository root, which is loaded
+    without adding the root to sys.path
+    '''
+    
+    try :
+        return importlib.import_module(name)
+    except ModuleNotFoundError as err :
+        if err.name != name :
+            raise
+    from importlib.util import spec_from_file_location, module_from_spec
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), f"{name}.py")
+    if not os.path.exists(path) :
+        raise ImportError(f"{name}.py not found - copy it next to {os.path.basename(__file__)}")
+    spec = spec_from_file_location(name, path)
+    module = module_from_spec(spec)
+    ## Registered by name, so that pool workers can unpickle its functions
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+## Lazy imports and the profiler, shared by the Task1 and Task2 programs
+SHARED = import_shared("gn111571_common")
+LazyImport = SHARED.LazyImport
+load_pyplot = SHARED.load_pyplot
+PROFILER = SHARED.PROFILER
+profiled = SHARED.profiled
+#########################################################################
+
+#########################################################################
+## Heavy packages, imported on first use
+np = LazyImport("numpy")
+DF = LazyImport("pandas", "DataFrame")
+READCSV = LazyImport("pandas", "read_csv")
+CONCAT = LazyImport("pandas", "concat")
+#########################################################################
+
+
+#########################################################################
+@profiled
 def is_sheet_usable(sheet) :
     '''
     Function to evaluate and return 
@@ -50,45 +105,835 @@ def is_sheet_usable(sheet) :
 #########################################################################
 
 #########################################################################
-def combine_csv_files(directory, output_filename) :
+## Bits set in each byte value, for NumPy versions without bitwise_count
+POPCOUNT_TABLE = None
+#########################################################################
+
+#########################################################################
+## Rows read at a time when streaming a csv file into an HTML page,
+## and points kept of every column of its plot
+STREAM_CHUNK_ROWS = 10000
+HTML_PLOT_POINTS = 2000
+#########################################################################
+
+#########################################################################
+def defect_limit(sheet_size) :
+    '''
+    Function to return the most defects a sheet of
+    sheet_size elements can have and still be used
+    '''
+    
+    return 4 if sheet_size <= 9 else 8
+#########################################################################
+
+#########################################################################
+def check_sheet_stack(sheets) :
+    '''
+    Function to validate a stack of sheets (N x n x n) with the
+    same errors as is_sheet_usable, in a single pass over the data
+    '''
+    
+    if type(sheets) != np.ndarray :
+        raise TypeError("Input type is not a numpy array!")
+    if sheets.ndim != 3 :
+        raise ValueError("Array is not a stack of sheets (N x n x n)")
+    if sheets.shape[1] != sheets.shape[2] :
+        raise ValueError("Array shape is not 100x100 (nxn)")
+    if sheets.size == 0 or sheets.dtype == bool :
+        return
+    
+    ## Integers seen as unsigned turn negatives into big numbers,
+    ## so one max() tells if there is anything but 0's and 1's
+    if sheets.dtype.kind in "iu" :
+        valid = sheets.view(f"u{sheets.dtype.itemsize}").max() <= 1
+    else :
+        valid = np.all((sheets == 0) | (sheets == 1))
+    if not valid :
+        raise ValueError("Array contains values other than 1's and 0's")
+#########################################################################
+
+#########################################################################
+def pack_sheets(sheets) :
+    '''
+    Function to validate a stack of sheets (N x n x n) and pack it
+    into bits - one row of ceil(n*n/8) bytes per sheet, 8 times
+    smaller than int8 sheets. np.unpackbits restores the sheets
+    '''
+    
+    check_sheet_stack(sheets)
+    flat = sheets.reshape(sheets.shape[0], sheets.shape[1]*sheets.shape[2])
+    if flat.dtype.kind == "f" :
+        flat = flat != 0
+    return np.packbits(flat, axis=1)
+#########################################################################
+
+#########################################################################
+def popcount_bytes(packed) :
+    '''
+    Common function to count the bits set in every element
+    of an unsigned integer array
+    '''
+    
+    global POPCOUNT_TABLE
+    if hasattr(np, "bitwise_count") :
+        return np.bitwise_count(packed)
+    if POPCOUNT_TABLE is None :
+        POPCOUNT_TABLE = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+    return POPCOUNT_TABLE[packed.view(np.uint8)]
+#########################################################################
+
+#########################################################################
+@profiled
+def are_packed_sheets_usable(packed, size) :
+    '''
+    Function to evaluate a bit-packed stack of size x size sheets
+    (as made by pack_sheets) and return a boolean vector of the 
+    sheets which can be used
+    '''
+    
+    if type(packed) != np.ndarray :
+        raise TypeError("Input type is not a numpy array!")
+    row_bytes = -(-size*size // 8)
+    if packed.dtype != np.uint8 or packed.ndim != 2 or packed.shape[1] != row_bytes :
+        raise ValueError(f"Array is not a stack of packed {size}x{size} sheets (N x {row_bytes} uint8)")
+    
+    ## The bits past the end of the sheet are zero when packed
+    pad_bits = row_bytes*8 - size*size
+    if pad_bits and packed.shape[0] and np.any(packed[:, -1] & ((1 << pad_bits) - 1)) :
+        raise ValueError("Packed sheets have bits set past the end of the sheet")
+    
+    ## Counting 8 bytes at a time, then the bytes left over. A slice of
+    ## whole words is only viewed as uint64 once contiguous, which NumPy
+    ## before 1.23 requires (a copy only when the rows have a tail)
+    words = row_bytes // 8 * 8
+    whole = np.ascontiguousarray(packed[:, :words])
+    defects = popcount_bytes(whole.view(np.uint64)).sum(axis=1, dtype=np.int64)
+    if words < row_bytes :
+        defects += popcount_bytes(packed[:, words:]).sum(axis=1, dtype=np.int64)
+    return defects <= defect_limit(size*size)
+#########################################################################
+
+#########################################################################
+@profiled
+def are_sheets_usable(sheets) :
+    '''
+    Function to evaluate a stack of sheets (N x n x n) in one
+    vectorised pass and return a boolean vector of the sheets
+    which can be used - same rules and errors as is_sheet_usable
+    '''
+    
+    return are_packed_sheets_usable(pack_sheets(sheets), sheets.shape[1])
+#########################################################################
+
+#########################################################################
+def open_sheet_file(path, size=None, dtype="int8", packed=False) :
+    '''
+    Function to memory-map a file of sheets - a .npy file (N x n x n,
+    or one n x n sheet) or a raw binary file of size x size sheets of
+    dtype. Packed files hold pack_sheets rows (N x ceil(n*n/8) uint8)
+    Returns the read-only array and the sheet size
+    '''
+    
+    if path.endswith(".npy") :
+        sheets = np.load(path, mmap_mode="r")
+        if not packed and sheets.ndim == 2 :
+            sheets = sheets[None]
+    else :
+        if size is None :
+            raise ValueError(f"The sheet size is needed to read the raw file - {path}")
+        dtype = np.dtype(np.uint8 if packed else dtype)
+        shape = (-(-size*size // 8),) if packed else (size, size)
+        sheet_bytes = int(np.prod(shape)) * dtype.itemsize
+        n_bytes = os.path.getsize(path)
+        if n_bytes % sheet_bytes :
+            raise ValueError(f"File size is not a whole number of {size}x{size} sheets - {path}")
+        if n_bytes == 0 :
+            sheets = np.zeros((0,) + shape, dtype=dtype)
+        else :
+            sheets = np.memmap(path, dtype=dtype, mode="r", shape=(n_bytes // sheet_bytes,) + shape)
+    
+    if packed :
+        if size is None :
+            raise ValueError(f"The sheet size is needed to read the packed file - {path}")
+        if sheets.dtype != np.uint8 or sheets.ndim != 2 or sheets.shape[1] != -(-size*size // 8) :
+            raise ValueError(f"Array is not a stack of packed {size}x{size} sheets - {path}")
+        return sheets, size
+    if sheets.ndim != 3 or sheets.shape[1] != sheets.shape[2] :
+        raise ValueError(f"Array shape is not 100x100 (nxn) - {path}")
+    return sheets, sheets.shape[1]
+#########################################################################
+
+#########################################################################
+def run_profiled(profile, func, *args) :
+    '''
+    Worker function running func(*args) in a pool process, profiled like
+    the parent when profile (PROFILER.worker_state()) is set. Returns
+    the result and the operations recorded, for the parent to merge - 
+    the records of a worker process are otherwise lost with it.
+    A function of this module, so a spawned worker can import it
+    '''
+    
+    if profile is None :
+        return func(*args), []
+    PROFILER.start_worker(profile)
+    result = func(*args)
+    return result, PROFILER.collect()
+#########################################################################
+
+#########################################################################
+def qc_sheet_block(path, start, stop, size=None, dtype="int8", packed=False) :
+    '''
+    Function to check the sheets start:stop of a sheet file, reading
+    each sheet a slab of rows at a time and leaving out the sheets 
+    already over the defect limit, so a rejected sheet is not read 
+    (or validated) past the point where it failed
+    Returns the status of each sheet (1 passed, 0 rejected, -1 not 
+    only 0's and 1's), the defects counted and the bytes read
+    '''
+    
+    sheets, size = open_sheet_file(path, size, dtype, packed)
+    block = np.asarray(sheets[start:stop])
+    n_sheets = block.shape[0]
+    limit = defect_limit(size*size)
+    
+    defects = np.zeros(n_sheets, dtype=np.int64)
+    invalid = np.zeros(n_sheets, dtype=bool)
+    pad_bits = block.shape[1]*8 - size*size if packed else 0
+    if pad_bits and n_sheets :
+        invalid = (block[:, -1] & ((1 << pad_bits) - 1)) != 0
+    active = np.flatnonzero(~invalid)
+    width = block.shape[1]
+    step = max(1, width // 8)
+    n_read = 0
+    for lo in range(0, width, step) :
+        ## A plain slice while every sheet is active, gathering the
+        ## active ones (a copy of one slab) once some are dropped
+        if not active.size :
+            break
+        if active.size == n_sheets :
+            slab = block[:, lo:lo+step]
+        else :
+            slab = block[active, lo:lo+step]
+        slab = slab.reshape(active.size, -1)
+        n_read += slab.nbytes
+        
+        if packed :
+            defects[active] += popcount_bytes(np.ascontiguousarray(slab)).sum(axis=1, dtype=np.int64)
+        else :
+            if slab.dtype.kind in "iu" :
+                bad = slab.view(f"u{slab.dtype.itemsize}").max(axis=1) > 1
+            elif slab.dtype != bool :
+                bad = ~((slab == 0) | (slab == 1)).all(axis=1)
+            else :
+                bad = None
+            if bad is not None and bad.any() :
+                invalid[active[bad]] = True
+            defects[active] += np.count_nonzero(slab, axis=1)
+        
+        active = active[(defects[active] <= limit) & ~invalid[active]]
+    
+    status = (defects <= limit).astype(np.int8)
+    status[invalid] = -1
+    return status, defects, n_read
+#########################################################################
+
+#########################################################################
+def list_sheet_files(source) :
+    '''
+    Function to list the sheet files of a directory (.npy and .bin
+    files, in name order), or the file itself
+    '''
+    
+    if os.path.isdir(source) :
+        return sorted(glob(os.path.join(source, "*.npy")) + glob(os.path.join(source, "*.bin")))
+    if not os.path.exists(source) :
+        raise FileNotFoundError(f"Unable to find sheet file or directory - {source}")
+    return [source]
+#########################################################################
+
+#########################################################################
+class QCStats :
+    '''
+    Running totals of a quality control run - sheets checked,
+    passed, rejected and invalid, the pass rate and throughput
+    '''
+    
+    def __init__(self) :
+        self.start = time.perf_counter()
+        self.sheets = 0
+        self.passed = 0
+        self.invalid = 0
+        self.bytes_read = 0
+    
+    def update(self, status, n_read) :
+        self.sheets += status.size
+        self.passed += int(np.count_nonzero(status == 1))
+        self.invalid += int(np.count_nonzero(status == -1))
+        self.bytes_read += n_read
+    
+    @property
+    def rejected(self) :
+        return self.sheets - self.passed - self.invalid
+    
+    def __str__(self) :
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        rate = 100 * self.passed / max(self.sheets, 1)
+        return (f"Sheets {self.sheets} | passed {self.passed} ({rate:.1f}%) | rejected {self.rejected} "
+                f"| invalid {self.invalid} | {self.sheets/elapsed:,.0f} sheets/s, "
+                f"{self.bytes_read/elapsed/2**20:,.1f} MB/s read")
+#########################################################################
+
+#########################################################################
+def iter_sheet_qc(source, size=None, dtype="int8", packed=False, workers=1, block=4096) :
+    '''
+    Generator running the quality control over every sheet of a sheet
+    file or directory, on a pool of workers processes. It yields, in
+    file order, (path, first sheet index, status, defects) for every 
+    block of sheets. Only a few blocks per worker are in flight, so 
+    memory stays flat however many sheets there are
+    '''
+    
+    from collections import deque
+    
+    tasks = []
+    for path in list_sheet_files(source) :
+        n_sheets = open_sheet_file(path, size, dtype, packed)[0].shape[0]
+        tasks += [(path, lo, min(lo + block, n_sheets)) for lo in range(0, n_sheets, block)]
+    
+    if workers <= 1 :
+        for path, lo, hi in tasks :
+            yield (path, lo) + qc_sheet_block(path, lo, hi, size, dtype, packed)
+        return
+    
+    from concurrent.futures import ProcessPoolExecutor
+    
+    def collect(future) :
+        result, records = future.result()
+        PROFILER.merge(records)
+        return result
+    
+    profile = PROFILER.worker_state()
+    with ProcessPoolExecutor(max_workers=workers) as pool :
+        pending = deque()
+        for path, lo, hi in tasks :
+            pending.append((path, lo, pool.submit(run_profiled, profile, qc_sheet_block,
+                                                  path, lo, hi, size, dtype, packed)))
+            if len(pending) >= 2 * workers :
+                path, lo, future = pending.popleft()
+                yield (path, lo) + collect(future)
+        while pending :
+            path, lo, future = pending.popleft()
+            yield (path, lo) + collect(future)
+#########################################################################
+
+#########################################################################
+@profiled
+def run_sheet_qc(source, size=None, dtype="int8", packed=False, workers=1, block=4096,
+                 output=None, every=1.0) :
+    '''
+    Function to run the quality control over a sheet file or directory,
+    printing the running pass rate and throughput every few seconds and
+    writing the status of every sheet to the output CSV file, if any
+    (file, sheet, status, defects - counted until the sheet failed)
+    Returns the final QCStats
+    '''
+    
+    stats = QCStats()
+    shown = time.perf_counter()
+    names = {-1 : "invalid", 0 : "rejected", 1 : "passed"}
+    with contextlib.ExitStack() as stack :
+        fw = stack.enter_context(open(output, "w")) if output else None
+        if fw :
+            fw.write("file,sheet,status,defects\n")
+        for path, lo, status, defects, n_read in iter_sheet_qc(source, size, dtype, packed, 
+                                                               workers, block) :
+            stats.update(status, n_read)
+            if fw :
+                fname = os.path.basename(path)
+                fw.writelines(f"{fname},{lo+sid},{names[st]},{nd}\n" 
+                              for sid, (st, nd) in enumerate(zip(status.tolist(), defects.tolist())))
+            if time.perf_counter() - shown >= every :
+                shown = time.perf_counter()
+                print(stats, flush=True)
+    print(stats)
+    return stats
+#########################################################################
+
+#########################################################################
+def has_key_column(fname) :
+    '''
+    Function to check from the header row alone
+    if a csv file has a key column
+    '''
+    
+    with open(fname, newline="", encoding="utf-8-sig") as fr :
+        header = next(csv.reader(fr), [])
+    return 'key' in header
+#########################################################################
+
+#########################################################################
+def read_key_csv(fname) :
+    '''
+    Function to read one csv file with its key column as the index
+    Only the header is read first, so a file without a key column is
+    skipped without parsing the rest of it
+    Returns the dataframe (None if skipped), the reason it was 
+    skipped and the seconds taken
+    '''
+    
+    start = time.perf_counter()
+    try :
+        if not has_key_column(fname) :
+            return None, "no key column", time.perf_counter() - start
+        
+        with PROFILER.section("read csv") as frame :
+            csv_df = READCSV(fname, index_col="key")
+            frame["rows"] = csv_df.shape[0]
+    except Exception as err :
+        return None, f"unreadable ({type(err).__name__})", time.perf_counter() - start
+    return csv_df, None, time.perf_counter() - start
+#########################################################################
+
+#########################################################################
+def file_digest(fname) :
+    '''
+    Common function to return the sha1 of the content of a file
+    '''
+    
+    digest = hashlib.sha1()
+    with open(fname, "rb") as fr :
+        for block in iter(lambda : fr.read(2**20), b"") :
+            digest.update(block)
+    return digest.hexdigest()
+#########################################################################
+
+#########################################################################
+class FragmentCache :
+    '''
+    Manifest of the csv files combined from a directory - the size,
+    modification time and content hash of each, by absolute path - 
+    with the parsed dataframe of every file pickled next to it, so a
+    re-run only parses the files which are new or changed
+    
+    A file whose size or time changed is hashed, and still reused
+    if its content is the same. A file which could not be read is not
+    remembered, so it is read again on the next run
+    '''
+    
+    def __init__(self, cache_dir) :
+        self.cache_dir = cache_dir
+        self.manifest = os.path.join(cache_dir, "manifest.json")
+        os.makedirs(cache_dir, exist_ok=True)
+        try :
+            with open(self.manifest) as fr :
+                self.entries = json.load(fr)["files"]
+        except (OSError, ValueError, KeyError) :
+            self.entries = {}
+        self.reused = 0
+        self.parsed = 0
+        self.removed = 0
+        self.lock = threading.Lock()
+    
+    def fragment_path(self, fpath) :
+        return os.path.join(self.cache_dir, hashlib.sha1(fpath.encode()).hexdigest()[:16] + ".pkl")
+    
+    def read(self, fname) :
+        '''
+        Function to read a csv file like read_key_csv, from its
+        fragment if the file has not changed
+        '''
+        
+        start = time.perf_counter()
+        fpath = os.path.abspath(fname)
+        try :
+            fstat = os.stat(fpath)
+            entry = self.entries.get(fpath)
+            digest = None
+            if entry is not None and (entry["size"], entry["mtime_ns"]) != (fstat.st_size, fstat.st_mtime_ns) :
+                digest = file_digest(fpath)
+                if digest != entry["sha1"] :
+                    entry = None
+        except OSError as err :
+            self.forget(fpath)
+            return None, f"unreadable ({type(err).__name__})", time.perf_counter() - start
+        
+        if entry is not None :
+            try :
+                csv_df = None
+                if not entry["skipped"] :
+                    with open(self.fragment_path(fpath), "rb") as fr :
+                        csv_df = pickle.load(fr)
+                with self.lock :
+                    entry.update(size=fstat.st_size, mtime_ns=fstat.st_mtime_ns)
+                    self.reused += 1
+                return csv_df, entry["skipped"], time.perf_counter() - start
+            except (OSError, EOFError, pickle.UnpicklingError) :
+                pass
+        
+        try :
+            digest = digest or file_digest(fpath)
+        except OSError as err :
+            self.forget(fpath)
+            return None, f"unreadable ({type(err).__name__})", time.perf_counter() - start
+        csv_df, skipped, seconds = read_key_csv(fname)
+        if skipped and skipped != "no key column" :
+            ## A read error may not happen again, so the file is not remembered
+            self.forget(fpath)
+            return None, skipped, time.perf_counter() - start
+        if csv_df is not None :
+            frag_path = self.fragment_path(fpath)
+            with open(frag_path + ".part", "wb") as fw :
+                pickle.dump(csv_df, fw, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(frag_path + ".part", frag_path)
+        with self.lock :
+            self.entries[fpath] = {"size" : fstat.st_size, "mtime_ns" : fstat.st_mtime_ns,
+                                   "sha1" : digest, "skipped" : skipped}
+            self.parsed += 1
+        return csv_df, skipped, time.perf_counter() - start
+    
+    def forget(self, fpath) :
+        '''
+        Function to drop the entry and the fragment of a file
+        '''
+        
+        with self.lock :
+            if self.entries.pop(fpath, None) is None :
+                return False
+        with contextlib.suppress(FileNotFoundError) :
+            os.remove(self.fragment_path(fpath))
+        return True
+    
+    def prune(self, directory, fnames) :
+        '''
+        Function to forget the files of directory which are not in
+        fnames any more, deleting their fragments - the entries of other
+        directories sharing the cache are kept
+        '''
+        
+        directory = os.path.abspath(directory)
+        keep = {os.path.abspath(fname) for fname in fnames}
+        for fpath in [fpath for fpath in self.entries
+                      if os.path.dirname(fpath) == directory and fpath not in keep] :
+            if self.forget(fpath) :
+                self.removed += 1
+    
+    def save(self) :
+        with open(self.manifest + ".part", "w") as fw :
+            json.dump({"files" : self.entries}, fw, indent=1)
+        os.replace(self.manifest + ".part", self.manifest)
+#########################################################################
+
+#########################################################################
+class KeyRunSpiller :
+    '''
+    First pass of the out-of-core combine for one csv file - reads it
+    in chunks, sorts every chunk by key and spills it as a run of small
+    pickled blocks, while counting the filled values of every column
+    
+    Rows without a key go to a separate run, as sorting puts them last
+    '''
+    
+    def __init__(self, fname, spill_dir, chunk_bytes, block_bytes) :
+        self.fname = fname
+        self.spill_dir = spill_dir
+        self.chunk_bytes = chunk_bytes
+        self.block_bytes = block_bytes
+        self.runs = []
+        self.nokey_run = None
+        self.rows = 0
+        self.filled = {}
+        self.kinds = {}
+        self.key_kinds = set()
+        self.row_bytes = 1
+    
+    def new_run(self) :
+        fd, path = tempfile.mkstemp(suffix=".run", dir=self.spill_dir)
+        os.close(fd)
+        return path
+    
+    def write_blocks(self, path, frame, mode="wb") :
+        block_rows = max(1, self.block_bytes // self.row_bytes)
+        with open(path, mode) as fw :
+            for lo in range(0, frame.shape[0], block_rows) :
+                pickle.dump(frame.iloc[lo:lo+block_rows], fw, protocol=pickle.HIGHEST_PROTOCOL)
+    
+    def add_chunk(self, chunk) :
+        self.rows += chunk.shape[0]
+        for col, count in chunk.notna().sum().items() :
+            self.filled[col] = self.filled.get(col, 0) + int(count)
+            self.kinds.setdefault(col, set()).add(chunk[col].dtype.kind)
+        self.key_kinds.add(chunk.index.dtype.kind)
+        
+        nokey = chunk.index.isna()
+        if nokey.any() :
+            self.key_kinds.add("f")
+            if self.nokey_run is None :
+                self.nokey_run = self.new_run()
+            self.write_blocks(self.nokey_run, chunk[nokey], "ab")
+            chunk = chunk[~nokey]
+        self.runs.append(self.new_run())
+        self.write_blocks(self.runs[-1], chunk.sort_index(kind="stable"))
+    
+    def spill(self) :
+        ## A small first chunk gives the size of a row, and so
+        ## the rows of a chunk within the memory budget
+        reader = READCSV(self.fname, index_col="key", chunksize=1000)
+        with reader :
+            chunk = reader.get_chunk(1000)
+            self.row_bytes = max(1, int(chunk.memory_usage(deep=True).sum()) // max(chunk.shape[0], 1))
+            chunk_rows = max(1000, self.chunk_bytes // self.row_bytes)
+            while True :
+                self.add_chunk(chunk)
+                try :
+                    chunk = reader.get_chunk(chunk_rows)
+                except StopIteration :
+                    break
+        return self
+    
+    def discard(self) :
+        for path in self.runs + [self.nokey_run] :
+            if path is not None and os.path.exists(path) :
+                os.remove(path)
+#########################################################################
+
+#########################################################################
+def iter_run_blocks(path) :
+    '''
+    Generator of the blocks of a spilled run, in order
+    '''
+    
+    with open(path, "rb") as fr :
+        while True :
+            try :
+                yield pickle.load(fr)
+            except EOFError :
+                return
+#########################################################################
+
+#########################################################################
+def merge_key_runs(runs, emit) :
+    '''
+    Function to k-way merge runs sorted by key, holding one block per run
+    at a time. Every step emits, stably sorted, all the buffered rows with
+    a key below the smallest last key of the runs not yet read to the end,
+    so rows with equal keys come out in the order of the runs, as a stable
+    sort of all the rows would give
+    '''
+    
+    readers = [iter_run_blocks(path) for path in runs]
+    buffers = [next(reader, None) for reader in readers]
+    live = [buf is not None for buf in buffers]
+    while True :
+        ends = [buf.index[-1] for buf, on in zip(buffers, live) if on and buf.shape[0]]
+        bound = min(ends) if ends else None
+        
+        parts = []
+        for rid, buf in enumerate(buffers) :
+            if buf is None or not buf.shape[0] :
+                continue
+            pos = buf.shape[0] if bound is None else buf.index.searchsorted(bound, side="left")
+            if pos :
+                parts.append(buf.iloc[:pos])
+                buffers[rid] = buf.iloc[pos:]
+        if parts :
+            emit(CONCAT(parts, axis=0, sort=False).sort_index(kind="stable"))
+        if bound is None :
+            return
+        
+        ## Runs down to keys equal to the bound need their next block
+        for rid, on in enumerate(live) :
+            buf = buffers[rid]
+            if on and (not buf.shape[0] or buf.index[-1] == bound) :
+                block = next(readers[rid], None)
+                if block is None :
+                    live[rid] = False
+                else :
+                    buffers[rid] = CONCAT([buf, block], axis=0, sort=False) if buf.shape[0] else block
+#########################################################################
+
+#########################################################################
+def combine_csv_external(list_of_files, output_filename, memory_budget, workers=1, spill_dir=None) :
+    '''
+    Function to combine the csv files out of core, within about
+    memory_budget MB - every file is sorted by key into spilled runs,
+    which are merged (in several passes if there are too many of them
+    to merge at once) straight into the output file. The filled values
+    of every column are counted on the first pass, so the 50% rule
+    needs no second read of the data
+    Returns the number of files combined and the rows and columns written
+    '''
+    
+    from concurrent.futures import ThreadPoolExecutor
+    
+    budget = max(memory_budget, 1) * 2**20
+    workers = max(1, min(workers, len(list_of_files)))
+    ## A quarter of the budget for the chunks being sorted, and blocks
+    ## small enough for fan_in runs (and the merge copies) to fit
+    chunk_bytes = budget // (4 * workers)
+    block_bytes = max(budget // 64, 2**16)
+    fan_in = max(2, budget // (4 * block_bytes))
+    
+    tmp_dir = tempfile.mkdtemp(prefix="combine_", dir=spill_dir)
+    try :
+        def spill(fname) :
+            start = time.perf_counter()
+            spiller = None
+            ## The header check is inside the try too, as in read_key_csv
+            try :
+                if not has_key_column(fname) :
+                    return None, "no key column", time.perf_counter() - start
+                spiller = KeyRunSpiller(fname, tmp_dir, chunk_bytes, block_bytes)
+                with PROFILER.section("sort runs") as frame :
+                    spiller.spill()
+                    frame["rows"] = spiller.rows
+            except Exception as err :
+                if spiller is not None :
+                    spiller.discard()
+                return None, f"unreadable ({type(err).__name__})", time.perf_counter() - start
+            return spiller, None, time.perf_counter() - start
+        
+        with ThreadPoolExecutor(max_workers=workers) as pool :
+            results = list(pool.map(spill, list_of_files))
+        
+        spillers = []
+        for each_f, (spiller, skipped, seconds) in zip(list_of_files, results) :
+            if skipped :
+                print(f"\t{os.path.basename(each_f)} - skipped, {skipped} ({seconds:.3f} s)")
+            else :
+                print(f"\t{os.path.basename(each_f)} - {spiller.rows} rows sorted into "
+                      f"{len(spiller.runs)} run(s) in {seconds:.3f} s")
+                spillers.append(spiller)
+        if not spillers :
+            DF().to_csv(output_filename)
+            return 0, 0, 0
+        
+        ## Columns kept by the 50% rule, and the dtypes concat would give
+        ## them - integers with gaps or mixed with floats become floats
+        rows = sum(sp.rows for sp in spillers)
+        filled, kinds = {}, {}
+        for sp in spillers :
+            for col, count in sp.filled.items() :
+                filled[col] = filled.get(col, 0) + count
+                kinds.setdefault(col, set()).update(sp.kinds[col])
+        columns = [col for col in sorted(filled) if filled[col] >= math.ceil(rows * 0.5)]
+        as_float = [col for col in columns if kinds[col] <= set("iuf") and 
+                    ("f" in kinds[col] or filled[col] < rows)]
+        key_kinds = set().union(*(sp.key_kinds for sp in spillers))
+        key_float = key_kinds <= set("iuf") and "f" in key_kinds
+        
+        runs = [run for sp in spillers for run in sp.runs]
+        nokey_runs = [sp.nokey_run for sp in spillers if sp.nokey_run is not None]
+        row_bytes = max(sp.row_bytes for sp in spillers)
+        block_rows = max(1, block_bytes // row_bytes)
+        
+        ## Merging groups of fan_in consecutive runs (keeping the order
+        ## of equal keys) until one pass can merge them all
+        while len(runs) > fan_in :
+            merged = []
+            for lo in range(0, len(runs), fan_in) :
+                group = runs[lo:lo+fan_in]
+                if len(group) == 1 :
+                    merged += group
+                    continue
+                fd, path = tempfile.mkstemp(suffix=".run", dir=tmp_dir)
+                with os.fdopen(fd, "wb") as fw :
+                    def emit(frame) :
+                        for blo in range(0, frame.shape[0], block_rows) :
+                            pickle.dump(frame.iloc[blo:blo+block_rows], fw, 
+                                        protocol=pickle.HIGHEST_PROTOCOL)
+                    merge_key_runs(group, emit)
+                for run in group :
+                    os.remove(run)
+                merged.append(path)
+            runs = merged
+        
+        written = [0]
+        with open(output_filename, "w", newline="") as fw :
+            def emit(frame) :
+                frame = frame.reindex(columns, axis=1)
+                for col in as_float :
+                    frame[col] = frame[col].astype("float64")
+                if key_float :
+                    frame.index = frame.index.astype("float64")
+                frame.to_csv(fw, header=not written[0] and frame.shape[0] > 0)
+                written[0] += frame.shape[0]
+            
+            with PROFILER.section("merge runs") as frame :
+                merge_key_runs(runs, emit)
+                for run in nokey_runs :
+                    for block in iter_run_blocks(run) :
+                        emit(block)
+                frame["rows"] = written[0]
+            if not written[0] :
+                empty = DF(columns=columns)
+                empty.index.name = "key"
+                empty.to_csv(fw)
+        return len(spillers), written[0], len(columns)
+    finally :
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+#########################################################################
+
+#########################################################################
+@profiled
+def combine_csv_files(directory, output_filename, workers=None, memory_budget=None, spill_dir=None,
+                      cache_dir=None) :
     '''
     Function to combine multiple csv 
     in same format into a dataframe
+    
+    The files are read on a pool of workers threads (default - one 
+    per core, up to 8) and joined with a single concat, the union of
+    their columns. The time taken by every file is reported
+    
+    With a memory_budget (MB) the files are combined out of core
+    instead, by an external merge on key (see combine_csv_external)
+    
+    With a cache_dir, only the files which are new or changed since
+    the last run are parsed, the others come from the cached fragments
+    (see FragmentCache)
     '''
     
+    from concurrent.futures import ThreadPoolExecutor
+    
     #Checking if directory path exists
     if not os.path.exists(directory) :
         raise FileNotFoundError(f"Unable to find directory - {directory}")
     
     # Listing all the csv files present in the given directory
-    list_of_files = glob(os.path.join(directory, "*.csv"))
-    #Declaring an empty dataframe
-    combined_df = DF()
+    list_of_files = sorted(glob(os.path.join(directory, "*.csv")))
+    workers = workers or min(os.cpu_count() or 1, 8)
     
-    # Iterating through all the .csv files
-    for each_f in list_of_files :
-        try :
-            # Reading csv file using pandas dataframe module read_csv
-            csv_df = READCSV(each_f)
-            
-            # Extracting all the column names and checking 
-            # if 'key' is part of columns
-            # else, skipping the csv file
-            csv_col_names = csv_df.columns.to_list()
-            if 'key' not in csv_col_names :
-                continue
-            
-            # Setting up key named column as index 
-            csv_df.set_index("key", inplace=True)
-            
-            # Combining csv data to the empty dataframe
-            combined_df = combined_df.append(csv_df)
-            
-        except :
-            continue
+    # Reading the files concurrently, in the order of the listing
+    start = time.perf_counter()
+    if memory_budget :
+        n_files, n_rows, n_cols = combine_csv_external(list_of_files, output_filename, memory_budget,
+                                                       workers, spill_dir)
+        print(f"Combined {n_files} of {len(list_of_files)} file(s) into {output_filename} - "
+              f"{n_rows} rows, {n_cols} columns in {time.perf_counter()-start:.3f} s "
+              f"(out of core, {memory_budget} MB budget)")
+        return 1
+    cache = FragmentCache(cache_dir) if cache_dir else None
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(list_of_files)))) as pool :
+        results = list(pool.map(cache.read if cache else read_key_csv, list_of_files))
+    if cache :
+        cache.prune(directory, list_of_files)
+        cache.save()
+        print(f"Cache {cache_dir} - {cache.reused} file(s) reused, {cache.parsed} parsed, "
+              f"{cache.removed} removed")
+    
+    frames = []
+    for each_f, (csv_df, skipped, seconds) in zip(list_of_files, results) :
+        if skipped :
+            print(f"\t{os.path.basename(each_f)} - skipped, {skipped} ({seconds:.3f} s)")
+        else :
+            print(f"\t{os.path.basename(each_f)} - {csv_df.shape[0]} rows in {seconds:.3f} s")
+            frames.append(csv_df)
+    
+    # Combining all the fragments at once
+    combined_df = CONCAT(frames, axis=0, sort=False) if frames else DF()
     
     # Sorting dataframe index columns in ascending order
-    combined_df = combined_df.sort_index(ascending=True)
+    combined_df = combined_df.sort_index(ascending=True, kind="stable")
     
     # Sorting all the columns in alphabetical order
     combined_df_cols = list(combined_df.columns.values)
@@ -96,20 +941,415 @@ def combine_csv_files(directory, output_filename) :
     combined_df = combined_df.reindex(combined_df_cols_sorted, axis=1)
     
     # Dropping columns if 50% of the rows are null
+    # (keeping the columns with at least half of the rows filled)
     perc_th = 0.5
-    combined_df = combined_df.dropna(thresh=combined_df.shape[0]*perc_th, 
-                                     how='all', axis=1)
+    combined_df = combined_df.dropna(thresh=math.ceil(combined_df.shape[0]*perc_th), axis=1)
     
     # Dumping the final data into output csv file
-    combined_df.to_csv(output_filename)
+    with PROFILER.section("write csv") as frame :
+        combined_df.to_csv(output_filename)
+        frame["rows"] = combined_df.shape[0]
     
+    print(f"Combined {len(frames)} of {len(list_of_files)} file(s) into {output_filename} - "
+          f"{combined_df.shape[0]} rows, {combined_df.shape[1]} columns in "
+          f"{time.perf_counter()-start:.3f} s")
     return 1
 #########################################################################
 
 #########################################################################
-def make_html_files(directory) :
+def neighbour_links(prev_page=None, next_page=None) :
+    '''
+    Common function to return the links of a page to the
+    pages before and after it in index.txt
+    '''
+    
+    links = []
+    if prev_page is not None :
+        links.append(f"""Previous: <a href="{prev_page[1]}">{prev_page[2]}</a>""")
+    if next_page is not None :
+        links.append(f"""Next: <a href="{next_page[1]}">{next_page[2]}</a>""")
+    return "\n".join(links)
+#########################################################################
+
+#########################################################################
+def write_html_page(html_path, title, para_html, table_html_str, plot_fname) :
+    '''
+    Common function to write an HTML page - title, links, table and plot
+    '''
+    
+    html_str = f"""
+        <html>
+            <body>
+                <h1>{title}</h1>
+                <p>
+                  {para_html}  
+                </p>
+                {table_html_str}
+                <img src="{plot_fname}">
+            </body>
+        </html>
+        """
+    
+    with open(html_path, "w") as fw :
+        fw.write(html_str)
+#########################################################################
+
+#########################################################################
+def minmax_points(xs, ys, bucket) :
+    '''
+    Function to keep, of the points (xs, ys) of a line, the lowest 
+    and the highest of every bucket of rows, in order of xs
+    '''
+    
+    keep = ~np.isnan(ys)
+    xs, ys = xs[keep], ys[keep]
+    if not xs.size :
+        return xs, ys
+    groups = xs // bucket
+    order = np.lexsort((ys, groups))
+    ends = groups[order][1:] != groups[order][:-1]
+    pick = np.unique(np.concatenate([order[np.r_[True, ends]], order[np.r_[ends, True]]]))
+    return xs[pick], ys[pick]
+#########################################################################
+
+#########################################################################
+class LinePlotReducer :
+    '''
+    Line plot of a csv file read in chunks, reduced on the way to the
+    lowest and highest point of every bucket of rows of every column.
+    The bucket doubles whenever a column keeps more than max_points,
+    so the plot keeps the envelope of the data in bounded memory
+    '''
+    
+    def __init__(self, max_points=2000) :
+        self.max_points = max_points
+        self.bucket = 1
+        self.points = {}
+    
+    def add(self, chunk, offset) :
+        xs = np.arange(offset, offset + chunk.shape[0])
+        for col in chunk.columns :
+            if chunk[col].dtype.kind not in "iufb" :
+                continue
+            ys = chunk[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            if col in self.points :
+                ys = np.concatenate([self.points[col][1], ys])
+                col_xs = np.concatenate([self.points[col][0], xs])
+            else :
+                col_xs = xs
+            self.points[col] = minmax_points(col_xs, ys, self.bucket)
+        while max((x.size for x, _ in self.points.values()), default=0) > self.max_points :
+            self.bucket *= 2
+            self.points = {col : minmax_points(x, y, self.bucket) for col, (x, y) in self.points.items()}
+    
+    def save(self, title, plot_fname) :
+        pyplot = load_pyplot()
+        fig, axes = pyplot.subplots()
+        try :
+            for col, (xs, ys) in self.points.items() :
+                axes.plot(xs, ys, label=col)
+            axes.set_title(title)
+            if self.points :
+                axes.legend()
+            fig.savefig(plot_fname)
+        finally :
+            pyplot.close(fig)
+#########################################################################
+
+#########################################################################
+class ColumnSummary :
+    '''
+    Count, mean, standard deviation, min and max of the numeric
+    columns of a csv file read in chunks, merged chunk by chunk
+    '''
+    
+    def __init__(self) :
+        self.rows = 0
+        self.stats = {}
+    
+    def add(self, chunk) :
+        self.rows += chunk.shape[0]
+        for col in chunk.columns :
+            if chunk[col].dtype.kind not in "iufb" :
+                continue
+            values = chunk[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            values = values[~np.isnan(values)]
+            stat = self.stats.setdefault(col, [0, 0.0, 0.0, math.inf, -math.inf])
+            if not values.size :
+                continue
+            n_b, mean_b = values.size, values.mean()
+            m2_b = ((values - mean_b)**2).sum()
+            n_a, mean_a, m2_a = stat[:3]
+            delta = mean_b - mean_a
+            stat[0] = n_a + n_b
+            stat[1] = mean_a + delta * n_b / stat[0]
+            stat[2] = m2_a + m2_b + delta**2 * n_a * n_b / stat[0]
+            stat[3] = min(stat[3], values.min())
+            stat[4] = max(stat[4], values.max())
+    
+    def to_html(self) :
+        table = {}
+        for col, (count, mean, m2, low, high) in self.stats.items() :
+            table[col] = [count, mean if count else math.nan, 
+                          math.sqrt(m2 / (count - 1)) if count > 1 else math.nan,
+                          low if count else math.nan, high if count else math.nan]
+        return DF(table, index=["count", "mean", "std", "min", "max"]).to_html()
+#########################################################################
+
+#########################################################################
+def subpage_name(page, number) :
+    '''
+    Common function to return the html file of the sub-page 
+    number (from 0) of a paginated page
+    '''
+    
+    return page[1] if number == 0 else f"{page[2]}_{number+1}.html"
+#########################################################################
+
+#########################################################################
+def render_streamed_page(directory, page, prev_page=None, next_page=None, page_rows=None, 
+                         summary_only=False) :
+    '''
+    Function to write the HTML page of a csv file of any size - the 
+    file is read page_rows rows at a time, each written as a sub-page 
+    of its own linked to the ones before and after it, or only to a 
+    summary of its columns with summary_only. The plot is reduced as
+    the rows go by (see LinePlotReducer), so the memory taken depends
+    on page_rows and not on the size of the file
+    Returns the name of the page, its rows and the html files written
+    '''
+    
+    curr_fpath = os.path.join(directory, page[0])
+    plot_fname = f"{page[2]}.png"
+    para_html = neighbour_links(prev_page, next_page)
+    reducer = LinePlotReducer(HTML_PLOT_POINTS)
+    summary = ColumnSummary()
+    written = []
+    
+    offset = 0
+    with READCSV(curr_fpath, chunksize=page_rows or STREAM_CHUNK_ROWS) as reader :
+        ## One chunk read ahead, to know if a sub-page has a next one
+        chunks = iter(reader)
+        chunk = next(chunks, None)
+        while chunk is not None :
+            following = next(chunks, None)
+            reducer.add(chunk, offset)
+            summary.add(chunk)
+            if not summary_only :
+                number = len(written)
+                nav = []
+                if number :
+                    nav.append(f"""<a href="{subpage_name(page, number-1)}">Previous rows</a>""")
+                if following is not None :
+                    nav.append(f"""<a href="{subpage_name(page, number+1)}">Next rows</a>""")
+                with PROFILER.section("html table") as frame :
+                    table_html_str = (f"<p>Rows {offset+1}-{offset+chunk.shape[0]}</p>\n"
+                                      f"{chunk.to_html(index=False)}\n<p>{' | '.join(nav)}</p>")
+                    frame["rows"] = chunk.shape[0]
+                write_html_page(os.path.join(directory, subpage_name(page, number)), page[2],
+                                para_html, table_html_str, plot_fname)
+                written.append(subpage_name(page, number))
+            offset += chunk.shape[0]
+            chunk = following
+    
+    if summary_only :
+        table_html_str = f"<p>{summary.rows} rows</p>\n{summary.to_html()}"
+        write_html_page(os.path.join(directory, page[1]), page[2], para_html, table_html_str, plot_fname)
+        written.append(page[1])
+    elif not written :
+        table_html_str = READCSV(curr_fpath, nrows=0).to_html(index=False)
+        write_html_page(os.path.join(directory, page[1]), page[2], para_html, table_html_str, plot_fname)
+        written.append(page[1])
+    
+    with PROFILER.section("plot") as frame :
+        reducer.save(page[2], plot_fname)
+        frame["rows"] = offset
+    return page[2], offset, written
+#########################################################################
+
+#########################################################################
+def init_html_worker() :
+    '''
+    Worker initializer importing pyplot once per process. A function of
+    this module, so a spawned worker imports this module - and with it
+    the shared helpers - before running it
+    '''
+    
+    load_pyplot()
+#########################################################################
+
+#########################################################################
+def render_html_page(directory, page, prev_page=None, next_page=None, page_rows=None, 
+                     summary_only=False) :
+    '''
+    Function to write the HTML page and the plot of one csv file
+    page, prev_page and next_page are (csv file, html file, name) 
+    of the page and its neighbours in index.txt
+    With page_rows or summary_only, the file is streamed instead
+    (see render_streamed_page)
+    Returns the name of the page, the rows of its table and the
+    html files written
+    '''
+    
+    if page_rows or summary_only :
+        return render_streamed_page(directory, page, prev_page, next_page, page_rows, summary_only)
+    pyplot = load_pyplot()
+    
+    curr_fpath = os.path.join(directory, page[0])
+    html_path = os.path.join(directory, page[1])
+    plot_fname = f"{page[2]}.png"#os.path.join(directory, f"{page[2]}.png")
+    para_html = neighbour_links(prev_page, next_page)
+    
+    curr_f_df = READCSV(curr_fpath)
+    with PROFILER.section("html table") as frame :
+        table_html_str = curr_f_df.to_html(index=False)
+        frame["rows"] = curr_f_df.shape[0]
+    
+    ## Plots only go to files, no display backend needed
+    ## The figure is closed once saved, pyplot would keep it alive
+    with PROFILER.section("plot") as frame :
+        fig, axes = pyplot.subplots()
+        try :
+            curr_f_df.plot.line(title=page[2], ax=axes)
+            fig.savefig(plot_fname)
+        finally :
+            pyplot.close(fig)
+        frame["rows"] = curr_f_df.shape[0]
+    
+    write_html_page(html_path, page[2], para_html, table_html_str, plot_fname)
+    return page[2], curr_f_df.shape[0], [page[1]]
+#########################################################################
+
+#########################################################################
+class HtmlBuildState :
+    '''
+    Record of the last build of the HTML pages of a directory, kept in
+    .html_build.json - the size, modification time and content hash of
+    every csv file, the neighbours its page links to and the files it
+    was written to, with the build options - so a build can leave out
+    the pages whose data and links did not change
+    '''
+    
+    def __init__(self, directory) :
+        self.path = os.path.join(directory, ".html_build.json")
+        try :
+            with open(self.path) as fr :
+                state = json.load(fr)
+            self.pages = state["pages"]
+            self.options = state.get("options", {})
+        except (OSError, ValueError, KeyError) :
+            self.pages = {}
+            self.options = {}
+    
+    @staticmethod
+    def outputs(entry) :
+        return entry.get("outputs", [entry.get("html")]) + [entry["png"]]
+    
+    def fingerprint(self, csv_path) :
+        '''
+        Function to return (size, mtime_ns, sha1) of a csv file, only
+        hashing it if its size or time differ from the last build
+        '''
+        
+        fstat = os.stat(csv_path)
+        last = self.pages.get(csv_path)
+        if last is not None and (last["size"], last["mtime_ns"]) == (fstat.st_size, fstat.st_mtime_ns) :
+            return fstat.st_size, fstat.st_mtime_ns, last["sha1"]
+        return fstat.st_size, fstat.st_mtime_ns, file_digest(csv_path)
+    
+    def plan(self, pages, options) :
+        '''
+        Function to sort the pages (render_html_page arguments) into
+        the ones to rebuild, with the reason, and the ones to skip
+        Returns ([(page args, reason)], skipped names, {csv path : entry})
+        '''
+        
+        rebuild, skipped, entries = [], [], {}
+        for args in pages :
+            directory, page, prev_page, next_page = args[:4]
+            csv_path = os.path.abspath(os.path.join(directory, page[0]))
+            size, mtime_ns, sha1 = self.fingerprint(csv_path)
+            entry = {"size" : size, "mtime_ns" : mtime_ns, "sha1" : sha1,
+                     "outputs" : [os.path.abspath(os.path.join(directory, page[1]))], 
+                     "png" : os.path.abspath(f"{page[2]}.png"),
+                     "prev" : prev_page and prev_page[1], "next" : next_page and next_page[1]}
+            entries[csv_path] = entry
+            
+            last = self.pages.get(csv_path)
+            if last is None :
+                reason = "new"
+            elif last["sha1"] != sha1 :
+                reason = "data changed"
+            elif self.options != options :
+                reason = "options changed"
+            elif (last["prev"], last["next"]) != (entry["prev"], entry["next"]) :
+                reason = "links changed"
+            elif not all(os.path.exists(out_path) for out_path in self.outputs(last)) :
+                reason = "output missing"
+            else :
+                entry["outputs"] = last.get("outputs", entry["outputs"])
+                skipped.append(page[2])
+                continue
+            rebuild.append((args, reason))
+        return rebuild, skipped, entries
+    
+    def record(self, rebuild, done, entries) :
+        '''
+        Function to note the html files written for the rebuilt pages,
+        deleting the sub-pages of their last build not written again
+        '''
+        
+        for (args, _), (_, _, written) in zip(rebuild, done) :
+            csv_path = os.path.abspath(os.path.join(args[0], args[1][0]))
+            entry = entries[csv_path]
+            entry["outputs"] = [os.path.abspath(os.path.join(args[0], name)) for name in written]
+            last = self.pages.get(csv_path)
+            for out_path in (self.outputs(last) if last else []) :
+                if out_path not in self.outputs(entry) :
+                    with contextlib.suppress(FileNotFoundError, TypeError) :
+                        os.remove(out_path)
+    
+    def remove_stale(self, entries) :
+        '''
+        Function to delete the outputs of the pages which are not
+        in index.txt any more. Returns their csv files
+        '''
+        
+        removed = []
+        for csv_path, last in self.pages.items() :
+            if csv_path in entries :
+                continue
+            for out_path in self.outputs(last) :
+                with contextlib.suppress(FileNotFoundError, TypeError) :
+                    os.remove(out_path)
+            removed.append(os.path.basename(csv_path))
+        return removed
+    
+    def save(self, entries, options) :
+        self.pages = entries
+        self.options = options
+        with open(self.path + ".part", "w") as fw :
+            json.dump({"options" : options, "pages" : entries}, fw, indent=1)
+        os.replace(self.path + ".part", self.path)
+#########################################################################
+
+#########################################################################
+@profiled
+def make_html_files(directory, workers=1, incremental=False, page_rows=None, summary_only=False) :
     '''
     Function to create simple HTML pages
+    
+    With more than one worker, the pages are rendered on a pool of
+    processes, each importing pyplot with the Agg backend once
+    
+    An incremental build only renders the pages whose csv file changed
+    since the last build, or whose previous / next page changed (pages
+    added, removed or moved in index.txt), see HtmlBuildState
+    
+    With page_rows, the tables are split into linked sub-pages of that
+    many rows, and with summary_only they are replaced by a summary of
+    the columns - the csv files are then streamed, so large files take
+    bounded time and memory per page (see render_streamed_page)
     '''
     
     ## Looking for index.txt file in the directory
@@ -118,8 +1358,8 @@ def make_html_files(directory) :
         raise FileNotFoundError(f"Unable to find index.txt file in directory - {directory}")
     
     ## Reading file data and maintaining the sequence
-    fr = open(index_fpath, "r")
-    file_lines = [x.strip() for x in fr.readlines()]
+    with open(index_fpath, "r") as fr :
+        file_lines = [x.strip() for x in fr.readlines()]
     
     ## Mapping each csv file to corresponding html file path
     ## Also, maintaining the same sequence defined in index.txt
@@ -136,61 +1376,98 @@ def make_html_files(directory) :
     ##    forming the data html code using dataframe
     ##    plotting the data using dataframe
     ## Finally, writing all in the corresponding HTML file
-    for fid, each_f_data in enumerate(csv_to_html_map) :
-        prev_link = None
-        next_link = None
-        
-        curr_fpath = os.path.join(directory, each_f_data[0])
-        html_path = os.path.join(directory, each_f_data[1])
-        plot_fname = f"{each_f_data[2]}.png"#os.path.join(directory, f"{each_f_data[2]}.png")
-        
-        if fid == 0 :
-            next_link = csv_to_html_map[fid+1][1]
-            next_fname = csv_to_html_map[fid+1][2] 
-            para_html = f"""Next: <a href="{next_link}">{next_fname}</a>"""
-        elif fid == (file_len-1) :
-            prev_link = csv_to_html_map[fid-1][1]
-            prev_fname = csv_to_html_map[fid-1][2] 
-            para_html = f"""Previous: <a href="{prev_link}">{prev_fname}</a>"""
-        else :
-            next_link = csv_to_html_map[fid+1][1]
-            next_fname = csv_to_html_map[fid+1][2] 
-            prev_link = csv_to_html_map[fid-1][1]
-            prev_fname = csv_to_html_map[fid-1][2] 
-            para_html = f"""Previous: <a href="{prev_link}">{prev_fname}</a>\nNext: <a href="{next_link}">{next_fname}</a>"""
-        
-        
-        curr_f_df = READCSV(curr_fpath)
-        table_html_str = curr_f_df.to_html(index=False)
-        
-        plt = curr_f_df.plot.line(title=each_f_data[2])
-        fig = plt.get_figure()
-        fig.savefig(plot_fname)
-         
-        html_str = f"""
-        <html>
-            <body>
-                <h1>{each_f_data[2]}</h1>
-                <p>
-                  {para_html}  
-                </p>
-                {table_html_str}
-                <img src="{plot_fname}">
-            </body>
-        </html>
-        """
-        
-        fw = open(html_path, "w")
-        fw.write(html_str)
-        fw.close()
+    pages = [(directory, each_f_data,
+              csv_to_html_map[fid-1] if fid > 0 else None,
+              csv_to_html_map[fid+1] if fid < file_len-1 else None,
+              page_rows, summary_only)
+             for fid, each_f_data in enumerate(csv_to_html_map)]
+    
+    start = time.perf_counter()
+    options = {"page_rows" : page_rows, "summary_only" : summary_only}
+    if incremental :
+        state = HtmlBuildState(directory)
+        rebuild, skipped, entries = state.plan(pages, options)
+        removed = state.remove_stale(entries)
+        pages = [args for args, _ in rebuild]
+    
+    workers = max(1, min(workers or 1, len(pages)))
+    if workers == 1 :
+        done = [render_html_page(*args) for args in pages]
+    else :
+        from concurrent.futures import ProcessPoolExecutor
+        render = functools.partial(run_profiled, PROFILER.worker_state(), render_html_page)
+        done = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_html_worker) as pool :
+            for result, records in pool.map(render, *zip(*pages), 
+                                            chunksize=max(1, len(pages) // (workers * 8))) :
+                PROFILER.merge(records)
+                done.append(result)
     ##################################################
     
+    if incremental :
+        state.record(rebuild, done, entries)
+        state.save(entries, options)
+        print(f"Incremental build - {len(done)} page(s) rebuilt, {len(skipped)} unchanged skipped, "
+              f"{len(removed)} removed")
+        for args, reason in rebuild :
+            print(f"\trebuilt {args[1][1]} - {reason}")
+        for name in removed :
+            print(f"\tremoved the page of {name}")
+    elapsed = time.perf_counter() - start
+    print(f"Made {len(done)} HTML page(s) of {sum(rows for _, rows, _ in done)} rows in {elapsed:.2f} s "
+          f"({len(done)/max(elapsed, 1e-9):.1f} pages/s, {workers} worker(s))")
 #########################################################################
 
     
 #########################################################################
 if __name__ == '__main__':
     
+    parser = argparse.ArgumentParser(description="Quality control, combining CSV's and making HTML files")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="record the time, CPU, peak memory and rows of every function into FILE")
+    parser.add_argument("--profile-format", choices=["json", "trace"],
+                        help="JSON records, or a trace event file for flame graph viewers "
+                             "(default - trace if FILE ends in .trace.json)")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="also trace the peak allocations of every function (slows the run down)")
+    parser.add_argument("--qc", metavar="SOURCE",
+                        help="run the quality control over a sheet file or directory instead of the tasks")
+    parser.add_argument("--sheet-size", type=int, help="n of the n x n sheets of raw or packed files")
+    parser.add_argument("--sheet-dtype", default="int8", help="element type of raw sheet files")
+    parser.add_argument("--packed", action="store_true", help="the sheet files hold pack_sheets rows")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processes checking the sheets or making the HTML pages, "
+                             "threads reading the csv files")
+    parser.add_argument("--qc-block", type=int, default=4096, help="sheets per unit of work")
+    parser.add_argument("--memory-budget", type=int, metavar="MB",
+                        help="combine the csv files out of core within about MB of memory")
+    parser.add_argument("--spill-dir", help="directory for the sorted runs of the out of core combine")
+    parser.add_argument("--combine-cache", metavar="DIR",
+                        help="keep the parsed csv files in DIR and only parse the new or changed ones")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only make the HTML pages whose data or links changed since the last run")
+    parser.add_argument("--page-rows", type=int, metavar="N",
+                        help="split the HTML tables into linked sub-pages of N rows, streaming the csv files")
+    parser.add_argument("--summary-only", action="store_true",
+                        help="put a summary of the columns in the HTML pages instead of the tables")
+    parser.add_argument("--qc-output", metavar="CSV", help="write the status of every sheet into CSV")
+    args = parser.parse_args()
+    if args.workers <= 0 or args.qc_block <= 0 or (args.memory_budget or 1) <= 0 or (args.page_rows or 1) <= 0 :
+        parser.error("--workers, --qc-block, --memory-budget and --page-rows must be positive")
+    if args.memory_budget and args.combine_cache :
+        parser.error("--combine-cache is not used with --memory-budget")
+    if (args.profile_format or args.profile_memory) and not args.profile :
+        parser.error("--profile-format and --profile-memory need --profile")
+    if args.profile :
+        PROFILER.enable(args.profile_memory)
+        fmt = args.profile_format or ("trace" if args.profile.endswith(".trace.json") else "json")
+        atexit.register(PROFILER.dump, args.profile, fmt)
+    
+    if args.qc :
+        run_sheet_qc(args.qc, args.sheet_size, args.sheet_dtype, args.packed, args.workers,
+                     args.qc_block, args.qc_output)
+        sys.exit(0)
+    
     #####################################
     ### TASK 1
     ### Quality Control
@@ -208,7 +1485,8 @@ if __name__ == '__main__':
     ## </path/to/csvdir>
     c_directory = "csvdir"
     output_filename = "task2_out.csv"
-    combine_csv_files(c_directory, output_filename)
+    combine_csv_files(c_directory, output_filename, args.workers, args.memory_budget, args.spill_dir,
+                      args.combine_cache)
     #####################################
     
     
@@ -218,5 +1496,5 @@ if __name__ == '__main__':
     print("Task 3: Making HTML files")
     ## </path/to/htmlplots>
     h_directory = "htmlplots"
-    make_html_files(h_directory)
+    make_html_files(h_directory, args.workers, args.incremental, args.page_rows, args.summary_only)
     #####################################
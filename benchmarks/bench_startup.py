@@ -0,0 +1,76 @@
+'''SYSTEM PACKAGES'''
+import os
+import sys
+import time
+import argparse
+import subprocess
+from statistics import median
+
+
+#########################################################################
+## Repository root, the scripts are started from there
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+## Startup cases - (name, command, stdin, checked against the budget)
+CASES = [
+    ("python -c pass", [sys.executable, "-c", "pass"], None, False),
+    ("import pandas", [sys.executable, "-c", "import pandas"], None, False),
+    ("task1 menu and quit", [sys.executable, os.path.join("Task1", "dataframe_statistics.py")],
+     b"7\n", True),
+    ("task1 --help", [sys.executable, os.path.join("Task1", "dataframe_statistics.py"), "--help"],
+     None, True),
+    ("task2 import", [sys.executable, "-c",
+                      "import sys; sys.path.insert(0, 'Task2'); import Lastname_Firstname_A2_challenge"],
+     None, True),
+]
+#########################################################################
+
+#########################################################################
+def time_command(cmd, stdin, repeat) :
+    '''
+    Function to start a command repeat times and return
+    the wall times of the runs in seconds
+    '''
+
+    times = []
+    for _ in range(repeat) :
+        start = time.perf_counter()
+        subprocess.run(cmd, input=stdin, cwd=ROOT, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return times
+#########################################################################
+
+#########################################################################
+def main() :
+    '''
+    main function which times the startup of both scripts and
+    exits with 1 if any of them misses the budget
+    '''
+
+    parser = argparse.ArgumentParser(description="Startup time benchmark of the Task1 and Task2 scripts")
+    parser.add_argument("--repeat", type=int, default=10, help="runs per case")
+    parser.add_argument("--budget", type=float, default=0.25,
+                        help="seconds allowed for the median startup of each script")
+    args = parser.parse_args()
+
+    failed = 0
+    print(f"{'case' : <22} {'min (s)' : >8} {'median (s)' : >11}  budget")
+    for name, cmd, stdin, budgeted in CASES :
+        ## One untimed run to warm the file system cache
+        time_command(cmd, stdin, 1)
+        times = time_command(cmd, stdin, args.repeat)
+        verdict = ""
+        if budgeted :
+            verdict = "ok" if median(times) <= args.budget else "OVER"
+            failed += verdict == "OVER"
+        print(f"{name : <22} {min(times) : >8.3f} {median(times) : >11.3f}  {verdict}")
+
+    sys.exit(1 if failed else 0)
+#########################################################################
+
+
+#########################################################################
+if __name__ == '__main__':
+    main()
+#########################################################################
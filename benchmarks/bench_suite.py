@@ -0,0 +1,285 @@
+'''SYSTEM PACKAGES'''
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import argparse
+import contextlib
+from statistics import median
+
+import numpy as np
+import pandas
+
+## The programs under test live in the task directories
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "Task1"))
+sys.path.insert(0, os.path.join(ROOT, "Task2"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import dataframe_statistics as task1
+import Lastname_Firstname_A2_challenge as task2
+import generators
+
+
+#########################################################################
+## Data sizes of each scale
+SCALES = {
+    "small" : {"rows" : 10000, "cols" : 10, "files" : 10, "file_rows" : 1000,
+               "pages" : 5, "page_rows" : 100, "sheets" : 1000, "sheet_size" : 10},
+    "medium" : {"rows" : 100000, "cols" : 20, "files" : 50, "file_rows" : 10000,
+                "pages" : 20, "page_rows" : 1000, "sheets" : 5000, "sheet_size" : 100},
+    "large" : {"rows" : 1000000, "cols" : 20, "files" : 200, "file_rows" : 20000,
+               "pages" : 50, "page_rows" : 10000, "sheets" : 20000, "sheet_size" : 100},
+}
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+#########################################################################
+
+#########################################################################
+def setup_scale(scale, workdir) :
+    '''
+    Function to generate the data of one scale into workdir
+    Returns the context shared by the benchmarks of that scale
+    '''
+
+    params = SCALES[scale]
+    ctx = dict(params, workdir=workdir)
+    ctx["csv"] = generators.make_numeric_csv(os.path.join(workdir, "data.csv"), params["rows"],
+                                             params["cols"], nan_ratio=0.05, dup_ratio=0.05)
+    ctx["csvdir"] = generators.make_csv_directory(os.path.join(workdir, "csvdir"), params["files"],
+                                                  params["file_rows"], params["cols"])
+    ctx["htmldir"] = generators.make_html_directory(os.path.join(workdir, "htmldir"), params["pages"],
+                                                    params["page_rows"])
+    ctx["sheets"] = generators.make_sheets(params["sheets"], params["sheet_size"])
+    ctx["packed"] = task2.pack_sheets(ctx["sheets"])
+    task1.SETTINGS["cache_dir"] = None
+    ctx["df"] = task1.load_data_file(ctx["csv"])
+
+    ## Fill the column cache for the cached load benchmark
+    task1.SETTINGS["cache_dir"] = os.path.join(workdir, "cache")
+    task1.load_data_file(ctx["csv"])
+    task1.SETTINGS["cache_dir"] = None
+    return ctx
+#########################################################################
+
+#########################################################################
+def bench_task1_load(ctx) :
+    task1.SETTINGS["cache_dir"] = None
+    task1.load_data_file(ctx["csv"])
+    return ctx["rows"]
+
+def bench_task1_load_cached(ctx) :
+    task1.SETTINGS["cache_dir"] = os.path.join(ctx["workdir"], "cache")
+    task1.load_data_file(ctx["csv"])
+    task1.SETTINGS["cache_dir"] = None
+    return ctx["rows"]
+
+def bench_task1_load_chunked(ctx) :
+    task1.SETTINGS["cache_dir"] = None
+    task1.load_data_chunked(ctx["csv"])
+    return ctx["rows"]
+
+def bench_task1_clean(ctx) :
+    plan = task1.CleaningPlan(ctx["df"].columns)
+    plan.drop_rows(2)
+    plan.fill(0)
+    plan.drop_duplicates()
+    plan.drop_column("col_1")
+    plan.execute(ctx["df"])
+    return ctx["rows"]
+
+def bench_task1_analyse(ctx) :
+    task1.STATS_CACHE.clear()
+    task1.analyse_data(ctx["df"])
+    return ctx["rows"]
+
+def bench_task1_plot_line(ctx) :
+    task1.plot_data(ctx["df"], "line", plot_fname=os.path.join(ctx["workdir"], "line.png"))
+    return ctx["rows"]
+
+def bench_task1_plot_box(ctx) :
+    task1.plot_data(ctx["df"], "box", plot_fname=os.path.join(ctx["workdir"], "box.png"))
+    return ctx["rows"]
+
+def bench_task1_save_csv(ctx) :
+    task1.write_data(ctx["df"], os.path.join(ctx["workdir"], "out.csv"))
+    return ctx["rows"]
+
+def bench_task1_save_parquet(ctx) :
+    task1.write_data(ctx["df"], os.path.join(ctx["workdir"], "out.parquet"))
+    return ctx["rows"]
+
+def bench_task2_combine(ctx) :
+    task2.combine_csv_files(ctx["csvdir"], os.path.join(ctx["workdir"], "combined.csv"))
+    return ctx["files"] * ctx["file_rows"]
+
+def bench_task2_combine_external(ctx) :
+    task2.combine_csv_files(ctx["csvdir"], os.path.join(ctx["workdir"], "combined.csv"), memory_budget=16)
+    return ctx["files"] * ctx["file_rows"]
+
+def bench_task2_html(ctx) :
+    task2.make_html_files(ctx["htmldir"])
+    return ctx["pages"] * ctx["page_rows"]
+
+def bench_task2_html_parallel(ctx) :
+    task2.make_html_files(ctx["htmldir"], workers=os.cpu_count() or 1)
+    return ctx["pages"] * ctx["page_rows"]
+
+def bench_task2_sheets(ctx) :
+    for sheet in ctx["sheets"] :
+        task2.is_sheet_usable(sheet)
+    return ctx["sheets"].shape[0]
+
+def bench_task2_sheets_batch(ctx) :
+    task2.are_sheets_usable(ctx["sheets"])
+    return ctx["sheets"].shape[0]
+
+def bench_task2_sheets_packed(ctx) :
+    task2.are_packed_sheets_usable(ctx["packed"], ctx["sheet_size"])
+    return ctx["packed"].shape[0]
+
+BENCHMARKS = {name[len("bench_"):] : func for name, func in list(globals().items())
+              if name.startswith("bench_task")}
+#########################################################################
+
+#########################################################################
+def run_benchmark(func, ctx, repeat) :
+    '''
+    Function to run one benchmark repeat times, with its output
+    silenced, and return its result entry - skipped (with the reason)
+    when an optional package it needs is not installed, else an error
+    if it raised
+    '''
+
+    times = []
+    try :
+        for _ in range(repeat) :
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()) :
+                rows = func(ctx)
+            times.append(time.perf_counter() - start)
+    except ImportError as err :
+        return {"skipped" : f"{err.name or err} is not installed"}
+    except Exception as err :
+        return {"error" : f"{type(err).__name__}: {err}"}
+    return {"best" : min(times), "median" : median(times), "runs" : times,
+            "rows" : rows, "rows_per_s" : rows / max(min(times), 1e-9)}
+#########################################################################
+
+#########################################################################
+def compare_results(results, baseline, tolerance) :
+    '''
+    Function to print the results against the baseline (an empty
+    baseline only prints the results)
+    Returns the number of failures - regressions (slower by more than
+    tolerance) and benchmarks which raised an error
+    '''
+
+    failures = 0
+    print(f"\n{'benchmark' : <34} {'best (s)' : >10} {'baseline' : >10} {'ratio' : >7}")
+    for key, entry in results.items() :
+        base = baseline.get(key, {})
+        if "skipped" in entry :
+            print(f"{key : <34} {'skipped' : >10}  {entry['skipped']}")
+            continue
+        if "error" in entry :
+            print(f"{key : <34} {'ERROR' : >10}  {entry['error']}")
+            failures += 1
+            continue
+        if "best" not in base :
+            print(f"{key : <34} {entry['best'] : >10.4f} {'-' : >10}")
+            continue
+        ratio = entry["best"] / max(base["best"], 1e-9)
+        flag = ""
+        if ratio > 1 + tolerance :
+            flag = "  SLOWER"
+            failures += 1
+        elif ratio < 1 - tolerance :
+            flag = "  faster"
+        print(f"{key : <34} {entry['best'] : >10.4f} {base['best'] : >10.4f} {ratio : >7.2f}{flag}")
+    return failures
+#########################################################################
+
+#########################################################################
+def main() :
+    '''
+    main function which runs the benchmarks over the chosen scales,
+    writes the results as JSON and compares them with the baseline,
+    exiting with 1 on a regression or a failed benchmark
+    '''
+
+    parser = argparse.ArgumentParser(description="Benchmark suite of the Task1 and Task2 programs")
+    parser.add_argument("--scales", default="small", help="comma separated scales - small, medium, large")
+    parser.add_argument("--only", help="comma separated benchmark names (default - all)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark")
+    parser.add_argument("--output", default="bench_results.json", help="JSON file for the results")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="JSON results to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="relative slowdown reported as a regression")
+    args = parser.parse_args()
+
+    scales = [s.strip() for s in args.scales.split(",")]
+    names = list(BENCHMARKS) if not args.only else [n.strip() for n in args.only.split(",")]
+    unknown = [s for s in scales if s not in SCALES] + [n for n in names if n not in BENCHMARKS]
+    if unknown :
+        parser.error(f"unknown scale or benchmark - {', '.join(unknown)}")
+
+    results = {}
+    cwd = os.getcwd()
+    for scale in scales :
+        workdir = tempfile.mkdtemp(prefix=f"bench_{scale}_")
+        try :
+            print(f"Generating the {scale} data ..")
+            with contextlib.redirect_stdout(io.StringIO()) :
+                ctx = setup_scale(scale, workdir)
+            ## make_html_files writes its plots to the working directory
+            os.chdir(workdir)
+            for name in names :
+                print(f"\t{scale}/{name} ..", end=" ", flush=True)
+                results[f"{scale}/{name}"] = entry = run_benchmark(BENCHMARKS[name], ctx, args.repeat)
+                print(entry.get("error") or entry.get("skipped") or f"{entry['best']:.4f} s")
+        finally :
+            os.chdir(cwd)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta" : {
+            "python" : platform.python_version(), "numpy" : np.__version__,
+            "pandas" : pandas.__version__, "platform" : platform.platform(),
+            "cpus" : os.cpu_count(), "repeat" : args.repeat,
+            "date" : time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results" : results,
+    }
+    with open(args.output, "w") as fw :
+        json.dump(report, fw, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    baseline = {}
+    if os.path.exists(args.baseline) :
+        with open(args.baseline) as fr :
+            baseline = json.load(fr)["results"]
+    failures = compare_results(results, baseline, args.tolerance)
+    if not baseline :
+        print(f"\nWARNING - no baseline at {args.baseline}, nothing was compared. "
+              f"Store one with --save-baseline on the reference machine")
+
+    if args.save_baseline :
+        with open(args.baseline, "w") as fw :
+            json.dump(report, fw, indent=2)
+        print(f"Baseline stored in {args.baseline}")
+
+    if failures :
+        print(f"\n{failures} benchmark(s) slower than the baseline or failed")
+    sys.exit(1 if failures else 0)
+#########################################################################
+
+
+#########################################################################
+if __name__ == '__main__':
+    main()
+#########################################################################
@@ -0,0 +1,157 @@
+'''SYSTEM PACKAGES'''
+import os
+import argparse
+import numpy as np
+from pandas import DataFrame as DF
+
+
+#########################################################################
+def make_numeric_frame(rows, cols, nan_ratio=0.0, dup_ratio=0.0, seed=0) :
+    '''
+    Function to build a numeric DataFrame of rows x cols (plus an "id"
+    column), mixing integer-valued and float columns, with about
+    nan_ratio of the values missing and dup_ratio of the rows repeating
+    earlier rows exactly (id aside)
+    '''
+
+    rng = np.random.default_rng(seed)
+    n_dups = int(rows * dup_ratio)
+    n_unique = rows - n_dups
+
+    values = np.empty((n_unique, cols))
+    for cid in range(cols) :
+        if cid % 3 == 0 :
+            values[:, cid] = rng.integers(-1000, 1000, n_unique)
+        elif cid % 3 == 1 :
+            values[:, cid] = rng.normal(100, 25, n_unique)
+        else :
+            values[:, cid] = np.round(rng.random(n_unique) * 10, 3)
+    if nan_ratio :
+        values[rng.random(values.shape) < nan_ratio] = np.nan
+
+    ## Repeated rows are copies of earlier ones, spread at random
+    if n_dups and n_unique :
+        copies = values[rng.integers(0, n_unique, n_dups)]
+        values = np.concatenate([values, copies])[rng.permutation(rows)]
+
+    frame = DF(values, columns=[f"col_{cid}" for cid in range(cols)])
+    frame.insert(0, "id", np.arange(frame.shape[0]))
+    return frame
+#########################################################################
+
+#########################################################################
+def make_numeric_csv(fname, rows, cols, nan_ratio=0.0, dup_ratio=0.0, seed=0) :
+    '''
+    Function to write a numeric CSV file for the Task1 program
+    '''
+
+    make_numeric_frame(rows, cols, nan_ratio, dup_ratio, seed).to_csv(fname, index=False)
+    return fname
+#########################################################################
+
+#########################################################################
+def make_csv_directory(directory, files, rows, cols, seed=0) :
+    '''
+    Function to write a directory of CSV files for combine_csv_files -
+    each with a "key" column and a random subset of a pool of columns,
+    so the combined data has gaps, plus one file without a key column
+    which has to be skipped
+    '''
+
+    rng = np.random.default_rng(seed)
+    os.makedirs(directory, exist_ok=True)
+    pool = [f"col_{cid}" for cid in range(cols)]
+    for fid in range(files) :
+        picked = sorted(rng.choice(pool, size=max(1, int(cols * rng.uniform(0.3, 1.0))), replace=False))
+        frame = DF(np.round(rng.normal(size=(rows, len(picked))), 4), columns=picked)
+        frame.insert(0, "key", fid * rows + np.arange(rows))
+        frame.to_csv(os.path.join(directory, f"part_{fid:04d}.csv"), index=False)
+    DF({"no_key" : np.arange(rows)}).to_csv(os.path.join(directory, "stray.csv"), index=False)
+    return directory
+#########################################################################
+
+#########################################################################
+def make_html_directory(directory, files, rows, cols=3, seed=0) :
+    '''
+    Function to write a directory for make_html_files - numeric
+    CSV files and the index.txt listing them in order
+    '''
+
+    rng = np.random.default_rng(seed)
+    os.makedirs(directory, exist_ok=True)
+    names = []
+    for fid in range(files) :
+        frame = DF(np.cumsum(rng.normal(size=(rows, cols)), axis=0).round(4),
+                   columns=[f"series_{cid}" for cid in range(cols)])
+        names.append(f"page_{fid:04d}.csv")
+        frame.to_csv(os.path.join(directory, names[-1]), index=False)
+    with open(os.path.join(directory, "index.txt"), "w") as fw :
+        fw.write("\n".join(names) + "\n")
+    return directory
+#########################################################################
+
+#########################################################################
+def make_sheets(count, size, seed=0) :
+    '''
+    Function to build count sheets of size x size for is_sheet_usable,
+    as one int8 array of 0's and 1's (defects). The defect rate varies
+    per sheet so that both usable and rejected sheets come up
+    '''
+
+    rng = np.random.default_rng(seed)
+    rates = rng.uniform(0, 16 / (size * size), count)[:, None, None]
+    return (rng.random((count, size, size)) < rates).astype(np.int8)
+#########################################################################
+
+#########################################################################
+def main() :
+    '''
+    main function to write the synthetic data from the command line
+    '''
+
+    parser = argparse.ArgumentParser(description="Synthetic data for the Task1 and Task2 benchmarks")
+    sub = parser.add_subparsers(dest="kind", required=True)
+
+    csv_p = sub.add_parser("csv", help="numeric CSV file for Task1")
+    csv_p.add_argument("output")
+    csv_p.add_argument("--rows", type=int, default=100000)
+    csv_p.add_argument("--cols", type=int, default=10)
+    csv_p.add_argument("--nan-ratio", type=float, default=0.05)
+    csv_p.add_argument("--dup-ratio", type=float, default=0.05)
+
+    dir_p = sub.add_parser("csvdir", help="directory of CSV files for combine_csv_files")
+    dir_p.add_argument("output")
+    dir_p.add_argument("--files", type=int, default=20)
+    dir_p.add_argument("--rows", type=int, default=1000)
+    dir_p.add_argument("--cols", type=int, default=10)
+
+    html_p = sub.add_parser("htmldir", help="directory of CSV files and index.txt for make_html_files")
+    html_p.add_argument("output")
+    html_p.add_argument("--files", type=int, default=10)
+    html_p.add_argument("--rows", type=int, default=100)
+
+    sheet_p = sub.add_parser("sheets", help="stack of sheets for is_sheet_usable, saved as .npy")
+    sheet_p.add_argument("output")
+    sheet_p.add_argument("--count", type=int, default=1000)
+    sheet_p.add_argument("--size", type=int, default=100)
+
+    for each_p in (csv_p, dir_p, html_p, sheet_p) :
+        each_p.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.kind == "csv" :
+        make_numeric_csv(args.output, args.rows, args.cols, args.nan_ratio, args.dup_ratio, args.seed)
+    elif args.kind == "csvdir" :
+        make_csv_directory(args.output, args.files, args.rows, args.cols, args.seed)
+    elif args.kind == "htmldir" :
+        make_html_directory(args.output, args.files, args.rows, seed=args.seed)
+    else :
+        np.save(args.output, make_sheets(args.count, args.size, args.seed))
+    print(f"Written {args.output}")
+#########################################################################
+
+
+#########################################################################
+if __name__ == '__main__':
+    main()
+#########################################################################
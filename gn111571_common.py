@@ -0,0 +1,265 @@
+'''SYSTEM PACKAGES'''
+import os
+import sys
+import json
+import time
+import threading
+import functools
+import importlib
+import contextlib
+
+
+#########################################################################
+class LazyImport :
+    '''
+    Stand-in for a module, or a name imported from a module, doing the
+    import the first time it is used, so starting a program (or quitting
+    straight away) does not pay for loading numpy, pandas and matplotlib
+    '''
+    
+    def __init__(self, module, name=None) :
+        self._module = module
+        self._name = name
+        self._target = None
+    
+    def resolve(self) :
+        if self._target is None :
+            target = importlib.import_module(self._module)
+            if self._name is not None :
+                target = getattr(target, self._name)
+            self._target = target
+        return self._target
+    
+    def __getattr__(self, attr) :
+        return getattr(self.resolve(), attr)
+    
+    def __call__(self, *args, **kwargs) :
+        return self.resolve()(*args, **kwargs)
+    
+    def __instancecheck__(self, obj) :
+        return isinstance(obj, self.resolve())
+#########################################################################
+
+#########################################################################
+def load_pyplot() :
+    '''
+    Common function to import pyplot on first use, with the 
+    non-interactive Agg backend as every figure goes to a file
+    '''
+    
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib import pyplot
+    return pyplot
+#########################################################################
+
+#########################################################################
+class Profiler :
+    '''
+    Recorder of the wall time, CPU time, memory and rows processed of
+    every profiled operation, switched on by --profile. Operations nest -
+    the time and memory of an inner one is also part of the operation
+    calling it. The memory is the high-water mark of the process, and
+    with trace_memory the peak of the allocations made during the
+    operation, traced by tracemalloc (precise, but several times slower)
+    '''
+    
+    def __init__(self) :
+        self.enabled = False
+        self.trace_memory = False
+        self.records = []
+        self.origin = time.perf_counter()
+        self.lock = threading.Lock()
+        ## Per thread stack of the open operations
+        self.local = threading.local()
+    
+    def enable(self, trace_memory=False) :
+        if trace_memory :
+            import tracemalloc
+            tracemalloc.start()
+        self.trace_memory = trace_memory
+        self.origin = time.perf_counter()
+        self.enabled = True
+    
+    @staticmethod
+    def max_rss_mb() :
+        try :
+            import resource
+        except ImportError :
+            return None
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        ## Kilobytes on Linux, bytes on macOS
+        return round(rss / (2**20 if sys.platform == "darwin" else 2**10), 1)
+    
+    @contextlib.contextmanager
+    def section(self, name) :
+        '''
+        Context manager timing the block as the operation name. It yields
+        a dict where the block can set the "rows" it processed
+        '''
+        
+        if not self.enabled :
+            yield {}
+            return
+        stack = self.local.__dict__.setdefault("stack", [])
+        frame = {"rows" : None, "peak" : 0}
+        
+        if self.trace_memory :
+            import tracemalloc
+            ## tracemalloc has one global peak - hand it over to the 
+            ## enclosing operation before resetting it for this one
+            current, peak = tracemalloc.get_traced_memory()
+            if stack :
+                stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+            tracemalloc.reset_peak()
+            frame["peak"] = current
+        stack.append(frame)
+        
+        start, cpu = time.perf_counter(), time.process_time()
+        try :
+            yield frame
+        finally :
+            wall, cpu = time.perf_counter() - start, time.process_time() - cpu
+            stack.pop()
+            record = {
+                "name" : name,
+                "start" : round(start - self.origin, 6),
+                "wall" : round(wall, 6),
+                "cpu" : round(cpu, 6),
+                "max_rss_mb" : self.max_rss_mb(),
+                "rows" : frame["rows"],
+                "depth" : len(stack),
+                "thread" : threading.current_thread().name,
+                "pid" : os.getpid(),
+            }
+            if self.trace_memory :
+                peak = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+                if stack :
+                    stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+                record["peak_mb"] = round((peak - current) / 2**20, 3)
+            with self.lock :
+                self.records.append(record)
+    
+    def worker_state(self) :
+        '''
+        Function to return what a pool worker needs to profile like
+        this process (see start_worker), None when the profiler is off.
+        The origin goes as wall clock time, perf_counter is per process
+        '''
+        
+        if not self.enabled :
+            return None
+        return {"origin" : time.time() - (time.perf_counter() - self.origin),
+                "trace_memory" : self.trace_memory}
+    
+    def start_worker(self, state) :
+        '''
+        Function to switch on the profiler of a pool worker with the
+        state of the parent, dropping any records copied from it by fork
+        '''
+        
+        if not self.enabled :
+            self.enable(state["trace_memory"])
+        self.origin = time.perf_counter() - (time.time() - state["origin"])
+        self.collect()
+    
+    def collect(self) :
+        '''
+        Function to take the records made so far, leaving none
+        '''
+        
+        with self.lock :
+            records, self.records = self.records, []
+        return records
+    
+    def merge(self, records) :
+        '''
+        Function to add the records sent back by a pool worker
+        '''
+        
+        if records :
+            with self.lock :
+                self.records.extend(records)
+    
+    def summary(self) :
+        '''
+        Function to total the records per operation name
+        '''
+        
+        totals = {}
+        for rec in self.records :
+            tot = totals.setdefault(rec["name"], {"calls" : 0, "wall" : 0.0, "cpu" : 0.0, "rows" : 0})
+            tot["calls"] += 1
+            tot["wall"] = round(tot["wall"] + rec["wall"], 6)
+            tot["cpu"] = round(tot["cpu"] + rec["cpu"], 6)
+            tot["rows"] += rec["rows"] or 0
+            if "peak_mb" in rec :
+                tot["peak_mb"] = max(tot.get("peak_mb", 0.0), rec["peak_mb"])
+        return totals
+    
+    def dump(self, fname, fmt="json") :
+        '''
+        Function to write the records as JSON, or as a trace of
+        complete events ("ph" : "X") which chrome://tracing, Perfetto
+        and speedscope show as a flame graph
+        '''
+        
+        with self.lock :
+            records = sorted(self.records, key=lambda rec : (rec["start"], rec["depth"]))
+        if fmt == "trace" :
+            ## Workers of a process pool show as processes of their own
+            tids = {}
+            events = [{"name" : rec["name"], "cat" : "operation", "ph" : "X",
+                       "ts" : round(rec["start"] * 1e6), "dur" : round(rec["wall"] * 1e6),
+                       "pid" : rec.get("pid", os.getpid()),
+                       "tid" : tids.setdefault((rec.get("pid", os.getpid()), rec["thread"]), len(tids)),
+                       "args" : {key : rec[key] for key in ("cpu", "max_rss_mb", "peak_mb", "rows")
+                                 if key in rec}}
+                      for rec in records]
+            events += [{"name" : "thread_name", "ph" : "M", "pid" : pid, "tid" : tid,
+                        "args" : {"name" : thread}} for (pid, thread), tid in tids.items()]
+            report = {"traceEvents" : events, "displayTimeUnit" : "ms"}
+        else :
+            report = {"program" : os.path.basename(sys.argv[0]), "operations" : records,
+                      "summary" : self.summary()}
+        with open(fname, "w") as fw :
+            json.dump(report, fw, indent=1)
+        print(f"Profile of {len(records)} operation(s) written to {fname}")
+
+## Profiler of the run, enabled by --profile
+PROFILER = Profiler()
+#########################################################################
+
+#########################################################################
+def rows_processed(result, args) :
+    '''
+    Function to guess the rows an operation processed - those of its
+    first data argument, else those of the data it returned
+    '''
+    
+    for obj in (*args, result) :
+        shape = getattr(obj, "shape", None)
+        if isinstance(shape, tuple) and shape :
+            return int(shape[0])
+    return None
+#########################################################################
+
+#########################################################################
+def profiled(func) :
+    '''
+    Decorator recording every call of func with PROFILER. When the
+    profiler is off, a call only costs one extra attribute lookup
+    '''
+    
+    name = func.__qualname__
+    
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs) :
+        if not PROFILER.enabled :
+            return func(*args, **kwargs)
+        with PROFILER.section(name) as frame :
+            result = func(*args, **kwargs)
+            frame["rows"] = rows_processed(result, args)
+        return result
+    return wrapper
+#########################################################################
@@ -0,0 +1,12 @@
+'''SYSTEM PACKAGES'''
+import os
+import sys
+
+
+## The programs are scripts, not a package - import them from their
+## directories, with the data generators of the benchmarks
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for sub in ("Task1", "Task2", "benchmarks") :
+    path = os.path.join(ROOT, sub)
+    if path not in sys.path :
+        sys.path.insert(0, path)
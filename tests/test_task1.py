@@ -0,0 +1,174 @@
+'''SYSTEM PACKAGES'''
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+import dataframe_statistics as ds
+from generators import make_numeric_frame, make_numeric_csv
+
+
+#########################################################################
+@pytest.fixture
+def frame() :
+    '''
+    Numeric data with missing values and repeated rows, the "id" column
+    left out so the repeated rows are duplicates
+    '''
+
+    return make_numeric_frame(3000, 7, nan_ratio=0.15, dup_ratio=0.1, seed=3).drop(columns="id")
+#########################################################################
+
+#########################################################################
+def step_by_step(data_df, steps) :
+    '''
+    Function to run cleaning steps one at a time with pandas,
+    the way the menu did before the steps were planned
+    '''
+
+    for op, arg in steps :
+        if op == "drop_rows" :
+            data_df = data_df[data_df.isna().sum(axis=1) <= arg]
+        elif op == "fill" :
+            data_df = data_df.fillna(arg)
+        elif op == "drop_duplicates" :
+            data_df = data_df.drop_duplicates()
+        elif op == "drop_column" :
+            data_df = data_df.drop(columns=arg)
+        elif op == "rename_column" :
+            data_df = data_df.rename(columns={arg[0] : arg[1]})
+    return data_df
+#########################################################################
+
+#########################################################################
+@pytest.mark.parametrize("steps", [
+    [("drop_rows", 1), ("fill", 0.0), ("drop_duplicates", None)],
+    [("rename_column", ("col_1", "speed")), ("drop_duplicates", None), ("drop_rows", 0)],
+    [("drop_column", "col_2"), ("fill", -1.5), ("rename_column", ("col_4", "load")),
+     ("drop_duplicates", None), ("drop_column", "col_0")],
+    [("drop_duplicates", None), ("drop_rows", 2), ("drop_column", "col_3"), ("fill", 7.0)],
+])
+def test_cleaning_plan_matches_step_by_step(frame, steps) :
+    plan = ds.CleaningPlan(frame.columns)
+    for op, arg in steps :
+        if op == "rename_column" :
+            plan.rename_column(*arg)
+        elif op == "drop_column" :
+            plan.drop_column(arg)
+        elif arg is None :
+            getattr(plan, op)()
+        else :
+            getattr(plan, op)(arg)
+    before = frame.copy()
+
+    cleaned, counts = plan.execute(frame)
+
+    pd.testing.assert_frame_equal(cleaned, step_by_step(frame, steps))
+    assert len(counts) == len(steps)
+    ## The caller's data is never changed
+    pd.testing.assert_frame_equal(frame, before)
+#########################################################################
+
+#########################################################################
+def test_column_moments_match_exact_stats(frame) :
+    values = frame.to_numpy(dtype=np.float64, copy=True)
+    values[:, 5] = np.nan
+
+    ## Uneven blocks, merged as the chunks of a stream would be
+    moments = ds.ColumnMoments(values.shape[1])
+    for block in np.array_split(values, [1, 40, 41, 1700]) :
+        moments.update(block)
+    stats = moments.stats()
+
+    with np.errstate(invalid="ignore"), pytest.warns(RuntimeWarning) :
+        expected = {
+            "min" : np.nanmin(values, axis=0),
+            "max" : np.nanmax(values, axis=0),
+            "mean" : np.nanmean(values, axis=0),
+            "std" : np.nanstd(values, axis=0, ddof=1),
+        }
+    expected["sem"] = expected["std"] / np.sqrt((~np.isnan(values)).sum(axis=0))
+    assert moments.n_rows == values.shape[0]
+    for name, exact in expected.items() :
+        np.testing.assert_allclose(stats[name], exact, rtol=1e-10, err_msg=name)
+#########################################################################
+
+#########################################################################
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_kll_sketch_within_error_bound(seed) :
+    eps = 0.01
+    rng = np.random.default_rng(seed)
+    values = np.concatenate([rng.normal(size=60000), rng.exponential(size=40000)])
+    values[rng.random(values.size) < 0.05] = np.nan
+
+    ## Two sketches fed in blocks and merged, as for chunks or partitions
+    left, right = ds.KLLSketch.for_error(eps, seed), ds.KLLSketch.for_error(eps, seed + 100)
+    for bid, block in enumerate(np.array_split(values, 200)) :
+        (left if bid % 2 else right).update(block)
+    left.merge(right)
+
+    exact = np.sort(values[~np.isnan(values)])
+    assert left.n == exact.size
+    qs = np.linspace(0.01, 0.99, 99)
+    ranks = np.searchsorted(exact, left.quantiles(qs)) / exact.size
+    assert np.max(np.abs(ranks - qs)) <= eps
+#########################################################################
+
+#########################################################################
+def test_chunked_stats_match_exact_stats(tmp_path, monkeypatch) :
+    fname = make_numeric_csv(str(tmp_path / "data.csv"), 5000, 4, nan_ratio=0.1, seed=5)
+    monkeypatch.setitem(ds.SETTINGS, "cache_dir", None)
+    monkeypatch.setitem(ds.SETTINGS, "chunksize", 700)
+    monkeypatch.setitem(ds.SETTINGS, "percentiles", [1, 25, 90])
+    ## Under 2000 rows of budget - one column does not fit, so the
+    ## quantiles are selected on disk
+    monkeypatch.setitem(ds.SETTINGS, "memory_budget", 0.015)
+    chunked = ds.load_data(fname, chunked=True)
+    values = pd.read_csv(fname).to_numpy(dtype=np.float64)
+
+    stats = ds.compute_chunked_stats(chunked)
+
+    np.testing.assert_allclose(stats["mean"], np.nanmean(values, axis=0), rtol=1e-10)
+    np.testing.assert_allclose(stats["std"], np.nanstd(values, axis=0, ddof=1), rtol=1e-10)
+    np.testing.assert_allclose(stats["median"], np.nanmedian(values, axis=0), rtol=1e-12)
+    for q in (1, 25, 90) :
+        np.testing.assert_allclose(stats["percentiles"][q], np.nanpercentile(values, q, axis=0),
+                                   rtol=1e-12)
+#########################################################################
+
+#########################################################################
+@pytest.mark.parametrize("nan_ratio", [0.0, 0.2])
+@pytest.mark.parametrize("workers", [1, 3])
+def test_blocked_correlation_matches_pandas(nan_ratio, workers) :
+    frame = make_numeric_frame(400, 11, nan_ratio=nan_ratio, seed=7)
+    frame["constant"] = 1.0
+    values = frame.to_numpy(dtype=np.float64)
+    n_cols = values.shape[1]
+
+    collector = ds.CorrelationCollector(n_cols, n_cols)
+    ds.blocked_correlation(values, collector, block=4, workers=workers)
+
+    expected = frame.corr()
+    pd.testing.assert_frame_equal(collector.result(frame.columns), expected, rtol=1e-9, atol=1e-12)
+
+    ## Only some rows of the matrix, in the order asked
+    rows = [5, 0, 9]
+    collector = ds.CorrelationCollector(len(rows), n_cols)
+    ds.blocked_correlation(values, collector, rows, block=2, workers=workers)
+    np.testing.assert_allclose(collector.matrix, expected.to_numpy()[rows], rtol=1e-9, atol=1e-12)
+#########################################################################
+
+#########################################################################
+def test_top_pairs_are_the_strongest_correlations() :
+    frame = make_numeric_frame(500, 9, seed=11)
+    frame["echo"] = frame["col_1"] * 2 + np.random.default_rng(1).normal(size=500)
+    values = frame.to_numpy(dtype=np.float64)
+
+    collector = ds.CorrelationCollector(values.shape[1], values.shape[1], top_k=5)
+    pairs = ds.blocked_correlation(values, collector, block=3).result(frame.columns)
+
+    corr = frame.corr().to_numpy()
+    upper = np.abs(corr[np.triu_indices_from(corr, k=1)])
+    np.testing.assert_allclose(np.abs(pairs["correlation"]), np.sort(upper)[::-1][:5], rtol=1e-9)
+    assert tuple(pairs.iloc[0][["column 1", "column 2"]]) == ("col_1", "echo")
+#########################################################################
@@ -0,0 +1,49 @@
+'''SYSTEM PACKAGES'''
+import os
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+import Lastname_Firstname_A2_challenge as a2
+from generators import make_csv_directory
+
+
+#########################################################################
+@pytest.mark.parametrize("workers", [1, 3])
+def test_external_combine_matches_in_memory(tmp_path, workers) :
+    ## 1 MB of budget spills many runs of these files, merged a few at a time
+    directory = make_csv_directory(str(tmp_path / "csv"), 24, 3000, 10, seed=4)
+    spill_dir = tmp_path / "spill"
+    spill_dir.mkdir()
+    in_memory, external = str(tmp_path / "in_memory.csv"), str(tmp_path / "external.csv")
+
+    a2.combine_csv_files(directory, in_memory, workers=workers)
+    a2.combine_csv_files(directory, external, workers=workers, memory_budget=1, 
+                         spill_dir=str(spill_dir))
+
+    expected = pd.read_csv(in_memory)
+    assert expected.shape[0] == 24 * 3000
+    pd.testing.assert_frame_equal(pd.read_csv(external), expected)
+    assert not os.listdir(spill_dir)
+#########################################################################
+
+#########################################################################
+def test_combine_cache_matches_fresh_combine(tmp_path, capsys) :
+    directory = make_csv_directory(str(tmp_path / "csv"), 6, 200, 5, seed=8)
+    other = make_csv_directory(str(tmp_path / "other"), 3, 100, 4, seed=9)
+    cache_dir = str(tmp_path / "cache")
+    fresh, cached = str(tmp_path / "fresh.csv"), str(tmp_path / "cached.csv")
+    a2.combine_csv_files(directory, cached, cache_dir=cache_dir)
+    ## Another directory sharing the cache keeps the entries of the first
+    a2.combine_csv_files(other, str(tmp_path / "other.csv"), cache_dir=cache_dir)
+
+    changed = os.path.join(directory, "part_0002.csv")
+    pd.read_csv(changed).iloc[:50].to_csv(changed, index=False)
+    capsys.readouterr()
+    a2.combine_csv_files(directory, cached, cache_dir=cache_dir)
+
+    assert "6 file(s) reused, 1 parsed, 0 removed" in capsys.readouterr().out
+    a2.combine_csv_files(directory, fresh)
+    pd.testing.assert_frame_equal(pd.read_csv(cached), pd.read_csv(fresh))
+#########################################################################